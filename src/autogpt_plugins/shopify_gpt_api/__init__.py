@@ -39,6 +39,9 @@ class ShopifyAutoGPT(AutoGPTPluginTemplate):
         print('protocol:', self.protocol)
 
         self.shop = None 
+        self.endpoint_stats = None
+        self.metrics_file = os.getenv("SHOPIFY_METRICS_FILE")
+        self._command_label = None
 
         # Initialize Shopify API
         if (
@@ -49,6 +52,24 @@ class ShopifyAutoGPT(AutoGPTPluginTemplate):
             and self.api_version
         ) is not None:
             print('Authenticating to Shopify...')
+            # Set SHOPIFY_POOL_SIZE to reuse keep-alive connections to the shop instead of a new TLS
+            # handshake per request. Requests that HTTP(S)_PROXY applies to still go through urllib.
+            pool_size = int(os.getenv("SHOPIFY_POOL_SIZE", "0"))
+            if pool_size > 0:
+                shopify.ShopifyConnection.pool_manager = shopify.PoolManager(maxsize=pool_size)
+            # Pace requests to stay just under the API call limit bucket
+            shopify.ShopifyConnection.rate_limiter = shopify.LeakyBucket()
+            # Retry throttled and transient gateway errors so long scans are not lost
+            shopify.ShopifyConnection.retry_policy = shopify.RetryPolicy()
+            # Share one response between identical GETs that are in flight at the same time
+            shopify.ShopifyConnection.coalescer = shopify.SingleFlight()
+            # Revalidate repeated reads with ETag / Last-Modified instead of downloading them again
+            shopify.ShopifyConnection.response_cache = shopify.ResponseCache()
+            # Per-command, per-endpoint latency histograms, dumped to SHOPIFY_METRICS_FILE after each command
+            shopify.ShopifyConnection.instrumentation = shopify.Instrumentation()
+            self.endpoint_stats = shopify.ShopifyConnection.instrumentation.subscribe(
+                shopify.EndpointStats(by_label=True)
+            )
         # Authenticating to Shopify
             self.session = shopify.Session(self.store_url, self.api_version, self.shopify_password)
             self.client = shopify.ShopifyResource.activate_session(self.session)
@@ -224,7 +245,7 @@ class ShopifyAutoGPT(AutoGPTPluginTemplate):
 
         Returns:
             bool: True if the plugin can handle the pre_command method."""
-        return False
+        return self.endpoint_stats is not None
 
     def pre_command(
         self, command_name: str, arguments: Dict[str, Any]
@@ -238,7 +259,9 @@ class ShopifyAutoGPT(AutoGPTPluginTemplate):
         Returns:
             Tuple[str, Dict[str, Any]]: The command name and the arguments.
         """
-        pass
+        # Attribute the Shopify requests the command makes to it in the latency histograms
+        self._command_label = shopify.ShopifyConnection.instrumentation.set_label(command_name)
+        return command_name, arguments
 
     def can_handle_post_command(self) -> bool:
         """This method is called to check that the plugin can
@@ -246,7 +269,7 @@ class ShopifyAutoGPT(AutoGPTPluginTemplate):
 
         Returns:
             bool: True if the plugin can handle the post_command method."""
-        return False
+        return self.endpoint_stats is not None
 
 
     def post_command(self, command_name: str, response: str) -> str:
@@ -259,7 +282,12 @@ class ShopifyAutoGPT(AutoGPTPluginTemplate):
         Returns:
             str: The resulting response.
         """
-        pass
+        if self._command_label is not None:
+            shopify.ShopifyConnection.instrumentation.reset_label(self._command_label)
+            self._command_label = None
+        if self.metrics_file:
+            self.endpoint_stats.dump(self.metrics_file)
+        return response
 
 
     def can_handle_chat_completion(
@@ -319,6 +347,7 @@ class ShopifyAutoGPT(AutoGPTPluginTemplate):
             get_all_orders,
             analyze_sales,
             analyze_customer_behavior,
+            segment_customers,
             stock_management,
             analyze_shopify_store,
             order_fulfillment,
@@ -339,7 +368,9 @@ class ShopifyAutoGPT(AutoGPTPluginTemplate):
             get_theme_asset,
             update_theme_asset,
             delete_theme_asset,
+            start_webhook_receiver,
         )
+        start_webhook_receiver()
         prompt.add_command(
             "Create Product",
             "create_product",
@@ -434,28 +465,52 @@ class ShopifyAutoGPT(AutoGPTPluginTemplate):
         prompt.add_command(
             "Analyze Sales",
             "analyze_sales",
-            {},
+            {
+                "start_date": "<start_date>",
+                "end_date": "<end_date>"
+            },
             analyze_sales,
         )
 
         prompt.add_command(
             "Analyze Customer Behavior",
             "analyze_customer_behavior",
-            {},
+            {
+                "top_k": "<top_k>",
+                "sort_by": "<sort_by>",
+                "page": "<page>"
+            },
             analyze_customer_behavior,
         )
 
+        prompt.add_command(
+            "Segment Customers",
+            "segment_customers",
+            {
+                "segment": "<segment>",
+                "top_k": "<top_k>",
+                "page": "<page>"
+            },
+            segment_customers,
+        )
+
         prompt.add_command(
             "Manage Stock",
             "manage_stock",
-            {},
+            {
+                "threshold": "<threshold>",
+                "location_id": "<location_id>"
+            },
             stock_management,
         )
 
         prompt.add_command(
             "Stock Management",
             "stock_management",
-            {},
+            {
+                "threshold": "<threshold>",
+                "location_id": "<location_id>"
+            },
             stock_management,
         )
 
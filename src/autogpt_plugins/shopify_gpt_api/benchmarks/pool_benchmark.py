@@ -0,0 +1,53 @@
+"""
+Requests/sec through ShopifyConnection with the keep-alive pool on and off.
+
+Run from the plugin directory:
+
+    python -m benchmarks.pool_benchmark --requests 500 --handshake-ms 20
+"""
+import argparse
+import time
+import shopify
+from six.moves import urllib
+from benchmarks.stand_in import StandInServer
+
+
+def run(site, requests, pool_manager):
+    shopify.ShopifyConnection.pool_manager = pool_manager
+    shopify.ShopifyResource.site = site
+    start = time.perf_counter()
+    for _ in range(requests):
+        shopify.Product.find()
+    elapsed = time.perf_counter() - start
+    shopify.ShopifyConnection.pool_manager = None
+    if pool_manager is not None:
+        pool_manager.clear()
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--products", type=int, default=50, help="products per response page")
+    parser.add_argument(
+        "--handshake-ms", type=float, default=20.0, help="simulated cost of opening a new connection"
+    )
+    args = parser.parse_args()
+
+    # Make sure no test opener is installed.
+    urllib.request.install_opener(urllib.request.build_opener())
+
+    with StandInServer(products=args.products, handshake_delay=args.handshake_ms / 1000.0) as server:
+        off = run(server.site, args.requests, None)
+        off_connections = server.connections
+        on = run(server.site, args.requests, shopify.PoolManager(maxsize=1))
+        on_connections = server.connections - off_connections
+
+    print("requests: %d, products/page: %d, handshake: %.1fms" % (args.requests, args.products, args.handshake_ms))
+    print("pool off: %8.1f req/s  (%d connections)" % (off, off_connections))
+    print("pool on:  %8.1f req/s  (%d connections)" % (on, on_connections))
+    print("speedup:  %8.2fx" % (on / off))
+
+
+if __name__ == "__main__":
+    main()
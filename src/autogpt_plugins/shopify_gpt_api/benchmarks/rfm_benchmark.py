@@ -0,0 +1,65 @@
+"""
+RFM scores, segments and lifetime value for synthetic customers.
+
+Run from the plugin directory:
+
+    python -m benchmarks.rfm_benchmark --customers 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+from rfm import DAY, score_rfm
+
+
+def make_customers(count, now, seed=0):
+    """Customer arrays with a long tail of order counts and spend, over five years of history."""
+    rng = np.random.default_rng(seed)
+    orders = rng.geometric(0.45, size=count)
+    spent = (rng.lognormal(8.5, 0.8, size=count) * orders).astype(np.int64)
+    first_order = now - rng.integers(0, 5 * 365 * DAY, size=count)
+    last_order = first_order + ((now - first_order) * rng.random(count) ** 2).astype(np.int64)
+    last_order[orders == 1] = first_order[orders == 1]
+    return {
+        "ids": np.arange(1, count + 1, dtype=np.int64),
+        "orders": orders.astype(np.int64),
+        "spent": spent,
+        "first_order": first_order,
+        "last_order": last_order,
+    }
+
+
+def best_of(repeat, func, *args, **kwargs):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    now = int(time.time())
+    customers = make_customers(args.customers, now)
+
+    score, result = best_of(args.repeat, score_rfm, now=now, **customers)
+    summarize, segments = best_of(args.repeat, result.segments)
+    largest = max(segments, key=lambda name: segments[name]["customers"])
+    members, _ = best_of(args.repeat, result.members, largest)
+
+    print("customers: %d" % len(result))
+    print("score_rfm:          %8.1f ms" % (score * 1000))
+    print("segments():         %8.1f ms" % (summarize * 1000))
+    print("members(%s): %8.1f ms" % (largest, members * 1000))
+    for name, totals in segments.items():
+        print("  %-20s %8d customers  average LTV %10.2f" % (name, totals["customers"], totals["average_ltv"] / 100))
+
+
+if __name__ == "__main__":
+    main()
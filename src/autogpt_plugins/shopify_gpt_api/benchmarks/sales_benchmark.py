@@ -0,0 +1,113 @@
+"""
+analyze_sales over in-memory orders: the columnar engine against the per-object Python loop it replaced.
+
+Run from the plugin directory:
+
+    python -m benchmarks.sales_benchmark --orders 25000 --items 4 --products 500
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+import shopify
+from sales_engine import SalesColumns, summarize_sales
+
+
+def python_loop(orders, products):
+    """analyze_sales as it was written before the columnar engine."""
+    total_sales = sum(float(order.total_price) for order in orders)
+    total_sales = f"${total_sales:.2f}"
+    product_data = defaultdict(lambda: {"sales": 0, "count": 0, "contribution": "0%"})
+    for order in orders:
+        for line_item in order.line_items:
+            product_data[line_item.title]["sales"] += float(line_item.price)
+            product_data[line_item.title]["count"] += line_item.quantity
+    total_products_sold = sum(data["count"] for data in product_data.values())
+    for product, data in product_data.items():
+        if data["count"] > 0:
+            data["contribution"] = f"{round((data['count'] / total_products_sold) * 100, 2)}%"
+    slow_moving_products = [
+        product.title
+        for product in products
+        if product.title not in product_data
+        or float(product_data[product.title]["contribution"].replace("%", "")) <= 5
+    ]
+    for data in product_data.values():
+        data["sales"] = f"${data['sales']:.2f}"
+    return {
+        "total_sales": total_sales,
+        "product_data": dict(product_data),
+        "slow_moving_products": slow_moving_products,
+    }
+
+
+def columnar(orders, products):
+    return summarize_sales(SalesColumns.from_orders(orders), (product.title for product in products), slow_threshold=5)
+
+
+def make_orders(count, items, products, seed=0):
+    rng = random.Random(seed)
+    orders = []
+    for order_id in range(1, count + 1):
+        line_items = []
+        for item_id in range(items):
+            product_id = rng.randint(1, len(products))
+            line_items.append(
+                {
+                    "id": order_id * items + item_id,
+                    "product_id": product_id,
+                    "title": products[product_id - 1].title,
+                    "price": "%d.%02d" % (rng.randint(1, 200), rng.randint(0, 99)),
+                    "quantity": rng.randint(1, 5),
+                }
+            )
+        total = sum(int(item["price"].replace(".", "")) for item in line_items)
+        orders.append(
+            shopify.Order(
+                {
+                    "id": order_id,
+                    "created_at": "2023-%02d-%02dT10:00:00-05:00" % (rng.randint(1, 12), rng.randint(1, 28)),
+                    "total_price": "%d.%02d" % divmod(total, 100),
+                    "line_items": line_items,
+                }
+            )
+        )
+    return orders
+
+
+def best_of(repeat, func, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=25000)
+    parser.add_argument("--items", type=int, default=4, help="line items per order")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    shopify.ShopifyResource.site = "https://benchmark.myshopify.com/admin/api/unstable"
+    products = [shopify.Product({"id": i, "title": "Product %d" % i}) for i in range(1, args.products + 1)]
+    orders = make_orders(args.orders, args.items, products)
+
+    loop, expected = best_of(args.repeat, python_loop, orders, products)
+    engine, result = best_of(args.repeat, columnar, orders, products)
+    columns = SalesColumns.from_orders(orders)
+    compute, _ = best_of(args.repeat, summarize_sales, columns, [product.title for product in products])
+
+    print("orders: %d, line items: %d, products: %d" % (args.orders, len(columns), args.products))
+    print("python loop:        %8.1f ms" % (loop * 1000))
+    print("columnar (load+run): %7.1f ms  (%.2fx)" % (engine * 1000, loop / engine))
+    print("columnar (run only): %7.1f ms  (%.2fx)" % (compute * 1000, loop / compute))
+    print("same result:        %s" % (result == expected))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""A local stand-in for the Shopify Admin REST API used by the benchmarks."""
+import json
+import threading
+import time
+from six.moves import BaseHTTPServer, socketserver
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+        # Model the TCP + TLS handshake a real shop charges for every new connection.
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        body = self.server.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Serves a fixed page of products for every GET on a background thread.
+
+    >>> with StandInServer(products=50, handshake_delay=0.02) as server:
+    ...     shopify.ShopifyResource.site = server.site
+    """
+
+    daemon_threads = True
+
+    def __init__(self, products=50, handshake_delay=0.0):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", 0), StandInHandler)
+        self.handshake_delay = handshake_delay
+        self.body = json.dumps(
+            {"products": [{"id": i, "title": "Product %d" % i, "variants": []} for i in range(1, products + 1)]}
+        ).encode()
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def site(self):
+        return "http://%s:%d/admin/api/unstable" % self.server_address
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,156 @@
+"""Per-customer order statistics folded from a stream of orders."""
+import heapq
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .sales_engine import format_cents, to_cents, to_epoch
+
+# Upper bounds of the order count buckets reported in the distribution
+ORDER_COUNT_BUCKETS = ((1, "1"), (2, "2"), (5, "3-5"), (10, "6-10"), (None, "11+"))
+
+# Accumulator slots
+ORDERS, SPENT, UNITS, FIRST, LAST = range(5)
+
+SORT_KEYS: Dict[str, Callable[[List[int]], Tuple[int, ...]]] = {
+    "total_spent": lambda acc: (acc[SPENT], acc[ORDERS]),
+    "total_orders": lambda acc: (acc[ORDERS], acc[SPENT]),
+    "last_order": lambda acc: (acc[LAST], acc[SPENT]),
+}
+
+
+def _date(epoch: int) -> Optional[str]:
+    return datetime.fromtimestamp(epoch, timezone.utc).date().isoformat() if epoch >= 0 else None
+
+
+class CustomerBehavior:
+    """
+    Orders folded into one small accumulator per customer.
+
+    add() keeps only the order count, amount spent (cents), units and first
+    and last order time of each customer, so memory grows with the number
+    of customers and not with the order history, and orders can be consumed
+    straight from a scan. summary() reports totals, distributions and one
+    page of the top customers.
+    """
+
+    def __init__(self):
+        self._customers: Dict[int, List[int]] = {}
+        self.orders = 0
+        self.guest_orders = 0
+
+    def __len__(self) -> int:
+        return len(self._customers)
+
+    def add(self, order: Any) -> None:
+        """Fold one order in; the amount spent is the sum of its line item prices."""
+        customer = order.attributes.get("customer")
+        self.orders += 1
+        if customer is None or not getattr(customer, "id", None):
+            self.guest_orders += 1
+            return
+        spent = units = 0
+        for item in order.attributes.get("line_items") or ():
+            spent += to_cents(item.price)
+            units += item.quantity or 0
+        created = to_epoch(order.attributes.get("created_at"))
+
+        acc = self._customers.get(customer.id)
+        if acc is None:
+            self._customers[customer.id] = [1, spent, units, created, created]
+            return
+        acc[ORDERS] += 1
+        acc[SPENT] += spent
+        acc[UNITS] += units
+        if created >= 0 and (acc[FIRST] < 0 or created < acc[FIRST]):
+            acc[FIRST] = created
+        if created > acc[LAST]:
+            acc[LAST] = created
+
+    def extend(self, orders: Iterable[Any]) -> "CustomerBehavior":
+        for order in orders:
+            self.add(order)
+        return self
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """The accumulators as aligned arrays: ids, orders, spent (cents), units, first_order and last_order."""
+        count = len(self._customers)
+        ids = np.fromiter(self._customers.keys(), dtype=np.int64, count=count)
+        table = np.array(list(self._customers.values()), dtype=np.int64).reshape(count, 5)
+        return {
+            "ids": ids,
+            "orders": table[:, ORDERS],
+            "spent": table[:, SPENT],
+            "units": table[:, UNITS],
+            "first_order": table[:, FIRST],
+            "last_order": table[:, LAST],
+        }
+
+    def top(self, count: int, sort_by: str = "total_spent", offset: int = 0) -> List[Tuple[int, List[int]]]:
+        """(customer id, accumulator) of the customers ranked offset+1 to offset+count by `sort_by`."""
+        key = SORT_KEYS[sort_by]
+        ranked = heapq.nlargest(offset + count, self._customers.items(), key=lambda entry: key(entry[1]))
+        return ranked[offset:]
+
+    def summary(
+        self,
+        top_k: int = 10,
+        sort_by: str = "total_spent",
+        page: int = 1,
+        details: Optional[Callable[[List[int]], Dict[int, Dict[str, Any]]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Totals, distributions and page `page` of the top customers, `top_k` per page.
+
+        `details` maps a list of customer ids to extra fields (name, email)
+        for the customers on the page.
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError("sort_by must be one of %s" % ", ".join(SORT_KEYS))
+        page = max(1, page)
+        customers = len(self._customers)
+        spent = sorted(acc[SPENT] for acc in self._customers.values())
+        revenue = sum(spent)
+        buckets = [0] * len(ORDER_COUNT_BUCKETS)
+        bounds = [bound for bound, _ in ORDER_COUNT_BUCKETS[:-1]]
+        for acc in self._customers.values():
+            buckets[bisect_right(bounds, acc[ORDERS] - 1)] += 1
+
+        ranked = self.top(top_k, sort_by, offset=(page - 1) * top_k)
+        extra = details([customer_id for customer_id, _ in ranked]) if details and ranked else {}
+        top_customers = []
+        for customer_id, acc in ranked:
+            entry = {"id": customer_id}
+            entry.update(extra.get(customer_id, {}))
+            entry.update(
+                {
+                    "total_spent": format_cents(acc[SPENT]),
+                    "total_orders": acc[ORDERS],
+                    "units": acc[UNITS],
+                    "average_order": format_cents(acc[SPENT] // acc[ORDERS]),
+                    "first_order": _date(acc[FIRST]),
+                    "last_order": _date(acc[LAST]),
+                }
+            )
+            top_customers.append(entry)
+
+        def percentile(fraction: float) -> str:
+            return format_cents(spent[min(len(spent) - 1, int(fraction * len(spent)))]) if spent else format_cents(0)
+
+        return {
+            "customers": customers,
+            "orders": self.orders,
+            "guest_orders": self.guest_orders,
+            "revenue": format_cents(revenue),
+            "average_spent": format_cents(revenue // customers if customers else 0),
+            "average_orders": round((self.orders - self.guest_orders) / customers, 2) if customers else 0,
+            "spent_percentiles": {"p50": percentile(0.5), "p90": percentile(0.9), "p99": percentile(0.99)},
+            "customers_by_order_count": {label: count for (_, label), count in zip(ORDER_COUNT_BUCKETS, buckets)},
+            "repeat_customers": customers - buckets[0],
+            "sort_by": sort_by,
+            "page": page,
+            "pages": -(-customers // top_k) if top_k else 0,
+            "top_customers": top_customers,
+        }
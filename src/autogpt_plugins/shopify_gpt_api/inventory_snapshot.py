@@ -0,0 +1,170 @@
+"""Available inventory of every variant at every location, held as one NumPy matrix."""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+import shopify
+
+
+class InventorySnapshot:
+    """
+    A variant x location matrix of available quantities.
+
+    build() reads the variants off the given products, the locations with
+    one scan, and the inventory levels with InventoryLevel.scan_by_ids, 50
+    inventory item ids and 50 location ids per request. Row i of
+    `quantities` is variant i and column j location j; `stocked` marks the
+    cells the variant's inventory item is tracked at, so a level of 0 and
+    an item not stocked at a location are told apart. Low stock, per
+    location and total figures are computed from the matrix without further
+    requests.
+
+    The matrix is rebuilt by ensure_fresh() once older than `max_age`
+    seconds. Inventory level webhooks are applied in place; a level for an
+    item or location the matrix does not know yet marks it stale instead.
+    """
+
+    def __init__(self, max_age: float = 300.0, batch_size: int = 50):
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.variant_ids = np.zeros(0, dtype=np.int64)
+        self.product_ids = np.zeros(0, dtype=np.int64)
+        self.variant_titles: List[str] = []
+        self.product_titles: List[str] = []
+        self.location_ids = np.zeros(0, dtype=np.int64)
+        self.location_names: List[str] = []
+        self.quantities = np.zeros((0, 0), dtype=np.int32)
+        self.stocked = np.zeros((0, 0), dtype=bool)
+        self._rows: Dict[int, int] = {}
+        self._columns: Dict[int, int] = {}
+        self._built_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.variant_ids)
+
+    def build(self, products: Iterable[Any]) -> None:
+        """Load the locations and the levels of the variants of `products`, replacing the current matrix."""
+        variants = [(product, variant) for product in products for variant in product.attributes.get("variants") or ()]
+        locations = list(shopify.Location.scan())
+        rows = {
+            variant.inventory_item_id: row
+            for row, (_, variant) in enumerate(variants)
+            if variant.attributes.get("inventory_item_id")
+        }
+        columns = {location.id: column for column, location in enumerate(locations)}
+        quantities = np.zeros((len(variants), len(locations)), dtype=np.int32)
+        stocked = np.zeros((len(variants), len(locations)), dtype=bool)
+        if rows and columns:
+            levels = shopify.InventoryLevel.scan_by_ids(rows, columns, batch_size=self.batch_size, prefetch=1)
+            for level in levels:
+                self._set(quantities, stocked, rows, columns, level.attributes)
+
+        with self._lock:
+            self.variant_ids = np.array([variant.id for _, variant in variants], dtype=np.int64)
+            self.product_ids = np.array([product.id for product, _ in variants], dtype=np.int64)
+            self.variant_titles = [variant.title for _, variant in variants]
+            self.product_titles = [product.title for product, _ in variants]
+            self.location_ids = np.array([location.id for location in locations], dtype=np.int64)
+            self.location_names = [location.name for location in locations]
+            self.quantities = quantities
+            self.stocked = stocked
+            self._rows = rows
+            self._columns = columns
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self, products: Callable[[], Iterable[Any]]) -> None:
+        """Build the matrix from `products()` if it was never built, is stale, or is older than `max_age`."""
+        with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+                self.build(products())
+
+    def invalidate(self) -> None:
+        """Rebuild on the next ensure_fresh(), e.g. after variants were added or removed."""
+        with self._lock:
+            self._built_at = None
+
+    @staticmethod
+    def _set(quantities, stocked, rows, columns, level: Dict[str, Any]) -> bool:
+        row = rows.get(level.get("inventory_item_id"))
+        column = columns.get(level.get("location_id"))
+        if row is None or column is None:
+            return False
+        available = level.get("available")
+        # Items whose inventory is not tracked have no available quantity
+        stocked[row, column] = available is not None
+        quantities[row, column] = available or 0
+        return True
+
+    def apply_level(self, level: Dict[str, Any]) -> None:
+        """Apply an inventory level (an inventory_levels/update or /connect payload)."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            if not self._set(self.quantities, self.stocked, self._rows, self._columns, level):
+                self._built_at = None
+
+    def remove_level(self, inventory_item_id: int, location_id: int) -> None:
+        """An inventory item is no longer stocked at a location."""
+        self.apply_level({"inventory_item_id": inventory_item_id, "location_id": location_id, "available": None})
+
+    def totals(self) -> np.ndarray:
+        """Available quantity of every variant summed over the locations it is stocked at."""
+        with self._lock:
+            return np.where(self.stocked, self.quantities, 0).sum(axis=1)
+
+    def location_totals(self, threshold: int = 10) -> List[Dict[str, Any]]:
+        """Units, variants stocked, variants at or below `threshold` and out of stock variants per location."""
+        with self._lock:
+            units = np.where(self.stocked, self.quantities, 0).sum(axis=0)
+            variants = self.stocked.sum(axis=0)
+            low = (self.stocked & (self.quantities <= threshold)).sum(axis=0)
+            out = (self.stocked & (self.quantities <= 0)).sum(axis=0)
+            return [
+                {
+                    "location_id": int(location_id),
+                    "location_name": name,
+                    "units": int(units[column]),
+                    "variants": int(variants[column]),
+                    "low_stock_variants": int(low[column]),
+                    "out_of_stock_variants": int(out[column]),
+                }
+                for column, (location_id, name) in enumerate(zip(self.location_ids, self.location_names))
+            ]
+
+    def low_stock(self, threshold: int = 10, location_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Variants with at most `threshold` available, lowest first.
+
+        Without `location_id` a variant's quantity is its total over the
+        locations it is stocked at; with it, only variants stocked at that
+        location are considered, by their quantity there.
+        """
+        with self._lock:
+            if location_id is None:
+                quantity = np.where(self.stocked, self.quantities, 0).sum(axis=1)
+                candidates = self.stocked.any(axis=1)
+            else:
+                column = self._columns.get(int(location_id))
+                if column is None:
+                    return []
+                quantity = self.quantities[:, column].astype(np.int64)
+                candidates = self.stocked[:, column]
+            rows = np.flatnonzero(candidates & (quantity <= threshold))
+            rows = rows[np.argsort(quantity[rows], kind="stable")]
+            return [
+                {
+                    "product_id": int(self.product_ids[row]),
+                    "product_name": self.product_titles[row],
+                    "variant_id": int(self.variant_ids[row]),
+                    "variant_name": self.variant_titles[row],
+                    "inventory_quantity": int(quantity[row]),
+                    "locations": {
+                        self.location_names[column]: int(self.quantities[row, column])
+                        for column in np.flatnonzero(self.stocked[row])
+                    },
+                }
+                for row in rows.tolist()
+            ]
@@ -0,0 +1,218 @@
+"""An in-memory index of the store's products for title lookups and searches."""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import shopify
+
+
+def trigrams(text: str) -> Set[str]:
+    """The distinct three character substrings of `text`."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ProductIndex:
+    """
+    Products by id, casefolded title and title trigram.
+
+    The index is built with one scan of the catalog (only id, title and
+    updated_at are requested) the first time it is used. Afterwards it is
+    brought up to date incrementally: once `max_age` seconds have passed,
+    the next lookup fetches only the products updated since the newest
+    updated_at seen so far, but no later than the start of the last sync,
+    since the scan pages by id and a product updated behind it is only
+    caught by the next one. Deletions are not visible through updated_at,
+    so the whole index is rebuilt every `rebuild_after` seconds; products
+    created, updated or deleted through the plugin are applied right away.
+    """
+
+    FIELDS = ("id", "title", "updated_at")
+
+    def __init__(self, max_age: float = 60.0, rebuild_after: float = 300.0):
+        self.max_age = max_age
+        self.rebuild_after = rebuild_after
+        self._titles: Dict[int, str] = {}
+        self._by_title: Dict[str, Set[int]] = defaultdict(set)
+        self._by_trigram: Dict[str, Set[int]] = defaultdict(set)
+        self._watermark: Optional[datetime] = None
+        self._built_at: Optional[float] = None
+        self._synced_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def build(self) -> None:
+        """Load every product, replacing the current contents."""
+        with self._lock:
+            self._titles.clear()
+            self._by_title.clear()
+            self._by_trigram.clear()
+            self._watermark = None
+            started = datetime.now(timezone.utc).replace(microsecond=0)
+            self._sync(shopify.Product.scan(fields=self.FIELDS, prefetch=1), started)
+            self._built_at = self._synced_at
+
+    def refresh(self) -> None:
+        """Apply the products updated since the last sync."""
+        with self._lock:
+            if self._watermark is None:
+                self.build()
+                return
+            started = datetime.now(timezone.utc).replace(microsecond=0)
+            updated = shopify.Product.scan(fields=self.FIELDS, updated_at_min=self._watermark.isoformat())
+            self._sync(updated, started)
+
+    def ensure_fresh(self) -> None:
+        """Build or refresh the index if it is older than its freshness bounds."""
+        with self._lock:
+            now = time.monotonic()
+            if self._built_at is None or now - self._built_at > self.rebuild_after:
+                self.build()
+            elif now - self._synced_at > self.max_age:
+                self.refresh()
+
+    def _sync(self, products: Iterable[shopify.Product], started: datetime) -> None:
+        newest = self._watermark
+        for product in products:
+            self.add(product)
+            # Only synced products move the watermark, a product saved through the
+            # plugin must not hide changes made elsewhere since the last sync.
+            updated_at = getattr(product, "updated_at", None)
+            if updated_at:
+                updated_at = datetime.fromisoformat(updated_at.replace("Z", "+00:00"))
+                if newest is None or updated_at > newest:
+                    newest = updated_at
+        if newest is not None:
+            self._watermark = min(newest, started)
+        self._synced_at = time.monotonic()
+
+    def add(self, product: shopify.Product) -> None:
+        """Index a product, replacing its previous entry."""
+        with self._lock:
+            self.remove(product.id)
+            title = product.title or ""
+            folded = title.casefold()
+            self._titles[product.id] = title
+            self._by_title[folded].add(product.id)
+            for trigram in trigrams(folded):
+                self._by_trigram[trigram].add(product.id)
+
+    def remove(self, product_id: int) -> None:
+        """Drop a product from the index."""
+        with self._lock:
+            title = self._titles.pop(product_id, None)
+            if title is None:
+                return
+            folded = title.casefold()
+            self._discard(self._by_title, folded, product_id)
+            for trigram in trigrams(folded):
+                self._discard(self._by_trigram, trigram, product_id)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[int]], key: str, product_id: int) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(product_id)
+            if not ids:
+                del index[key]
+
+    def titles(self) -> List[str]:
+        """Every product title, by product id."""
+        self.ensure_fresh()
+        with self._lock:
+            return [self._titles[product_id] for product_id in sorted(self._titles)]
+
+    def title(self, product_id: int) -> Optional[str]:
+        """The title of a product, or None if it is not in the index."""
+        self.ensure_fresh()
+        return self._titles.get(product_id)
+
+    def find_title(self, title: str) -> Optional[int]:
+        """The id of the product titled `title` (case-insensitively), or None."""
+        self.ensure_fresh()
+        with self._lock:
+            ids = self._by_title.get(title.casefold())
+            return min(ids) if ids else None
+
+    def search(self, text: str) -> List[Tuple[int, str]]:
+        """(id, title) of the products whose title contains `text`, case-insensitively, by id."""
+        self.ensure_fresh()
+        folded = text.casefold()
+        with self._lock:
+            query = trigrams(folded)
+            if query:
+                candidates = set.intersection(*(self._by_trigram.get(trigram, set()) for trigram in query))
+            else:
+                candidates = self._titles.keys()
+            return sorted(
+                (product_id, self._titles[product_id])
+                for product_id in candidates
+                if folded in self._titles[product_id].casefold()
+            )
+
+    def similar(self, text: str, limit: int = 5, threshold: float = 0.3) -> List[Tuple[int, str, float]]:
+        """(id, title, score) of the titles most similar to `text`, tolerating typos.
+
+        The score is the share of the trigrams of `text` found in the title;
+        ties go to the shorter title.
+        """
+        self.ensure_fresh()
+        query = trigrams(text.casefold())
+        if not query:
+            return []
+        with self._lock:
+            shared: Dict[int, int] = defaultdict(int)
+            for trigram in query:
+                for product_id in self._by_trigram.get(trigram, ()):
+                    shared[product_id] += 1
+            scored = [
+                (product_id, self._titles[product_id], round(count / len(query), 3))
+                for product_id, count in shared.items()
+                if count / len(query) >= threshold
+            ]
+        scored.sort(key=lambda match: (-match[2], len(match[1]), match[0]))
+        return scored[:limit]
+
+
+class TitleResolver:
+    """
+    Product titles by id, fetched in batches and memoized.
+
+    resolve() collects the ids it has not seen yet and fetches them 250 at a
+    time with ?ids=, so titling the line items of an order history costs one
+    request per 250 distinct products instead of one per line item. Titles
+    are kept for `max_age` seconds; products that no longer exist resolve to
+    None.
+    """
+
+    def __init__(self, max_age: float = 3600.0):
+        self.max_age = max_age
+        self._titles: Dict[int, Tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, product_ids: Iterable[Optional[int]]) -> Dict[int, Optional[str]]:
+        """The title of each of `product_ids` (None ids are skipped)."""
+        now = time.monotonic()
+        wanted = {product_id for product_id in product_ids if product_id}
+        with self._lock:
+            missing = [
+                product_id
+                for product_id in wanted
+                if product_id not in self._titles or now - self._titles[product_id][1] > self.max_age
+            ]
+        if missing:
+            found = shopify.Product.find_by_ids(missing, fields=("id", "title"))
+            with self._lock:
+                for product_id in missing:
+                    product = found.get(product_id)
+                    self._titles[product_id] = (product.title if product else None, now)
+        with self._lock:
+            return {product_id: self._titles.get(product_id, (None, now))[0] for product_id in wanted}
+
+    def forget(self, product_id: int) -> None:
+        """Drop a memoized title, e.g. after the product changed."""
+        with self._lock:
+            self._titles.pop(product_id, None)
@@ -0,0 +1,163 @@
+"""Recency / frequency / monetary segmentation and lifetime value over NumPy arrays."""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+DAY = 86400
+
+# Segments by recency and frequency score, first match wins
+SEGMENTS = (
+    ("champions", lambda r, f: (r >= 4) & (f >= 4)),
+    ("loyal", lambda r, f: (r >= 3) & (f >= 3)),
+    ("cant_lose", lambda r, f: (r == 1) & (f >= 4)),
+    ("at_risk", lambda r, f: (r <= 2) & (f >= 3)),
+    ("new_customers", lambda r, f: (r >= 4) & (f == 1)),
+    ("potential_loyalists", lambda r, f: (r >= 4) & (f == 2)),
+    ("promising", lambda r, f: r == 3),
+    ("hibernating", lambda r, f: r == 2),
+    ("lost", lambda r, f: r == 1),
+)
+SEGMENT_NAMES = np.array([name for name, _ in SEGMENTS] + ["other"])
+
+
+def quantile_scores(values: np.ndarray, bins: int = 5, higher_is_better: bool = True) -> np.ndarray:
+    """
+    Score each value 1..`bins` by the share of values it beats.
+
+    Ties share the score of their lowest rank, so when most customers
+    ordered once they all score 1 on frequency rather than spilling into the
+    higher bins.
+    """
+    values = np.asarray(values)
+    if not len(values):
+        return np.zeros(0, dtype=np.int8)
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+    # Start and end of each run of equal values in sorted order
+    first = np.empty(len(values), dtype=bool)
+    first[0] = True
+    np.not_equal(ordered[1:], ordered[:-1], out=first[1:])
+    starts = np.flatnonzero(first)
+    run = np.cumsum(first) - 1
+    if higher_is_better:
+        beaten_sorted = starts[run]
+    else:
+        beaten_sorted = len(values) - np.append(starts[1:], len(values))[run]
+    beaten = np.empty(len(values), dtype=np.int64)
+    beaten[order] = beaten_sorted
+    return (1 + beaten * bins // len(values)).astype(np.int8)
+
+
+class RFMResult:
+    """
+    Scores, segment and lifetime value of every customer, as arrays aligned with `ids`.
+
+    recency is in days since the last order, frequency the number of
+    orders, monetary the amount spent in cents. ltv is the predicted value
+    over `lifespan_years`: average order value times orders per year of
+    tenure (at least `min_tenure_days`) times the lifespan.
+    """
+
+    def __init__(self, ids, recency, frequency, monetary, r, f, m, segment, ltv, computed_at):
+        self.ids = ids
+        self.recency = recency
+        self.frequency = frequency
+        self.monetary = monetary
+        self.r = r
+        self.f = f
+        self.m = m
+        self.segment = segment
+        self.ltv = ltv
+        self.computed_at = computed_at
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def segment_names(self) -> np.ndarray:
+        return SEGMENT_NAMES[self.segment]
+
+    def members(self, name: str) -> np.ndarray:
+        """Positions of the customers in segment `name`, highest LTV first."""
+        if name not in SEGMENT_NAMES:
+            raise ValueError("segment must be one of %s" % ", ".join(SEGMENT_NAMES))
+        code = int(np.flatnonzero(SEGMENT_NAMES == name)[0])
+        positions = np.flatnonzero(self.segment == code)
+        return positions[np.argsort(-self.ltv[positions], kind="stable")]
+
+    def segments(self) -> Dict[str, Dict[str, Any]]:
+        """Size, revenue (cents) and average LTV (cents) per segment."""
+        codes = len(SEGMENT_NAMES)
+        sizes = np.bincount(self.segment, minlength=codes)
+        revenue = np.bincount(self.segment, weights=self.monetary, minlength=codes)
+        ltv = np.bincount(self.segment, weights=self.ltv, minlength=codes)
+        return {
+            str(name): {
+                "customers": int(sizes[code]),
+                "revenue": int(revenue[code]),
+                "average_ltv": int(ltv[code] / sizes[code]) if sizes[code] else 0,
+            }
+            for code, name in enumerate(SEGMENT_NAMES)
+            if sizes[code]
+        }
+
+
+def score_rfm(
+    ids: np.ndarray,
+    orders: np.ndarray,
+    spent: np.ndarray,
+    first_order: np.ndarray,
+    last_order: np.ndarray,
+    now: Optional[float] = None,
+    lifespan_years: float = 3.0,
+    min_tenure_days: float = 30.0,
+) -> RFMResult:
+    """
+    Quantile RFM scores (1-5, 5 best), segments and LTV for every customer.
+
+    Args:
+        ids: Customer ids.
+        orders: Orders per customer.
+        spent: Amount spent per customer, in cents.
+        first_order, last_order: Unix seconds of each customer's first and last order.
+        now: The reference time for recency, defaults to the current time.
+    """
+    now = time.time() if now is None else now
+    recency = np.maximum(now - last_order, 0) / DAY
+    r = quantile_scores(recency, higher_is_better=False)
+    f = quantile_scores(orders)
+    m = quantile_scores(spent)
+
+    segment = np.full(len(ids), len(SEGMENTS), dtype=np.int8)
+    unassigned = np.ones(len(ids), dtype=bool)
+    for code, (_, rule) in enumerate(SEGMENTS):
+        match = unassigned & rule(r, f)
+        segment[match] = code
+        unassigned &= ~match
+
+    tenure_years = np.maximum(now - first_order, min_tenure_days * DAY) / (365.25 * DAY)
+    average_order = spent / np.maximum(orders, 1)
+    ltv = average_order * (orders / tenure_years) * lifespan_years
+    return RFMResult(ids, recency, orders, spent, r, f, m, segment, ltv, now)
+
+
+class SegmentCache:
+    """The last RFMResult, reused for `max_age` seconds so drilling into segments does not recompute them."""
+
+    def __init__(self, max_age: float = 900.0):
+        self.max_age = max_age
+        self._result: Optional[RFMResult] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, compute: Callable[[], RFMResult]) -> RFMResult:
+        with self._lock:
+            if self._result is None or time.monotonic() - self._loaded_at > self.max_age:
+                self._result = compute()
+                self._loaded_at = time.monotonic()
+            return self._result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._result = None
@@ -0,0 +1,449 @@
+"""Sales totals and daily rollups kept up to date from an order watermark."""
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import shopify
+
+from .sales_engine import to_cents
+
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_totals (
+    order_id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    revenue_cents INTEGER NOT NULL,
+    units INTEGER NOT NULL,
+    refunded_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    product_id INTEGER NOT NULL,
+    sales_cents INTEGER NOT NULL,
+    units INTEGER NOT NULL,
+    refunded_cents INTEGER NOT NULL,
+    refunded_units INTEGER NOT NULL,
+    PRIMARY KEY (order_id, title, product_id)
+);
+CREATE TABLE IF NOT EXISTS product_sales (
+    title TEXT PRIMARY KEY,
+    sales_cents INTEGER NOT NULL,
+    units INTEGER NOT NULL,
+    orders INTEGER NOT NULL,
+    refunded_cents INTEGER NOT NULL,
+    refunded_units INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_product_sales (
+    day TEXT NOT NULL,
+    title TEXT NOT NULL,
+    product_id INTEGER NOT NULL,
+    sales_cents INTEGER NOT NULL,
+    units INTEGER NOT NULL,
+    orders INTEGER NOT NULL,
+    refunded_cents INTEGER NOT NULL,
+    refunded_units INTEGER NOT NULL,
+    PRIMARY KEY (day, title, product_id)
+);
+CREATE TABLE IF NOT EXISTS daily_title_sales (
+    day TEXT NOT NULL,
+    title TEXT NOT NULL,
+    sales_cents INTEGER NOT NULL,
+    units INTEGER NOT NULL,
+    orders INTEGER NOT NULL,
+    refunded_cents INTEGER NOT NULL,
+    refunded_units INTEGER NOT NULL,
+    PRIMARY KEY (day, title)
+);
+CREATE TABLE IF NOT EXISTS daily_sales (
+    day TEXT PRIMARY KEY,
+    revenue_cents INTEGER NOT NULL,
+    units INTEGER NOT NULL,
+    orders INTEGER NOT NULL,
+    refunded_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_channel_sales (
+    day TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    revenue_cents INTEGER NOT NULL,
+    units INTEGER NOT NULL,
+    orders INTEGER NOT NULL,
+    refunded_cents INTEGER NOT NULL,
+    PRIMARY KEY (day, channel)
+);
+CREATE TABLE IF NOT EXISTS collections (
+    id INTEGER PRIMARY KEY,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS product_collections (
+    product_id INTEGER NOT NULL,
+    collection_id INTEGER NOT NULL,
+    PRIMARY KEY (product_id, collection_id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at REAL
+);
+"""
+
+TABLES = (
+    "order_totals",
+    "order_lines",
+    "product_sales",
+    "daily_product_sales",
+    "daily_title_sales",
+    "daily_sales",
+    "daily_channel_sales",
+    "collections",
+    "product_collections",
+    "sync_state",
+)
+
+# What the aggregates read from an order
+ORDER_FIELDS = ("id", "created_at", "updated_at", "source_name", "total_price", "line_items", "refunds")
+
+PRODUCT_TOTALS = ("sales_cents", "units", "orders", "refunded_cents", "refunded_units")
+ORDER_TOTALS = ("revenue_cents", "units", "orders", "refunded_cents")
+
+
+def collection_members() -> Tuple[List[Any], List[Tuple[int, int]]]:
+    """The custom and smart collections (id and title) and the (product id, collection id) of their products."""
+    collections = list(shopify.CustomCollection.scan(fields=("id", "title")))
+    collections += shopify.SmartCollection.scan(fields=("id", "title"))
+    members = [
+        (product.id, collection.id)
+        for collection in collections
+        for product in shopify.Product.scan(collection_id=collection.id, fields=("id",))
+    ]
+    return collections, members
+
+
+class CollectionMembers:
+    """
+    The result of collection_members(), reused for `max_age` seconds.
+
+    Loading the memberships takes one paged scan per collection, so the
+    analyses that join sales to collections without the aggregates read
+    them from here instead of scanning on every call.
+    """
+
+    def __init__(self, max_age: float = 3600.0):
+        self.max_age = max_age
+        self._members: Optional[Tuple[List[Any], List[Tuple[int, int]]]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Tuple[List[Any], List[Tuple[int, int]]]:
+        with self._lock:
+            if self._members is None or time.monotonic() - self._loaded_at > self.max_age:
+                self._members = collection_members()
+                self._loaded_at = time.monotonic()
+            return self._members
+
+    def clear(self) -> None:
+        with self._lock:
+            self._members = None
+
+
+def _get(resource: Any, key: str, default: Any = None) -> Any:
+    attributes = getattr(resource, "attributes", resource)
+    value = attributes.get(key)
+    return default if value is None else value
+
+
+class SalesAggregates:
+    """
+    Revenue, units, order counts and refunds per product, per day and per
+    channel, stored in SQLite, with daily rollups so any date range is a
+    small indexed sum.
+
+    Every counted order keeps its own contribution (its totals and, per line
+    item title, its sales, units and refunds). When an order comes back with
+    a newer updated_at, because it was edited or refunded, its previous
+    contribution is subtracted from every rollup before the new one is
+    added, so applying an order is idempotent. The first sync loads the
+    history with created_at partitioned scans when a rate limiter is
+    configured (ShopifyConnection.rate_limiter); later ones fetch only the
+    orders updated since the watermark, so keeping the rollups current
+    costs O(changed orders) in API calls and CPU.
+
+    Days are the calendar dates of created_at in the shop's own UTC offset,
+    channels the orders' source_name. Products are keyed by line item title,
+    as analyze_sales reports them, and an order counts once per title however
+    many line items or product ids share it; collections are joined in
+    through the product ids at query time.
+    """
+
+    def __init__(
+        self, path: str, max_age: float = 300.0, collections_max_age: float = 3600.0, partitions: int = 4
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.collections_max_age = collections_max_age
+        self.partitions = partitions
+        self._lock = threading.Lock()
+        with closing(self._connect()) as db:
+            if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                for table in TABLES:
+                    db.execute("DROP TABLE IF EXISTS %s" % table)
+                db.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _state(self, db: sqlite3.Connection, name: str) -> Tuple[Optional[str], Optional[float]]:
+        row = db.execute("SELECT watermark, synced_at FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row if row else (None, None)
+
+    def sync(self) -> int:
+        """Apply the orders updated since the watermark; returns how many were applied."""
+        with self._lock, closing(self._connect()) as db:
+            watermark, _ = self._state(db, "orders")
+            if watermark or shopify.ShopifyConnection.rate_limiter is None:
+                # Partitions need a shared rate limiter; without one the history is read with a single cursor
+                changed = {"updated_at_min": watermark} if watermark else {}
+                orders = shopify.Order.scan(fields=ORDER_FIELDS, prefetch=1, stream=True, status="any", **changed)
+            else:
+                orders = shopify.Order.partitioned_scan(
+                    partitions=self.partitions, fields=ORDER_FIELDS, stream=True, status="any"
+                )
+
+            count = 0
+            newest = self._parse(watermark)
+            started = datetime.now(timezone.utc).replace(microsecond=0)
+            with db:
+                for order in orders:
+                    self._apply(db, order)
+                    count += 1
+                    updated_at = self._parse(_get(order, "updated_at"))
+                    if updated_at and (newest is None or updated_at > newest):
+                        newest, watermark = updated_at, _get(order, "updated_at")
+                # An order updated while the scan ran may have been read before its update, so
+                # the next sync starts no later than when this one did.
+                if newest is not None and newest > started:
+                    watermark = started.isoformat()
+                db.execute(
+                    "INSERT OR REPLACE INTO sync_state VALUES ('orders', ?, ?)", (watermark, time.time())
+                )
+            return count
+
+    def sync_collections(self) -> None:
+        """Reload which products belong to which custom and smart collection."""
+        collections, members = collection_members()
+        with self._lock, closing(self._connect()) as db, db:
+            db.execute("DELETE FROM collections")
+            db.execute("DELETE FROM product_collections")
+            db.executemany("INSERT INTO collections VALUES (?, ?)", [(c.id, c.title) for c in collections])
+            db.executemany("INSERT OR IGNORE INTO product_collections VALUES (?, ?)", members)
+            db.execute("INSERT OR REPLACE INTO sync_state VALUES ('collections', NULL, ?)", (time.time(),))
+
+    def ensure_fresh(self, collections: bool = False) -> None:
+        """Sync the orders (and the collection memberships) if they are older than their max age."""
+        with closing(self._connect()) as db:
+            _, orders_synced = self._state(db, "orders")
+            _, collections_synced = self._state(db, "collections")
+        now = time.time()
+        if orders_synced is None or now - orders_synced > self.max_age:
+            self.sync()
+        if collections and (collections_synced is None or now - collections_synced > self.collections_max_age):
+            self.sync_collections()
+
+    def apply(self, order: Any) -> None:
+        """Count an order received outside a sync (e.g. from a webhook), replacing its previous contribution."""
+        with self._lock, closing(self._connect()) as db, db:
+            self._apply(db, order)
+
+    def remove(self, order_id: int) -> None:
+        """Stop counting a deleted order."""
+        with self._lock, closing(self._connect()) as db, db:
+            self._remove(db, order_id)
+
+    def rebuild(self) -> None:
+        """Drop every total and count again from scratch."""
+        with self._lock, closing(self._connect()) as db, db:
+            for table in TABLES:
+                db.execute("DELETE FROM %s" % table)
+        self.sync()
+
+    @staticmethod
+    def _parse(timestamp: Optional[str]) -> Optional[datetime]:
+        if not timestamp:
+            return None
+        return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+    @staticmethod
+    def contribution(order: Any) -> Tuple[Tuple[Any, ...], List[Tuple[Any, ...]]]:
+        """
+        An order's (day, channel, revenue, units, refunded) and, per line item
+        title and product, its (title, product_id, sales, units, refunded, refunded units).
+        """
+        lines: Dict[Tuple[str, int], List[int]] = {}
+        keys: Dict[Any, Tuple[str, int]] = {}
+        for item in _get(order, "line_items", ()):
+            key = (_get(item, "title", ""), _get(item, "product_id", 0))
+            keys[_get(item, "id")] = key
+            line = lines.setdefault(key, [0, 0, 0, 0])
+            line[0] += to_cents(_get(item, "price"))
+            line[1] += _get(item, "quantity", 0)
+
+        refunded = 0
+        for refund in _get(order, "refunds", ()):
+            for refund_item in _get(refund, "refund_line_items", ()):
+                cents = to_cents(_get(refund_item, "subtotal"))
+                refunded += cents
+                key = keys.get(_get(refund_item, "line_item_id"))
+                if key is not None:
+                    lines[key][2] += cents
+                    lines[key][3] += _get(refund_item, "quantity", 0)
+
+        day = (_get(order, "created_at") or "")[:10]
+        units = sum(line[1] for line in lines.values())
+        totals = (day, _get(order, "source_name", ""), to_cents(_get(order, "total_price")), units, refunded)
+        return totals, [key + tuple(line) for key, line in lines.items()]
+
+    def _apply(self, db: sqlite3.Connection, order: Any) -> None:
+        order_id = _get(order, "id")
+        self._remove(db, order_id)
+        (day, channel, revenue, units, refunded), lines = self.contribution(order)
+        db.execute(
+            "INSERT INTO order_totals VALUES (?, ?, ?, ?, ?, ?)", (order_id, day, channel, revenue, units, refunded)
+        )
+        self._add_order(db, day, channel, (revenue, units, 1, refunded))
+        db.executemany("INSERT INTO order_lines VALUES (?, ?, ?, ?, ?, ?, ?)", [(order_id,) + line for line in lines])
+        self._add_lines(db, day, lines, 1)
+
+    def _remove(self, db: sqlite3.Connection, order_id: int) -> None:
+        row = db.execute(
+            "SELECT day, channel, revenue_cents, units, refunded_cents FROM order_totals WHERE order_id = ?",
+            (order_id,),
+        ).fetchone()
+        if row is None:
+            return
+        day, channel, revenue, units, refunded = row
+        self._add_order(db, day, channel, (-revenue, -units, -1, -refunded))
+        lines = db.execute(
+            "SELECT title, product_id, sales_cents, units, refunded_cents, refunded_units "
+            "FROM order_lines WHERE order_id = ?",
+            (order_id,),
+        ).fetchall()
+        self._add_lines(db, day, lines, -1)
+        db.execute("DELETE FROM order_lines WHERE order_id = ?", (order_id,))
+        db.execute("DELETE FROM order_totals WHERE order_id = ?", (order_id,))
+
+    def _add_order(self, db: sqlite3.Connection, day: str, channel: str, values: Sequence[int]) -> None:
+        self._bump(db, "daily_sales", {"day": day}, ORDER_TOTALS, values)
+        self._bump(db, "daily_channel_sales", {"day": day, "channel": channel}, ORDER_TOTALS, values)
+
+    def _add_lines(self, db: sqlite3.Connection, day: str, lines: Sequence[Tuple[Any, ...]], sign: int) -> None:
+        """Add (sign 1) or subtract (sign -1) the line groups of one order, counting the order once per title."""
+        titles: Dict[str, List[int]] = {}
+        for title, product_id, *values in lines:
+            sales, units, refunded, refunded_units = (sign * value for value in values)
+            keys = {"day": day, "title": title, "product_id": product_id}
+            self._bump(db, "daily_product_sales", keys, PRODUCT_TOTALS, (sales, units, sign, refunded, refunded_units))
+            totals = titles.setdefault(title, [0, 0, 0, 0])
+            totals[:] = [total + value for total, value in zip(totals, (sales, units, refunded, refunded_units))]
+        for title, (sales, units, refunded, refunded_units) in titles.items():
+            values = (sales, units, sign, refunded, refunded_units)
+            self._bump(db, "product_sales", {"title": title}, PRODUCT_TOTALS, values)
+            self._bump(db, "daily_title_sales", {"day": day, "title": title}, PRODUCT_TOTALS, values)
+
+    @staticmethod
+    def _bump(
+        db: sqlite3.Connection, table: str, keys: Dict[str, Any], columns: Sequence[str], values: Sequence[int]
+    ) -> None:
+        """Add `values` to the `columns` of the row of `table` identified by `keys`; rows left with no orders go."""
+        names = list(keys) + list(columns)
+        db.execute(
+            "INSERT INTO %s (%s) VALUES (%s) ON CONFLICT (%s) DO UPDATE SET %s"
+            % (
+                table,
+                ", ".join(names),
+                ", ".join("?" * len(names)),
+                ", ".join(keys),
+                ", ".join("%s = %s + excluded.%s" % (column, column, column) for column in columns),
+            ),
+            list(keys.values()) + list(values),
+        )
+        where = " AND ".join("%s = ?" % key for key in keys)
+        db.execute("DELETE FROM %s WHERE %s AND orders = 0" % (table, where), list(keys.values()))
+
+    @staticmethod
+    def _days(start: Optional[str], end: Optional[str]) -> Tuple[str, str]:
+        return start or "", end or "9999-12-31"
+
+    def product_sales(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Sales and refunds (cents), units and order count by title, for orders created from `start` to `end`."""
+        self.ensure_fresh()
+        with closing(self._connect()) as db:
+            if start is None and end is None:
+                rows = db.execute("SELECT title, %s FROM product_sales" % ", ".join(PRODUCT_TOTALS)).fetchall()
+            else:
+                rows = db.execute(
+                    "SELECT title, %s FROM daily_title_sales WHERE day >= ? AND day <= ? GROUP BY title"
+                    % ", ".join("SUM(%s)" % column for column in PRODUCT_TOTALS),
+                    self._days(start, end),
+                ).fetchall()
+        return {
+            title: {"sales": sales, "units": units, "orders": orders, "refunded": refunded, "refunded_units": r_units}
+            for title, sales, units, orders, refunded, r_units in rows
+        }
+
+    def collection_sales(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Sales and refunds (cents) and units by collection title, for orders created from `start` to `end`."""
+        self.ensure_fresh(collections=True)
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT c.title, SUM(s.sales_cents), SUM(s.units), SUM(s.refunded_cents) "
+                "FROM daily_product_sales s "
+                "JOIN product_collections pc ON pc.product_id = s.product_id "
+                "JOIN collections c ON c.id = pc.collection_id "
+                "WHERE s.day >= ? AND s.day <= ? GROUP BY c.id",
+                self._days(start, end),
+            ).fetchall()
+        return {title: {"sales": sales, "units": units, "refunded": refunded} for title, sales, units, refunded in rows}
+
+    def channel_sales(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Revenue and refunds (cents), units and order count by channel, for orders created from `start` to `end`."""
+        self.ensure_fresh()
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT channel, %s FROM daily_channel_sales WHERE day >= ? AND day <= ? GROUP BY channel"
+                % ", ".join("SUM(%s)" % column for column in ORDER_TOTALS),
+                self._days(start, end),
+            ).fetchall()
+        return {
+            channel: {"revenue": revenue, "units": units, "orders": orders, "refunded": refunded}
+            for channel, revenue, units, orders, refunded in rows
+        }
+
+    def daily_sales(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Revenue and refunds (cents), units and order count per day, oldest first, from `start` to `end` inclusive."""
+        self.ensure_fresh()
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT day, %s FROM daily_sales WHERE day >= ? AND day <= ? ORDER BY day" % ", ".join(ORDER_TOTALS),
+                self._days(start, end),
+            ).fetchall()
+        return [
+            {"day": day, "revenue": revenue, "units": units, "orders": orders, "refunded": refunded}
+            for day, revenue, units, orders, refunded in rows
+        ]
+
+    def total_revenue(self, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        """The summed total_price of the orders created from `start` to `end`, in cents."""
+        self.ensure_fresh()
+        with closing(self._connect()) as db:
+            return db.execute(
+                "SELECT COALESCE(SUM(revenue_cents), 0) FROM daily_sales WHERE day >= ? AND day <= ?",
+                self._days(start, end),
+            ).fetchone()[0]
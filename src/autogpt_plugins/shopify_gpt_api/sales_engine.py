@@ -0,0 +1,181 @@
+"""Columnar sales analytics over NumPy arrays."""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+
+def to_cents(amount: Any) -> int:
+    """A money string such as "19.99" as integer cents."""
+    return int(round(float(amount or 0) * 100))
+
+
+def to_epoch(timestamp: Any) -> int:
+    """An ISO 8601 timestamp as Unix seconds, -1 when it is missing."""
+    if not timestamp:
+        return -1
+    return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
+
+
+class SalesColumns:
+    """
+    Orders and their line items as parallel arrays.
+
+    Order columns are indexed by order, line item columns by line item, and
+    `item_order` maps each line item to the position of its order. Money is
+    held in integer cents and timestamps in Unix seconds. Line item titles
+    are factorized: `item_title` holds codes into `titles`, so grouping by
+    product is a bincount. Objects are read once while loading; everything
+    computed afterwards is vectorized.
+    """
+
+    def __init__(
+        self,
+        order_ids: np.ndarray,
+        order_created: np.ndarray,
+        order_total: np.ndarray,
+        item_order: np.ndarray,
+        item_product: np.ndarray,
+        item_title: np.ndarray,
+        item_price: np.ndarray,
+        item_quantity: np.ndarray,
+        titles: List[str],
+    ):
+        self.order_ids = order_ids
+        self.order_created = order_created
+        self.order_total = order_total
+        self.item_order = item_order
+        self.item_product = item_product
+        self.item_title = item_title
+        self.item_price = item_price
+        self.item_quantity = item_quantity
+        self.titles = titles
+
+    def __len__(self) -> int:
+        return len(self.item_order)
+
+    @classmethod
+    def from_orders(cls, orders: Iterable[Any]) -> "SalesColumns":
+        """Load shopify.Order objects (or anything with the same attributes)."""
+        order_ids: List[int] = []
+        order_created: List[int] = []
+        order_total: List[int] = []
+        item_order: List[int] = []
+        item_product: List[int] = []
+        item_title: List[int] = []
+        item_price: List[int] = []
+        item_quantity: List[int] = []
+        codes: Dict[str, int] = {}
+
+        for position, order in enumerate(orders):
+            attributes = order.attributes
+            order_ids.append(attributes.get("id") or 0)
+            order_created.append(to_epoch(attributes.get("created_at")))
+            order_total.append(to_cents(attributes.get("total_price")))
+            for item in attributes.get("line_items") or ():
+                item = getattr(item, "attributes", item)
+                title = item.get("title")
+                code = codes.get(title)
+                if code is None:
+                    code = codes[title] = len(codes)
+                item_order.append(position)
+                item_product.append(item.get("product_id") or 0)
+                item_title.append(code)
+                item_price.append(to_cents(item.get("price")))
+                item_quantity.append(item.get("quantity") or 0)
+
+        return cls(
+            np.array(order_ids, dtype=np.int64),
+            np.array(order_created, dtype=np.int64),
+            np.array(order_total, dtype=np.int64),
+            np.array(item_order, dtype=np.int64),
+            np.array(item_product, dtype=np.int64),
+            np.array(item_title, dtype=np.int64),
+            np.array(item_price, dtype=np.int64),
+            np.array(item_quantity, dtype=np.int64),
+            list(codes),
+        )
+
+
+def format_cents(cents: int) -> str:
+    return "$%d.%02d" % divmod(int(cents), 100) if cents >= 0 else "-" + format_cents(-cents)
+
+
+def sales_by_title(columns: SalesColumns) -> Dict[str, np.ndarray]:
+    """Summed line item prices (cents) and quantities per title code."""
+    size = len(columns.titles)
+    return {
+        "sales": np.bincount(columns.item_title, weights=columns.item_price, minlength=size).astype(np.int64),
+        "count": np.bincount(columns.item_title, weights=columns.item_quantity, minlength=size).astype(np.int64),
+    }
+
+
+def sales_by_collection(
+    columns: SalesColumns, members: Iterable[Tuple[int, int]], collection_titles: Dict[int, str]
+) -> Dict[str, int]:
+    """Summed line item prices (cents) per collection title, over the (product id, collection id) `members`.
+
+    Collections none of whose products sold are left out, as in SalesAggregates.collection_sales.
+    """
+    product_ids, codes = np.unique(columns.item_product, return_inverse=True)
+    sales = np.bincount(codes, weights=columns.item_price, minlength=len(product_ids)).astype(np.int64)
+    by_product = dict(zip(product_ids.tolist(), sales.tolist()))
+    totals: Dict[str, int] = {}
+    for product_id, collection_id in members:
+        if product_id in by_product:
+            title = collection_titles[collection_id]
+            totals[title] = totals.get(title, 0) + by_product[product_id]
+    return totals
+
+
+def summarize_sales(
+    columns: SalesColumns, product_titles: Iterable[str], slow_threshold: float = 5.0
+) -> Dict[str, Any]:
+    """
+    Total sales, per product sales, sold count and share of units sold, and slow movers.
+
+    The result has the shape analyze_sales returns: a product's "sales" is
+    the sum of its line item prices, its "contribution" its share of all
+    units sold, and a product in `product_titles` is slow moving when its
+    contribution is at most `slow_threshold` percent or it never sold.
+    """
+    grouped = sales_by_title(columns)
+    return summarize_totals(
+        columns.titles, grouped["sales"], grouped["count"], columns.order_total.sum(), product_titles, slow_threshold
+    )
+
+
+def summarize_totals(
+    titles: List[str],
+    sales: np.ndarray,
+    count: np.ndarray,
+    total_cents: int,
+    product_titles: Iterable[str],
+    slow_threshold: float = 5.0,
+) -> Dict[str, Any]:
+    """summarize_sales from totals already grouped by title: sales (cents) and units sold, aligned with `titles`."""
+    sales = np.asarray(sales, dtype=np.int64)
+    count = np.asarray(count, dtype=np.int64)
+    total_count = int(count.sum())
+    # One value per product, rounded the way the figures have always been reported.
+    contribution = [round(units / total_count * 100, 2) if units > 0 else 0 for units in count.tolist()]
+
+    product_data = {
+        title: {
+            "sales": format_cents(sales[code]),
+            "count": int(count[code]),
+            "contribution": f"{contribution[code]}%",
+        }
+        for code, title in enumerate(titles)
+    }
+    codes = {title: code for code, title in enumerate(titles)}
+    slow_moving_products = [
+        title
+        for title in product_titles
+        if title not in codes or contribution[codes[title]] <= slow_threshold
+    ]
+    return {
+        "total_sales": format_cents(total_cents),
+        "product_data": product_data,
+        "slow_moving_products": slow_moving_products,
+    }
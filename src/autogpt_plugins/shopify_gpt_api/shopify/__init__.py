@@ -1,7 +1,17 @@
 from shopify.version import VERSION
 from shopify.session import Session, ValidationException
 from shopify.resources import *
-from shopify.limits import Limits
+from shopify.limits import Limits, LeakyBucket
 from shopify.api_version import *
 from shopify.api_access import *
 from shopify.collection import PaginatedIterator
+from shopify.base import ShopifyConnection
+from shopify.pool import ConnectionPool, PoolManager
+from shopify.aio import AsyncClient
+from shopify.retry import RetryPolicy
+from shopify.coalesce import SingleFlight
+from shopify.cache import ResponseCache
+from shopify.instrumentation import Instrumentation, EndpointStats, RequestEvent
+from shopify.streaming import ResourceStream, iter_json_array
+from shopify.checkpoint import ScanCheckpoint
+from shopify.webhooks import WebhookReceiver
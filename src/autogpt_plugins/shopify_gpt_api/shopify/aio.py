@@ -0,0 +1,89 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from shopify.base import ShopifyResource
+from shopify.collection import PaginatedCollection
+
+
+class AsyncClient(object):
+    """
+    Awaitable counterparts of the ShopifyResource calls.
+
+    Requests run on a private thread pool so independent fetches can proceed
+    concurrently on one event loop. Each call carries the session that is
+    active on the calling thread (see ShopifyResource.activate_session) into
+    the worker, so the usual Session and ApiVersion setup applies unchanged,
+    as does everything configured on ShopifyConnection.
+
+    >>> async def main():
+    ...     async with shopify.AsyncClient() as client:
+    ...         orders, customers = await asyncio.gather(
+    ...             client.find(shopify.Order, status="any"),
+    ...             client.find(shopify.Customer),
+    ...         )
+    ...         async for product in client.iterate(shopify.Product.find(limit=250)):
+    ...             do_something(product)
+    """
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    @staticmethod
+    def _call(settings, func, args, kwargs):
+        ShopifyResource.restore_settings(settings)
+        return func(*args, **kwargs)
+
+    async def run(self, func, *args, **kwargs):
+        """Run any blocking callable that uses the Shopify API in the thread pool."""
+        settings = ShopifyResource.capture_settings()
+        # Copy the context too, so an Instrumentation.label set by the caller applies in the worker.
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(context.run, self._call, settings, func, args, kwargs)
+        )
+
+    async def find(self, resource_class, *args, **kwargs):
+        """Awaitable resource_class.find()."""
+        return await self.run(resource_class.find, *args, **kwargs)
+
+    async def count(self, resource_class, **kwargs):
+        """Awaitable resource_class.count()."""
+        return await self.run(resource_class.count, **kwargs)
+
+    async def save(self, resource):
+        """Awaitable resource.save()."""
+        return await self.run(resource.save)
+
+    async def destroy(self, resource):
+        """Awaitable resource.destroy()."""
+        return await self.run(resource.destroy)
+
+    async def pages(self, collection):
+        """Asynchronously iterate over the pages of a PaginatedCollection, one page in memory at a time."""
+        if not isinstance(collection, PaginatedCollection):
+            raise TypeError("AsyncClient.pages expects a PaginatedCollection instance")
+        collection._no_iter_next = True
+        page = collection
+        while True:
+            yield page
+            if not page.has_next_page():
+                return
+            page = await self.run(page.next_page, no_cache=True)
+
+    async def iterate(self, collection):
+        """Asynchronously iterate over every item of a PaginatedCollection, fetching further pages as needed."""
+        async for page in self.pages(collection):
+            for item in page:
+                yield item
@@ -4,28 +4,153 @@ import shopify.yamlobjects
 import shopify.mixins as mixins
 import shopify
 import threading
+import time
+import re
 import sys
 import six
 from six.moves import urllib
 
-from shopify.collection import PaginatedCollection
+from shopify.collection import PaginatedCollection, PaginatedIterator
+from shopify.limits import header_value
+from shopify.streaming import ResourceStream
+from shopify.checkpoint import ScanCheckpoint
 from pyactiveresource.collection import Collection
 
+_ID_SEGMENT = re.compile(r"/\d+(?=/|\.|$)")
+_VERSION_SEGMENT = re.compile(r"/api/[^/]+/")
+
+
+def endpoint_template(path):
+    """Reduce a request path to its endpoint, e.g. /admin/api/{version}/products/{id}.json."""
+    path = urllib.parse.urlsplit(path).path
+    path = _VERSION_SEGMENT.sub("/api/{version}/", path, count=1)
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
 # Store the response from the last request in the connection object
 
 
 class ShopifyConnection(pyactiveresource.connection.Connection):
     response = None
 
-    def _open(self, *args, **kwargs):
+    # A shopify.PoolManager shared by the per-thread connections. When unset, or when
+    # a proxy is configured for the shop, requests go through urllib and open a new connection.
+    pool_manager = None
+
+    # A shopify.LeakyBucket shared by the per-thread connections that paces
+    # requests to stay under the API call limit.
+    rate_limiter = None
+
+    # A shopify.RetryPolicy for throttled (429) and transient 5xx responses.
+    retry_policy = None
+
+    # A shopify.SingleFlight that lets identical concurrent GETs share one response.
+    coalescer = None
+
+    # A shopify.ResponseCache that revalidates repeated GETs with ETag / Last-Modified.
+    response_cache = None
+
+    # A shopify.Instrumentation notified with a RequestEvent for every request sent.
+    instrumentation = None
+
+    def _urlopen(self, request):
+        if self.pool_manager is None or self.pool_manager.uses_proxy(request.get_full_url()):
+            return super(ShopifyConnection, self)._urlopen(request)
+        return self.pool_manager.urlopen(
+            request.get_method(),
+            request.get_full_url(),
+            body=request.data,
+            headers=dict(request.header_items()),
+            timeout=self.timeout,
+        )
+
+    def _open(self, method, path, headers=None, data=None):
+        if method != "GET":
+            try:
+                return self._retrying_send(method, path, headers, data)
+            finally:
+                if self.response_cache is not None:
+                    self.response_cache.invalidate(self.site, path)
+
+        if self.response_cache is None:
+            return self._get(method, path, headers, data)
+        cache_key = self._request_key(path, headers)
+        validators = self.response_cache.validators(cache_key)
+        conditional = dict(headers or {}, **validators)
+        response = self.response_cache.resolve(cache_key, self._get(method, path, conditional, data))
+        if response is None and validators:
+            # The entry was evicted while the conditional request was in flight, so
+            # the 304 has no body to stand for; ask again without validators.
+            response = self.response_cache.resolve(cache_key, self._get(method, path, headers, data))
+        if response is not None:
+            self.response = response
+        return self.response
+
+    def _get(self, method, path, headers, data):
+        try:
+            if self.coalescer is None:
+                self.response = self._retrying_send(method, path, headers, data)
+            else:
+                # Concurrent callers get the response of the request already in flight.
+                key = self._request_key(path, headers)
+                self.response = self.coalescer.do(key, self._retrying_send, method, path, headers, data)
+        except pyactiveresource.connection.Error as err:
+            self.response = getattr(err, "response", None)
+            raise
+        return self.response
+
+    def _request_key(self, path, headers):
+        return (self.site, self.user, path, tuple(sorted((headers or {}).items())))
+
+    def _retrying_send(self, method, path, headers=None, data=None):
+        if self.retry_policy is None:
+            return self._send(method, path, headers, data)
+        return self.retry_policy.call(method, endpoint_template(path), self._send, method, path, headers, data)
+
+    def _send(self, method, path, headers=None, data=None):
         self.response = None
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.site)
+        started = time.monotonic()
         try:
-            self.response = super(ShopifyConnection, self)._open(*args, **kwargs)
-        except pyactiveresource.connection.ConnectionError as err:
-            self.response = err.response
+            self.response = super(ShopifyConnection, self)._open(method, path, headers=headers, data=data)
+        except pyactiveresource.connection.Error as err:
+            # Network errors have no response
+            self.response = getattr(err, "response", None)
             raise
+        finally:
+            if self.rate_limiter is not None:
+                self.rate_limiter.release(self.site, self.response)
+            if self.instrumentation is not None:
+                self._instrument(method, path, data, time.monotonic() - started)
         return self.response
 
+    def _handle_error(self, err):
+        try:
+            return super(ShopifyConnection, self)._handle_error(err)
+        except pyactiveresource.connection.ServerError as error:
+            # Unlike ConnectionError, ServerError drops the response; keep it for instrumentation and retries.
+            error.response = pyactiveresource.connection.Response.from_httpresponse(err)
+            raise
+
+    def _instrument(self, method, path, data, latency):
+        response = self.response
+        self.instrumentation.emit(
+            shopify.RequestEvent(
+                method=method,
+                endpoint=endpoint_template(path),
+                url=path,
+                status=getattr(response, "code", None),
+                latency=latency,
+                request_bytes=len(data or b""),
+                response_bytes=len(getattr(response, "body", None) or b""),
+                call_limit=header_value(
+                    getattr(response, "headers", None) or {}, shopify.Limits.CREDIT_LIMIT_HEADER_PARAM
+                ),
+                label=self.instrumentation.current_label(),
+            )
+        )
+
 
 # Inherit from pyactiveresource's metaclass in order to use ShopifyConnection
 
@@ -190,10 +315,134 @@ class ShopifyResource(ActiveResource, mixins.Countable):
         cls.version = None
         cls.headers.pop("X-Shopify-Access-Token", None)
 
+    @classmethod
+    def capture_settings(cls):
+        """Snapshot the calling thread's session settings.
+
+        Settings such as the site and the access token header are thread
+        local, so work handed to another thread needs to carry them along
+        and apply them there with restore_settings().
+        """
+        return {
+            "site": cls.site,
+            "user": cls.user,
+            "password": cls.password,
+            "timeout": cls.timeout,
+            "format": cls.format,
+            "version": cls.version,
+            "url": cls.url,
+            "headers": dict(cls.headers),
+        }
+
+    @classmethod
+    def restore_settings(cls, settings):
+        """Apply settings captured with capture_settings() to the calling thread."""
+        for name in ("site", "user", "password", "timeout", "format", "version", "url"):
+            # Only assign what changed, setting most of these drops the thread's connection.
+            if getattr(ShopifyResource, name) != settings[name]:
+                setattr(ShopifyResource, name, settings[name])
+        ShopifyResource.headers = dict(settings["headers"])
+
     @classmethod
     def find(cls, id_=None, from_=None, **kwargs):
-        """Checks the resulting collection for pagination metadata."""
+        """Checks the resulting collection for pagination metadata.
+
+        `fields` may be given as a list of attribute names to only request those.
+        """
+        fields = kwargs.pop("fields", None)
+        if fields:
+            kwargs["fields"] = fields if isinstance(fields, six.string_types) else ",".join(fields)
         collection = super(ShopifyResource, cls).find(id_=id_, from_=from_, **kwargs)
         if isinstance(collection, Collection) and "headers" in collection.metadata:
             return PaginatedCollection(collection, metadata={"resource_class": cls}, **kwargs)
         return collection
+
+    @classmethod
+    def scan(cls, limit=250, fields=None, prefetch=0, checkpoint=None, stream=False, **filters):
+        """Iterate over every resource matching the filters, following the Link header cursor page by page.
+
+        Args:
+            limit: The page size, 250 is the largest the API allows.
+            fields: Only request these attributes, a list or a comma separated string.
+            prefetch: Pages to fetch ahead in the background (see PaginatedIterator).
+            checkpoint: A file recording the progress, so an interrupted scan
+                        resumes where it stopped (see ScanCheckpoint).
+            stream: Read the pages with find_stream(), building each resource as
+                    its element is decoded instead of decoding the whole page first.
+            filters: Any other query parameters, e.g. status="any".
+        """
+        if fields:
+            filters["fields"] = fields
+        find = cls.find_stream if stream else cls.find
+        if checkpoint is not None:
+            for item in cls._checkpointed_scan(checkpoint, limit, prefetch, filters, find):
+                yield item
+            return
+        for page in cls._scan_pages(find(limit=limit, **filters), prefetch):
+            for item in page:
+                yield item
+
+    @classmethod
+    def find_by_ids(cls, ids, batch_size=250, fields=None, **kwargs):
+        """Fetch the resources with the given ids, `batch_size` per request, as a dict by id.
+
+        Ids that do not exist are left out of the result.
+        """
+        found = {}
+        ids = sorted(set(ids))
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
+            ids_param = ",".join(str(id_) for id_ in batch)
+            for resource in cls.find(ids=ids_param, limit=len(batch), fields=fields, **kwargs):
+                found[resource.id] = resource
+        return found
+
+    @classmethod
+    def _scan_pages(cls, collection, prefetch):
+        if not isinstance(collection, (PaginatedCollection, ResourceStream)):
+            return [collection]
+        return PaginatedIterator(collection, prefetch=prefetch)
+
+    @classmethod
+    def _checkpointed_scan(cls, path, limit, prefetch, filters, find):
+        scan = {"resource": cls.__name__, "site": cls.site, "limit": limit, "filters": filters}
+        checkpoint = ScanCheckpoint(path, scan)
+        prefix_options = cls._split_options(dict(filters))[0]
+        for attributes in checkpoint.replay():
+            yield cls._build_object(attributes, prefix_options)
+        if checkpoint.done:
+            return
+
+        checkpoint.open()
+        try:
+            if checkpoint.pages == 0:
+                pages = cls._scan_pages(find(limit=limit, **filters), prefetch)
+            elif checkpoint.cursor:
+                pages = cls._scan_pages(find(from_=checkpoint.cursor), prefetch)
+            else:
+                # Every page was saved, only the completion was not recorded.
+                pages = []
+            for page in pages:
+                items = list(page)
+                checkpoint.save_page([item.to_dict() for item in items], getattr(page, "next_page_url", None))
+                for item in items:
+                    yield item
+            checkpoint.complete()
+        finally:
+            checkpoint.close()
+
+    @classmethod
+    def find_stream(cls, from_=None, **kwargs):
+        """Like find() for a list, but returns a ResourceStream that decodes the resources one at a time."""
+        fields = kwargs.pop("fields", None)
+        if fields:
+            kwargs["fields"] = fields if isinstance(fields, six.string_types) else ",".join(fields)
+        prefix_options, query_options = cls._split_options(kwargs)
+        if from_:
+            query_options.update(prefix_options)
+            path = from_ + cls._query_string(query_options)
+            prefix_options = None
+        else:
+            path = cls._collection_path(prefix_options, query_options)
+        response = cls.connection.get(path, cls.headers)
+        return ResourceStream(cls, response, prefix_options)
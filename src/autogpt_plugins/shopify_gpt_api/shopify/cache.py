@@ -0,0 +1,128 @@
+import collections
+import re
+import threading
+from pyactiveresource.connection import Response
+from six.moves import urllib
+from shopify.limits import header_value
+
+_ID_SEGMENT = re.compile(r"/\d+(/|\.|$)")
+
+
+def resource_root(path):
+    """The collection a path belongs to, e.g. /admin/api/2023-04/products for .../products/1/images.json."""
+    path = urllib.parse.urlsplit(path).path
+    match = _ID_SEGMENT.search(path)
+    if match:
+        return path[: match.start()]
+    return path.rsplit(".", 1)[0]
+
+
+class ResponseCache(object):
+    """
+    A bounded LRU cache of GET responses revalidated with conditional requests.
+
+    Responses carrying an ETag or Last-Modified header are stored per request.
+    When the same request is made again ShopifyConnection sends the stored
+    validators as If-None-Match / If-Modified-Since, and a 304 Not Modified
+    answer is replaced by the cached body, so the resource is rebuilt without
+    downloading it again. A write (POST, PUT, DELETE) drops the cached
+    entries of the collection it touched.
+
+    >>> import shopify
+    >>> shopify.ShopifyConnection.response_cache = shopify.ResponseCache(maxsize=256)
+    >>> shopify.ShopifyConnection.response_cache.stats()
+    {'entries': 0, 'bytes': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+    """
+
+    def __init__(self, maxsize=256, max_bytes=None):
+        """
+        Args:
+            maxsize: The maximum number of cached responses.
+            max_bytes: The maximum total size of the cached bodies, unbounded if None.
+        """
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def validators(self, key):
+        """Conditional request headers for a cached response, or {} if there is none."""
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None:
+                return {}
+            headers = {}
+            etag = header_value(response.headers, "ETag")
+            if etag:
+                headers["If-None-Match"] = etag
+            last_modified = header_value(response.headers, "Last-Modified")
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+            return headers
+
+    def resolve(self, key, response):
+        """Turn the response to a (possibly conditional) GET into the response to return.
+
+        A 304 is answered from the cache, a fresh 200 replaces the cached entry.
+        None is returned for a 304 whose entry is gone, e.g. evicted after its
+        validators were sent; the request has to be repeated without them.
+        """
+        with self._lock:
+            if response.code == 304:
+                cached = self._entries.get(key)
+                if cached is None:
+                    self.misses += 1
+                    return None
+                self._entries.move_to_end(key)
+                self.hits += 1
+                headers = dict(cached.headers)
+                headers.update(response.headers)
+                return Response(cached.code, cached.body, headers, cached.msg)
+            self.misses += 1
+            if response.code == 200 and (
+                header_value(response.headers, "ETag") or header_value(response.headers, "Last-Modified")
+            ):
+                self._store(key, response)
+            return response
+
+    def _store(self, key, response):
+        self._discard(key)
+        self._entries[key] = response
+        self.bytes += len(response.body)
+        while self._entries and (
+            len(self._entries) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _discard(self, key):
+        response = self._entries.pop(key, None)
+        if response is not None:
+            self.bytes -= len(response.body)
+
+    def invalidate(self, site, path):
+        """Drop every cached response of `site` under the collection `path` belongs to."""
+        root = resource_root(path)
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == site and urllib.parse.urlsplit(key[2]).path.startswith(root):
+                    self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,115 @@
+import json
+import os
+import time
+
+
+class ScanCheckpoint(object):
+    """
+    Records the progress of a long scan in a JSON lines file so it can resume.
+
+    The first line identifies the scan (resource, shop and query); every page
+    then appends one line holding its items and the cursor (next_page_url) of
+    the page after it. Each line is flushed and synced before the page is
+    handed to the caller, so after a crash the scan replays the saved items
+    and continues from the last cursor instead of starting over. A torn last
+    line is discarded, and so is a checkpoint older than `max_age` seconds,
+    whose pages would be stale by now. Once the scan has been consumed
+    completely the file is removed, unless `keep` is set.
+
+    >>> for order in shopify.Order.scan(status="any", checkpoint="orders.jsonl"):
+    ...     export(order)
+    """
+
+    # Seconds after which a checkpoint is started over instead of resumed, None to resume at any age
+    max_age = 24 * 60 * 60
+
+    def __init__(self, path, scan, keep=False, max_age=None):
+        """
+        Args:
+            path: The checkpoint file.
+            scan: A JSON serializable description of the scan; a checkpoint
+                  written for a different scan is discarded.
+            keep: Leave the file in place once the scan is complete.
+            max_age: Overrides ScanCheckpoint.max_age for this checkpoint.
+        """
+        self.path = path
+        # Compare the scan the way it reads back from the file.
+        self.scan = json.loads(json.dumps(scan, default=str))
+        self.keep = keep
+        if max_age is not None:
+            self.max_age = max_age
+        self.cursor = None
+        self.pages = 0
+        self.done = False
+        self._valid_bytes = 0
+        self._file = None
+
+    def replay(self):
+        """Yield the items saved by a previous run; afterwards cursor, pages and done describe where it stopped."""
+        self.cursor, self.pages, self.done, self._valid_bytes = None, 0, False, 0
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            header = self._read_line(f)
+            if header is None or header.get("scan") != self.scan or self._expired(header):
+                return
+            self._valid_bytes = f.tell()
+            while True:
+                record = self._read_line(f)
+                if record is None:
+                    return
+                self._valid_bytes = f.tell()
+                if record.get("done"):
+                    self.done = True
+                    return
+                self.pages += 1
+                self.cursor = record.get("next")
+                for item in record.get("items", []):
+                    yield item
+
+    def _expired(self, header):
+        started = header.get("started")
+        return self.max_age is not None and (started is None or time.time() - started > self.max_age)
+
+    @staticmethod
+    def _read_line(f):
+        line = f.readline()
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            return json.loads(line.decode("utf-8"))
+        except ValueError:
+            return None
+
+    def open(self):
+        """Start writing: keep what replay() validated, or start a new file."""
+        if self._valid_bytes:
+            self._file = open(self.path, "r+b")
+            self._file.truncate(self._valid_bytes)
+            self._file.seek(self._valid_bytes)
+        else:
+            self._file = open(self.path, "wb")
+            self._write({"scan": self.scan, "started": time.time()})
+
+    def save_page(self, items, next_page_url):
+        """Persist a page of item dicts together with the cursor of the following page."""
+        self._write({"next": next_page_url, "items": items})
+        self.cursor = next_page_url
+        self.pages += 1
+
+    def complete(self):
+        self._write({"done": True})
+        self.close()
+        self.done = True
+        if not self.keep:
+            os.remove(self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
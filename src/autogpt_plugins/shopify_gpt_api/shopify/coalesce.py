@@ -0,0 +1,61 @@
+import threading
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Collapses identical concurrent calls into one.
+
+    The first caller for a key runs the function; callers arriving with the
+    same key while it is still running wait for it and receive the same
+    result, or the same exception. Nothing is cached once the call returns.
+
+    ShopifyConnection uses it for GET requests, keyed by shop, URL (including
+    the query string) and request headers:
+
+    >>> import shopify
+    >>> shopify.ShopifyConnection.coalescer = shopify.SingleFlight()
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._in_flight)
@@ -1,6 +1,45 @@
 from pyactiveresource.collection import Collection
 from six.moves.urllib.parse import urlparse, parse_qs
 import cgi
+import collections
+import threading
+from six.moves import queue
+
+
+def parse_link_header(values):
+    """Map the rel of each link in a Link header to its URL, e.g. {"next": "https://..."}."""
+    if values is None:
+        return {}
+
+    result = {}
+    for value in values.split(", "):
+        link, rel = value.split("; ")
+        result[rel.split('"')[1]] = link[1:-1]
+    return result
+
+
+class _PageWindow(object):
+    """The pages of one pagination chain that stay linked, least recently used first.
+
+    Once more than `size` pages are linked the least recently used one is
+    unlinked from its neighbours, so walking a long chain keeps a constant
+    number of pages alive instead of every page since the first one.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._pages = collections.OrderedDict()
+
+    def touch(self, *pages):
+        for page in pages:
+            self._pages[id(page)] = page
+            self._pages.move_to_end(id(page))
+        while len(self._pages) > self.size:
+            _, evicted = self._pages.popitem(last=False)
+            evicted._unlink()
+
+    def __len__(self):
+        return len(self._pages)
 
 
 class PaginatedCollection(Collection):
@@ -13,8 +52,14 @@ class PaginatedCollection(Collection):
 
     You can use next_page_url and previous_page_url to fetch the next page
     of data by calling Resource.find(from_=page.next_page_url)
+
+    Fetched pages are cached as links between neighbouring pages. At most
+    `max_cached_pages` pages of a chain stay linked; older ones are unlinked
+    and fetched again if they are navigated to.
     """
 
+    max_cached_pages = 5
+
     def __init__(self, *args, **kwargs):
         """If given a Collection object as an argument, inherit its metadata."""
 
@@ -39,21 +84,14 @@ class PaginatedCollection(Collection):
         self._next = None
         self._previous = None
         self._current_iter = None
+        self._window = None
         self._no_iter_next = kwargs.pop("no_iter_next", True)
 
     def __parse_pagination(self):
         if "headers" not in self.metadata:
             return {}
 
-        values = self.metadata["headers"].get("Link", self.metadata["headers"].get("link", None))
-        if values is None:
-            return {}
-
-        result = {}
-        for value in values.split(", "):
-            link, rel = value.split("; ")
-            result[rel.split('"')[1]] = link[1:-1]
-        return result
+        return parse_link_header(self.metadata["headers"].get("Link", self.metadata["headers"].get("link", None)))
 
     def has_previous_page(self):
         """Returns true if the current page has any previous pages before it."""
@@ -72,10 +110,11 @@ class PaginatedCollection(Collection):
             A PaginatedCollection object with the new data set.
         """
         if self._previous:
+            self._window.touch(self._previous)
             return self._previous
         elif not self.has_previous_page():
             raise IndexError("No previous page")
-        return self.__fetch_page(self.previous_page_url, no_cache)
+        return self.__fetch_page(self.previous_page_url, no_cache, forward=False)
 
     def next_page(self, no_cache=False):
         """Returns the next page of items.
@@ -86,45 +125,57 @@ class PaginatedCollection(Collection):
             A PaginatedCollection object with the new data set.
         """
         if self._next:
+            self._window.touch(self._next)
             return self._next
         elif not self.has_next_page():
             raise IndexError("No next page")
         return self.__fetch_page(self.next_page_url, no_cache)
 
-    def __fetch_page(self, url, no_cache=False):
-        next = self.metadata["resource_class"].find(from_=url)
+    def __fetch_page(self, url, no_cache=False, forward=True):
+        page = self.metadata["resource_class"].find(from_=url)
         if not no_cache:
-            self._next = next
-            self._next._previous = self
-        next._no_iter_next = self._no_iter_next
-        return next
+            if self._window is None:
+                self._window = _PageWindow(self.max_cached_pages)
+            page._window = self._window
+            if forward:
+                self._next, page._previous = page, self
+            else:
+                self._previous, page._next = page, self
+            self._window.touch(self, page)
+        page._no_iter_next = self._no_iter_next
+        return page
+
+    def _unlink(self):
+        """Drop the links to and from the neighbouring pages."""
+        if self._next is not None and self._next._previous is self:
+            self._next._previous = None
+        if self._previous is not None and self._previous._next is self:
+            self._previous._next = None
+        self._next = self._previous = None
 
     def __iter__(self):
         """Iterates through all items, also fetching other pages."""
-        for item in super(PaginatedCollection, self).__iter__():
-            yield item
-
-        if self._no_iter_next:
-            return
+        page = self
+        while True:
+            for item in super(PaginatedCollection, page).__iter__():
+                yield item
 
-        try:
-            if not self._current_iter:
-                self._current_iter = self
-            self._current_iter = self.next_page()
+            if self._no_iter_next:
+                return
 
-            for item in self._current_iter:
-                yield item
-        except IndexError:
-            return
+            try:
+                page = self._current_iter = page.next_page()
+            except IndexError:
+                return
 
     def __len__(self):
-        """If fetched count all the pages."""
-
-        if self._next:
-            count = len(self._next)
-        else:
-            count = 0
-        return count + super(PaginatedCollection, self).__len__()
+        """Count the items of this page and of the cached pages after it."""
+        count = 0
+        page = self
+        while page is not None:
+            count += super(PaginatedCollection, page).__len__()
+            page = page._next
+        return count
 
 
 class PaginatedIterator(object):
@@ -139,16 +190,38 @@ class PaginatedIterator(object):
     ...         do_something(item)
     ...
     # every page and the page items are iterated
+
+    With `prefetch` set, a background thread requests the following pages
+    while the current one is being processed, so network time and processing
+    time overlap. At most `prefetch` fetched pages wait to be consumed, which
+    keeps memory bounded to prefetch + 2 pages (the waiting pages, the one
+    being processed and the one being downloaded).
+
+    >>> for page in PaginatedIterator(Product.find(limit=250), prefetch=2):
+    ...     process(page)
     """
 
-    def __init__(self, collection):
-        if not isinstance(collection, PaginatedCollection):
-            raise TypeError("PaginatedIterator expects a PaginatedCollection instance")
+    def __init__(self, collection, prefetch=0):
+        # streaming imports this module
+        from shopify.streaming import ResourceStream
+
+        if isinstance(collection, PaginatedCollection):
+            collection._no_iter_next = True
+            self.resource_class = collection.metadata["resource_class"]
+        elif isinstance(collection, ResourceStream):
+            self.resource_class = collection.resource_class
+        else:
+            raise TypeError("PaginatedIterator expects a PaginatedCollection or ResourceStream instance")
         self.collection = collection
-        self.collection._no_iter_next = True
+        self.prefetch = prefetch
 
     def __iter__(self):
         """Iterate over pages, returning one page at a time."""
+        if self.prefetch > 0:
+            for page in self.__prefetched_pages():
+                yield page
+            return
+
         current_page = self.collection
         while True:
             yield current_page
@@ -156,3 +229,48 @@ class PaginatedIterator(object):
                 current_page = current_page.next_page(no_cache=True)
             except IndexError:
                 return
+
+    def __prefetched_pages(self):
+        pages = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        resource_class = self.resource_class
+        # The session is thread local, carry it into the fetching thread.
+        settings = resource_class.capture_settings()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fetch():
+            resource_class.restore_settings(settings)
+            page = self.collection
+            try:
+                while page.has_next_page():
+                    page = page.next_page(no_cache=True)
+                    if not put((page, None)):
+                        return
+            except Exception as err:
+                put((None, err))
+                return
+            put((None, None))
+
+        fetcher = threading.Thread(target=fetch, name="shopify-prefetch")
+        fetcher.daemon = True
+        fetcher.start()
+        try:
+            yield self.collection
+            while True:
+                page, error = pages.get()
+                if error is not None:
+                    raise error
+                if page is None:
+                    return
+                yield page
+        finally:
+            # Stops the fetcher when the caller breaks out early.
+            stop.set()
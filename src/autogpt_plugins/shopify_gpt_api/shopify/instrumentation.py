@@ -0,0 +1,184 @@
+import collections
+import contextlib
+import contextvars
+import json
+import math
+import threading
+
+RequestEvent = collections.namedtuple(
+    "RequestEvent",
+    [
+        "method",
+        "endpoint",
+        "url",
+        "status",
+        "latency",
+        "request_bytes",
+        "response_bytes",
+        "call_limit",
+        "label",
+    ],
+)
+RequestEvent.__doc__ = """One HTTP request sent by ShopifyConnection.
+
+endpoint is the path template (e.g. /admin/api/{version}/products/{id}.json),
+status is None when no response was received, latency is in seconds,
+call_limit is the X-Shopify-Shop-Api-Call-Limit header and label is the
+caller supplied label active when the request was made (see Instrumentation.label).
+"""
+
+_label = contextvars.ContextVar("shopify_instrumentation_label", default=None)
+
+
+class Instrumentation(object):
+    """
+    Pluggable per-request instrumentation for ShopifyConnection.
+
+    Every subscriber is called with a RequestEvent after each HTTP request,
+    including every retry attempt. Subscribers run on the requesting thread
+    and must be cheap and thread safe; errors they raise are swallowed.
+
+    >>> import shopify
+    >>> instrumentation = shopify.Instrumentation()
+    >>> stats = instrumentation.subscribe(shopify.EndpointStats())
+    >>> shopify.ShopifyConnection.instrumentation = instrumentation
+    >>> with instrumentation.label("get_all_products"):
+    ...     shopify.Product.find()
+    >>> print(stats.to_json())
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, subscriber):
+        """Add a callable taking a RequestEvent; returns it for convenience."""
+        with self._lock:
+            self._subscribers = self._subscribers + [subscriber]
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s != subscriber]
+
+    @contextlib.contextmanager
+    def label(self, name):
+        """Tag the requests made inside the block, e.g. with the plugin command running them."""
+        token = self.set_label(name)
+        try:
+            yield
+        finally:
+            self.reset_label(token)
+
+    @staticmethod
+    def set_label(name):
+        """Tag the requests made from now on; returns a token for reset_label."""
+        return _label.set(name)
+
+    @staticmethod
+    def reset_label(token):
+        try:
+            _label.reset(token)
+        except ValueError:
+            # The token was created in another context; just clear the label.
+            _label.set(None)
+
+    @staticmethod
+    def current_label():
+        return _label.get()
+
+    def emit(self, event):
+        for subscriber in self._subscribers:
+            try:
+                subscriber(event)
+            except Exception:
+                pass
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values), int(math.ceil(fraction * len(sorted_values)))) - 1)
+    return sorted_values[index]
+
+
+class EndpointStats(object):
+    """
+    Collects per-endpoint latency histograms from RequestEvents.
+
+    Latencies are kept in a bounded window of the most recent `max_samples`
+    requests per endpoint; counts and byte totals cover every request.
+    Use `by_label=True` to split the statistics per label as well.
+    """
+
+    def __init__(self, max_samples=1024, by_label=False):
+        self.max_samples = max_samples
+        self.by_label = by_label
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _key(self, event):
+        endpoint = "%s %s" % (event.method, event.endpoint)
+        if self.by_label:
+            return "%s: %s" % (event.label, endpoint)
+        return endpoint
+
+    def __call__(self, event):
+        with self._lock:
+            key = self._key(event)
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = {
+                    "count": 0,
+                    "errors": 0,
+                    "statuses": collections.Counter(),
+                    "request_bytes": 0,
+                    "response_bytes": 0,
+                    "call_limit": None,
+                    "latencies": collections.deque(maxlen=self.max_samples),
+                }
+            stats["count"] += 1
+            stats["statuses"][str(event.status)] += 1
+            if event.status is None or event.status >= 400:
+                stats["errors"] += 1
+            stats["request_bytes"] += event.request_bytes
+            stats["response_bytes"] += event.response_bytes
+            if event.call_limit:
+                stats["call_limit"] = event.call_limit
+            stats["latencies"].append(event.latency)
+
+    def summary(self):
+        """Per-endpoint counts, statuses, bytes and p50/p95/p99/max latency in milliseconds."""
+        with self._lock:
+            endpoints = [
+                (key, dict(stats, latencies=sorted(stats["latencies"]))) for key, stats in self._endpoints.items()
+            ]
+
+        summary = {}
+        for key, stats in endpoints:
+            latencies = stats.pop("latencies")
+            stats["statuses"] = dict(stats["statuses"])
+            for name, fraction in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99), ("max_ms", 1.0)):
+                value = percentile(latencies, fraction)
+                stats[name] = None if value is None else round(value * 1000.0, 3)
+            summary[key] = stats
+        return summary
+
+    def slowest(self, count=5, by="p95_ms"):
+        """The `count` endpoints with the highest `by` latency."""
+        summary = self.summary()
+        ranked = sorted(summary, key=lambda key: summary[key][by] or 0, reverse=True)
+        return [(key, summary[key]) for key in ranked[:count]]
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.summary(), sort_keys=True, **kwargs)
+
+    def dump(self, path):
+        """Write the summary to `path` as JSON."""
+        with open(path, "w") as f:
+            f.write(self.to_json(indent=2))
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
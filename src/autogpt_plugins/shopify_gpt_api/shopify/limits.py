@@ -1,3 +1,5 @@
+import threading
+import time
 import shopify
 
 
@@ -60,3 +62,134 @@ class Limits(object):
         How many API calls have I made?
         """
         return int(cls.api_credit_limit_param()[0])
+
+
+class LeakyBucket(object):
+    """
+    Client side model of the API call limit bucket, used to pace requests.
+
+    Every request takes a slot in the bucket before it is sent and the bucket
+    drains at `leak_rate` slots per second. When taking a slot would leave
+    fewer than `headroom` free slots, the caller sleeps until enough have
+    leaked out, so bulk scans run at the sustained rate without 429s. The
+    level is resynchronised from the X-Shopify-Shop-Api-Call-Limit header of
+    every response, which also reveals the real bucket size of the shop.
+
+    One bucket model is kept per shop, and a single LeakyBucket can be shared
+    by every ShopifyConnection:
+
+    >>> import shopify
+    >>> shopify.ShopifyConnection.rate_limiter = shopify.LeakyBucket()
+    >>> shopify.ShopifyConnection.rate_limiter.level("https://my-shop.myshopify.com")
+    0.0
+    """
+
+    def __init__(self, capacity=40, leak_rate=None, headroom=2, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            capacity: Bucket size assumed until a response reports the real one.
+            leak_rate: Slots drained per second, by default capacity / 20
+                (2/s for the standard 40 slot bucket, 4/s for Shopify Plus).
+            headroom: Slots left free for other clients of the same shop.
+        """
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.headroom = headroom
+        self.clock = clock
+        self.sleep = sleep
+        self._shops = {}
+        self._lock = threading.Lock()
+
+    def _state(self, shop):
+        state = self._shops.get(shop)
+        if state is None:
+            state = self._shops[shop] = {
+                "level": 0.0,
+                "updated_at": self.clock(),
+                "capacity": self.capacity,
+                "in_flight": 0,
+                "requests": 0,
+                "waits": 0,
+                "waited": 0.0,
+            }
+        return state
+
+    def _rate(self, state):
+        return self.leak_rate or state["capacity"] / 20.0
+
+    def _drain(self, state):
+        now = self.clock()
+        state["level"] = max(0.0, state["level"] - (now - state["updated_at"]) * self._rate(state))
+        state["updated_at"] = now
+        return state["level"]
+
+    def acquire(self, shop):
+        """Block until a request to `shop` fits in the bucket, then take a slot.
+
+        Returns:
+            The number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                state = self._state(shop)
+                limit = max(1, state["capacity"] - self.headroom)
+                level = self._drain(state)
+                if level + 1 <= limit:
+                    state["level"] = level + 1
+                    state["in_flight"] += 1
+                    state["requests"] += 1
+                    if waited:
+                        state["waits"] += 1
+                        state["waited"] += waited
+                    return waited
+                delay = (level + 1 - limit) / self._rate(state)
+            self.sleep(delay)
+            waited += delay
+
+    def release(self, shop, response=None):
+        """Return the slot taken by acquire() and resynchronise from `response`."""
+        with self._lock:
+            state = self._state(shop)
+            state["in_flight"] = max(0, state["in_flight"] - 1)
+            credits = header_value(getattr(response, "headers", None) or {}, Limits.CREDIT_LIMIT_HEADER_PARAM)
+            if credits:
+                used, capacity = (int(value) for value in credits.split("/"))
+                self._drain(state)
+                state["capacity"] = capacity
+                # The header counts this request; the others in flight may not be counted yet.
+                state["level"] = float(used + state["in_flight"])
+            elif getattr(response, "code", None) == 429:
+                self._drain(state)
+                state["level"] = float(state["capacity"])
+
+    def level(self, shop):
+        """The current estimated number of used slots for `shop`."""
+        with self._lock:
+            return self._drain(self._state(shop))
+
+    def metrics(self, shop):
+        """A snapshot of the bucket for `shop`: level, capacity, leak rate and waiting statistics."""
+        with self._lock:
+            state = self._state(shop)
+            self._drain(state)
+            return {
+                "level": state["level"],
+                "capacity": state["capacity"],
+                "leak_rate": self._rate(state),
+                "in_flight": state["in_flight"],
+                "requests": state["requests"],
+                "waits": state["waits"],
+                "waited_seconds": state["waited"],
+            }
+
+
+def header_value(headers, name):
+    """Case-insensitive lookup in a plain dict of response headers."""
+    if name in headers:
+        return headers[name]
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
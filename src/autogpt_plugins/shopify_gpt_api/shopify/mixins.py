@@ -1,3 +1,6 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from six.moves import queue
 import shopify.resources
 
 
@@ -32,3 +35,107 @@ class Metafields(object):
 class Events(object):
     def events(self):
         return shopify.resources.Event.find(resource=self.__class__.plural, resource_id=self.id)
+
+
+class PartitionedScan(object):
+    _DONE = object()
+
+    @classmethod
+    def partitioned_scan(
+        cls, partitions=4, created_at_min=None, created_at_max=None, limit=250, fields=None, stream=False, **filters
+    ):
+        """
+        Scan all matching resources with several workers, each walking its own created_at window.
+
+        Cursor pagination is sequential, so the keyspace is split into
+        `partitions` consecutive created_at ranges that are scanned
+        concurrently, each with its own cursor, and merged into one stream as
+        pages arrive. Resources are yielded in no particular order. Every
+        worker draws from ShopifyConnection.rate_limiter, the call budget the
+        whole shop shares, so one has to be configured; without it the
+        workers together would exceed the API call limit.
+
+        Args:
+            partitions: The number of windows and workers.
+            created_at_min: Start of the scanned range, defaults to the oldest resource.
+            created_at_max: End of the scanned range, defaults to now.
+            limit, fields, stream, filters: As for scan(), e.g. status="any" for orders.
+        """
+        if shopify.ShopifyConnection.rate_limiter is None:
+            raise ValueError("partitioned_scan needs ShopifyConnection.rate_limiter, e.g. a shopify.LeakyBucket")
+        windows = cls._created_at_windows(partitions, created_at_min, created_at_max, filters)
+        if not windows:
+            return
+
+        settings = cls.capture_settings()
+        results = queue.Queue(maxsize=limit * len(windows))
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def scan_window(created_at_min, created_at_max):
+            cls.restore_settings(settings)
+            try:
+                window = dict(filters, created_at_min=created_at_min, created_at_max=created_at_max)
+                for resource in cls.scan(limit=limit, fields=fields, stream=stream, **window):
+                    if not put((resource, None)):
+                        return
+            except Exception as err:
+                put((None, err))
+            put((cls._DONE, None))
+
+        for window in windows:
+            worker = threading.Thread(target=scan_window, args=window, name="shopify-partition")
+            worker.daemon = True
+            worker.start()
+        try:
+            running = len(windows)
+            while running:
+                resource, error = results.get()
+                if error is not None:
+                    raise error
+                if resource is cls._DONE:
+                    running -= 1
+                else:
+                    yield resource
+        finally:
+            # Stops the workers on errors or when the caller breaks out early.
+            stop.set()
+
+    @classmethod
+    def _created_at_windows(cls, partitions, created_at_min, created_at_max, filters):
+        """Split [created_at_min, created_at_max] into whole-second windows that do not overlap."""
+        if created_at_min is None:
+            # Ids grow with creation time, so the first resource after id 0 is the oldest one.
+            oldest = cls.find(limit=1, since_id=0, fields="id,created_at", **filters)
+            if not oldest:
+                return []
+            created_at_min = oldest[0].created_at
+        if created_at_max is None:
+            created_at_max = datetime.now(timezone.utc)
+        start = _parse_time(created_at_min).replace(microsecond=0)
+        end = _parse_time(created_at_max).replace(microsecond=0)
+        if end < start:
+            return []
+
+        step = (end - start) / max(1, partitions)
+        bounds = sorted(set((start + step * i).replace(microsecond=0) for i in range(max(1, partitions))))
+        windows = []
+        for i, lower in enumerate(bounds):
+            upper = bounds[i + 1] - timedelta(seconds=1) if i + 1 < len(bounds) else end
+            windows.append((lower.isoformat(), upper.isoformat()))
+        return windows
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
@@ -0,0 +1,227 @@
+import socket
+import ssl
+import threading
+from six.moves import http_client, urllib
+
+
+class PooledResponse(object):
+    """
+    A fully read HTTP response returned by ConnectionPool.urlopen.
+
+    The body is read eagerly so the socket can go back to the pool before the
+    caller sees the response. It exposes the attributes pyactiveresource reads
+    from urllib responses (code, msg, headers, url, read and close).
+    """
+
+    def __init__(self, url, http_response):
+        self.url = url
+        self.code = http_response.status
+        self.msg = http_response.reason
+        self.headers = http_response.msg
+        self.body = http_response.read()
+
+    def info(self):
+        return self.headers
+
+    def read(self):
+        return self.body
+
+    def close(self):
+        pass
+
+
+class ConnectionPool(object):
+    """
+    A pool of HTTP/1.1 keep-alive connections to a single host.
+
+    Idle connections are kept on a LIFO stack so the most recently used (and
+    least likely to have been closed by the server) socket is reused first.
+    When no idle connection is available a new one is opened, so callers never
+    block; at most `maxsize` idle connections are retained afterwards.
+    """
+
+    # Errors raised when a reused keep-alive socket was closed by the server.
+    STALE_CONNECTION_ERRORS = (http_client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+    # Methods repeated on a fresh socket after a stale one failed. The server may
+    # have received a request before dropping the socket, so writes are not.
+    RETRY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, scheme, host, port=None, maxsize=10, timeout=None, context=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.context = context
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _new_connection(self, timeout):
+        if self.scheme == "https":
+            context = self.context or ssl.create_default_context()
+            return http_client.HTTPSConnection(self.host, self.port, timeout=timeout, context=context)
+        return http_client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _get_connection(self, timeout):
+        with self._lock:
+            if self._idle:
+                self.connections_reused += 1
+                connection = self._idle.pop()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+            self.connections_opened += 1
+        return self._new_connection(timeout), False
+
+    def _put_connection(self, connection):
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def urlopen(self, method, url, body=None, headers=None, timeout=None):
+        """Perform a request on a pooled connection.
+
+        Args:
+            method: The HTTP method.
+            url: The absolute URL to request.
+            body: The request body, if any.
+            headers: A dictionary of request headers.
+            timeout: Socket timeout in seconds, defaults to the pool timeout.
+        Returns:
+            A PooledResponse object.
+        Raises:
+            urllib.error.URLError: On socket or protocol errors.
+        """
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        if timeout is None:
+            timeout = self.timeout
+
+        while True:
+            connection, reused = self._get_connection(timeout)
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                http_response = connection.getresponse()
+                response = PooledResponse(url, http_response)
+            except self.STALE_CONNECTION_ERRORS as err:
+                connection.close()
+                if reused and method in self.RETRY_METHODS:
+                    # The server dropped an idle keep-alive socket; retry on a fresh one.
+                    continue
+                raise urllib.error.URLError(err)
+            except (http_client.HTTPException, socket.error) as err:
+                connection.close()
+                raise urllib.error.URLError(err)
+
+            if http_response.will_close:
+                connection.close()
+            else:
+                self._put_connection(connection)
+            return response
+
+    def idle_count(self):
+        with self._lock:
+            return len(self._idle)
+
+    def close(self):
+        """Close every idle connection in the pool."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class PoolManager(object):
+    """
+    Hands out one ConnectionPool per shop.
+
+    A single manager is shared by every ShopifyConnection, including the
+    per-thread connections created by ShopifyResourceMeta.connection, so
+    threads talking to the same shop reuse the same set of sockets.
+
+    >>> import shopify
+    >>> shopify.ShopifyConnection.pool_manager = shopify.PoolManager(maxsize=10)
+    >>> shopify.ShopifyConnection.pool_manager.set_pool_size("big-shop.myshopify.com", 20)
+    """
+
+    pool_class = ConnectionPool
+
+    REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+    # The limit urllib's HTTPRedirectHandler uses
+    max_redirections = 10
+
+    def __init__(self, maxsize=10, pool_sizes=None, context=None):
+        self.maxsize = maxsize
+        self.pool_sizes = dict(pool_sizes or {})
+        self.context = context
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def set_pool_size(self, host, maxsize):
+        """Set the pool size for a single shop, e.g. "my-shop.myshopify.com"."""
+        with self._lock:
+            self.pool_sizes[host] = maxsize
+            for (scheme, netloc), pool in self._pools.items():
+                if netloc == host:
+                    pool.maxsize = maxsize
+
+    def pool_for(self, url):
+        """Return the pool serving the scheme and host of `url`."""
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                maxsize = self.pool_sizes.get(parts.netloc, self.maxsize)
+                pool = self.pool_class(
+                    parts.scheme, parts.hostname, parts.port, maxsize=maxsize, context=self.context
+                )
+                self._pools[key] = pool
+            return pool
+
+    def uses_proxy(self, url):
+        """Whether urllib would send a request for `url` through a proxy (HTTP_PROXY / HTTPS_PROXY, minus NO_PROXY).
+
+        The pool connects to the shop directly, so such requests are left to urllib.
+        """
+        parts = urllib.parse.urlsplit(url)
+        return parts.scheme in urllib.request.getproxies() and not urllib.request.proxy_bypass(parts.hostname)
+
+    def urlopen(self, method, url, body=None, headers=None, timeout=None):
+        """Perform a request on the pool of its shop, following redirects the way urllib does.
+
+        GET and HEAD requests follow 301, 302, 303, 307 and 308 responses; a
+        POST redirected with 301, 302 or 303 is repeated as a GET without its
+        body. Other redirects are returned to the caller.
+        """
+        headers = dict(headers or {})
+        for _ in range(self.max_redirections + 1):
+            response = self.pool_for(url).urlopen(method, url, body=body, headers=headers, timeout=timeout)
+            location = response.headers.get("Location")
+            if response.code not in self.REDIRECT_CODES or not location:
+                return response
+            if method not in ("GET", "HEAD"):
+                if method != "POST" or response.code in (307, 308):
+                    return response
+                method, body = "GET", None
+                dropped = ("content-type", "content-length")
+                headers = dict((key, value) for key, value in headers.items() if key.lower() not in dropped)
+            url = urllib.parse.urljoin(url, location)
+        raise urllib.error.HTTPError(url, response.code, "Too many redirects", response.headers, None)
+
+    def clear(self):
+        """Close and forget every pool."""
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
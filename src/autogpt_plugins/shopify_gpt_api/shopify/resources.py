@@ -236,7 +236,7 @@ class CustomerGroup(CustomerSavedSearch):
 class CustomerInvite(ShopifyResource):
     pass
 
-class Customer(ShopifyResource, mixins.Metafields):
+class Customer(ShopifyResource, mixins.Metafields, mixins.PartitionedScan):
     @classmethod
     def search(cls, **kwargs):
         """
@@ -453,6 +453,28 @@ class InventoryLevel(ShopifyResource):
             cls._query_string(query_options),
         )
 
+    @classmethod
+    def scan_by_ids(cls, inventory_item_ids, location_ids=None, batch_size=50, prefetch=0, **kwargs):
+        """Iterate over the levels of the given inventory items (at the given locations), `batch_size` ids a request.
+
+        The API accepts at most 50 inventory item ids and 50 location ids per
+        request, so both lists are split into batches and every pair of
+        batches is scanned page by page.
+        """
+        item_ids = sorted(set(inventory_item_ids))
+        location_batches = [None]
+        if location_ids is not None:
+            location_ids = sorted(set(location_ids))
+            location_batches = [location_ids[i : i + batch_size] for i in range(0, len(location_ids), batch_size)]
+        for start in range(0, len(item_ids), batch_size):
+            items = ",".join(str(id_) for id_ in item_ids[start : start + batch_size])
+            for locations in location_batches:
+                filters = dict(kwargs, inventory_item_ids=items)
+                if locations is not None:
+                    filters["location_ids"] = ",".join(str(id_) for id_ in locations)
+                for level in cls.scan(prefetch=prefetch, **filters):
+                    yield level
+
     @classmethod
     def adjust(cls, location_id, inventory_item_id, available_adjustment):
         body = {
@@ -528,7 +550,7 @@ class OrderRisk(ShopifyResource):
     _singular = "risk"
     _plural = "risks"
 
-class Order(ShopifyResource, mixins.Metafields, mixins.Events):
+class Order(ShopifyResource, mixins.Metafields, mixins.Events, mixins.PartitionedScan):
     _prefix_source = "/customers/$customer_id/"
 
     @classmethod
@@ -596,7 +618,7 @@ class ProductListing(ShopifyResource):
 class ProductPublication(ShopifyResource):
     _prefix_source = "/publications/$publication_id/"
 
-class Product(ShopifyResource, mixins.Metafields, mixins.Events):
+class Product(ShopifyResource, mixins.Metafields, mixins.Events, mixins.PartitionedScan):
     def price_range(self):
         prices = [float(variant.price) for variant in self.variants]
         f = "%0.2f"
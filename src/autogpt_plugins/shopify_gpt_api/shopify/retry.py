@@ -0,0 +1,90 @@
+import collections
+import random
+import threading
+import time
+import pyactiveresource.connection
+from shopify.limits import header_value
+
+
+class RetryPolicy(object):
+    """
+    Retries throttled and transiently failing requests made by ShopifyConnection.
+
+    A 429 Too Many Requests is retried after the delay given by its
+    Retry-After header. 502, 503 and 504 responses are retried with jittered
+    exponential backoff, but only for idempotent methods since a POST may
+    already have been processed. Each request gets its own budget of
+    `max_retries` attempts and `max_wait` seconds of sleeping; once it is
+    spent the last error is raised as before.
+
+    Retries are counted per endpoint, e.g. "GET /admin/api/{version}/products.json".
+
+    >>> import shopify
+    >>> shopify.ShopifyConnection.retry_policy = shopify.RetryPolicy(max_retries=5)
+    """
+
+    THROTTLED = 429
+    TRANSIENT_STATUSES = (502, 503, 504)
+    IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE")
+
+    def __init__(
+        self, max_retries=5, max_wait=60.0, backoff_factor=0.5, max_backoff=30.0, sleep=time.sleep, rand=random.random
+    ):
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.rand = rand
+        self.retries = collections.Counter()
+        self.exhausted = collections.Counter()
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff: uniform in [0, min(max_backoff, factor * 2 ** attempt)]."""
+        return self.rand() * min(self.max_backoff, self.backoff_factor * (2**attempt))
+
+    def delay(self, method, error, attempt):
+        """Seconds to wait before retrying after `error`, or None if it should not be retried."""
+        code = getattr(error, "code", None)
+        if code == self.THROTTLED:
+            retry_after = header_value(getattr(error.response, "headers", None) or {}, "Retry-After")
+            try:
+                return max(0.0, float(retry_after))
+            except (TypeError, ValueError):
+                return self.backoff(attempt)
+        if code in self.TRANSIENT_STATUSES and method in self.IDEMPOTENT_METHODS:
+            return self.backoff(attempt)
+        return None
+
+    def call(self, method, endpoint, func, *args, **kwargs):
+        """Call `func`, retrying it while the errors it raises are retryable and the budget lasts."""
+        attempt = 0
+        waited = 0.0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except pyactiveresource.connection.Error as err:
+                delay = self.delay(method, err, attempt)
+                if delay is None:
+                    raise
+                key = "%s %s" % (method, endpoint)
+                if attempt >= self.max_retries or waited + delay > self.max_wait:
+                    with self._lock:
+                        self.exhausted[key] += 1
+                    raise
+                with self._lock:
+                    self.retries[key] += 1
+            self.sleep(delay)
+            waited += delay
+            attempt += 1
+
+    def stats(self):
+        """Retry and exhausted-budget counts per endpoint."""
+        with self._lock:
+            return {"retries": dict(self.retries), "exhausted": dict(self.exhausted)}
+
+    def reset(self):
+        with self._lock:
+            self.retries.clear()
+            self.exhausted.clear()
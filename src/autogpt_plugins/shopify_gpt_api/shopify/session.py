@@ -1,5 +1,6 @@
 import time
 import hmac
+import base64
 import json
 from hashlib import sha256
 
@@ -158,6 +159,24 @@ class Session(object):
         # Generate the hex digest for the sorted parameters using the secret.
         return hmac.new(cls.secret.encode(), encoded_params.encode(), sha256).hexdigest()
 
+    @classmethod
+    def calculate_webhook_hmac(cls, body):
+        """
+        Calculate the base64 encoded HMAC Shopify sends in the X-Shopify-Hmac-Sha256 header of a webhook.
+        See https://shopify.dev/docs/apps/webhooks/configuration/https#step-5-verify-the-webhook.
+        """
+        if isinstance(body, six.text_type):
+            body = body.encode("utf-8")
+        digest = hmac.new(cls.secret.encode(), body, sha256).digest()
+        return base64.b64encode(digest).decode("utf-8")
+
+    @classmethod
+    def validate_webhook_hmac(cls, body, hmac_header):
+        """Whether `hmac_header` is the signature of the raw webhook `body`."""
+        if not hmac_header or not cls.secret:
+            return False
+        return hmac.compare_digest(cls.calculate_webhook_hmac(body).encode("utf-8"), hmac_header.encode("utf-8"))
+
     @classmethod
     def __encoded_params_for_signature(cls, params):
         """
@@ -0,0 +1,240 @@
+import codecs
+import json
+import re
+from pyactiveresource import formats
+from shopify.collection import parse_link_header
+from shopify.limits import header_value
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+# The characters that matter when looking for the end of a value outside strings
+_STRUCTURE = re.compile(r'["\\\[\]{}]')
+
+
+def _chunks(body, chunk_size):
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        view = memoryview(body)
+        for start in range(0, len(view), chunk_size):
+            yield view[start : start + chunk_size]
+    else:
+        for chunk in body:
+            yield chunk
+
+
+class _Reader(object):
+    """A text buffer over byte chunks that drops what has been consumed."""
+
+    def __init__(self, chunks, encoding):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Append the next chunk to the buffer; returns False at the end of the body."""
+        if self.eof:
+            return False
+        chunk = next(self._chunks, None)
+        if self.pos:
+            self.buffer = self.buffer[self.pos :]
+            self.pos = 0
+        if chunk is None:
+            self.eof = True
+            self.buffer += self._decoder.decode(b"", final=True)
+            return False
+        self.buffer += self._decoder.decode(bytes(chunk))
+        return True
+
+    def peek(self):
+        """The next non-whitespace character, or None at the end of the body."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise formats.Error("Expected %r at offset %d of the response body" % (char, self.pos))
+        self.pos += 1
+
+    def _read_to_end(self):
+        """
+        Read chunks until the array, object or string at the current position
+        is complete in the buffer; returns False if the body ends first.
+
+        The scan carries its nesting depth across chunks and the chunks are
+        joined once at the end, so a value spanning many chunks is read in
+        linear time.
+        """
+        depth = 0
+        in_string = False
+        skip = 0
+        text, index = self.buffer, self.pos
+        pieces = []
+        complete = False
+        while True:
+            if skip:
+                # The character after a backslash, possibly in the next chunk
+                consumed = min(skip, len(text) - index)
+                index += consumed
+                skip -= consumed
+            if skip:
+                position = -1
+            elif in_string:
+                quote = text.find('"', index)
+                escape = text.find("\\", index, len(text) if quote < 0 else quote)
+                position = quote if escape < 0 else escape
+            else:
+                match = _STRUCTURE.search(text, index)
+                position = match.start() if match else -1
+            if position < 0:
+                chunk = None if self.eof else next(self._chunks, None)
+                if chunk is None:
+                    if not self.eof:
+                        self.eof = True
+                        pieces.append(self._decoder.decode(b"", final=True))
+                    break
+                text, index = self._decoder.decode(bytes(chunk)), 0
+                pieces.append(text)
+                continue
+            char = text[position]
+            index = position + 1
+            if char == "\\":
+                skip = 1
+            elif char == '"':
+                in_string = not in_string
+                if not in_string and depth == 0:
+                    complete = True
+                    break
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    complete = True
+                    break
+        self.buffer = self.buffer[self.pos :] + "".join(pieces)
+        self.pos = 0
+        return complete
+
+    def value(self, decoder):
+        """Decode the JSON value at the current position, reading more chunks as needed."""
+        self.peek()
+        buffered = False
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except ValueError as err:
+                # Decode again only once the whole value is buffered, instead of after every chunk
+                if self.pos < len(self.buffer) and self.buffer[self.pos] in "{[\"":
+                    if not buffered and self._read_to_end():
+                        buffered = True
+                        continue
+                elif self.fill():
+                    continue
+                raise formats.Error(err)
+            if end == len(self.buffer) and not self.eof and self.buffer[self.pos] not in "{[\"":
+                # A number or literal may continue in the next chunk.
+                if self.fill():
+                    continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(body, encoding="utf-8", chunk_size=CHUNK_SIZE):
+    """
+    Yield the elements of a JSON list response one at a time.
+
+    `body` is the raw bytes of the response or an iterable of byte chunks.
+    Both bare arrays and Shopify's single root key envelope
+    ({"products": [...]}) are accepted. Only one element is decoded at a
+    time, so the peak of temporary objects stays at a single element however
+    long the list is. A root value that is not an array is yielded whole.
+    """
+    reader = _Reader(_chunks(body, chunk_size), encoding)
+    decoder = json.JSONDecoder()
+
+    if reader.peek() == "{":
+        reader.pos += 1
+        if reader.peek() == "}":
+            return
+        reader.value(decoder)
+        reader.expect(":")
+        if reader.peek() != "[":
+            value = reader.value(decoder)
+            if reader.peek() != "}":
+                raise formats.Error("Expected a single root key in the response body")
+            yield value
+            return
+    elif reader.peek() != "[":
+        if reader.peek() is not None:
+            yield reader.value(decoder)
+        return
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value(decoder)
+        char = reader.peek()
+        if char == "]":
+            return
+        if char != ",":
+            raise formats.Error("Expected ',' or ']' at offset %d of the response body" % reader.pos)
+        reader.pos += 1
+
+
+class ResourceStream(object):
+    """
+    A page of a list endpoint whose resources are built one at a time.
+
+    Iterating decodes the response body incrementally and yields each
+    resource as soon as its element has been parsed, instead of decoding the
+    whole page into dicts first. A stream can be iterated once. Pagination
+    mirrors PaginatedCollection:
+
+    >>> page = shopify.Order.find_stream(limit=250, status="any")
+    >>> while True:
+    ...     for order in page:
+    ...         do_something(order)
+    ...     if not page.has_next_page():
+    ...         break
+    ...     page = page.next_page()
+    """
+
+    def __init__(self, resource_class, response, prefix_options=None):
+        self.resource_class = resource_class
+        self.headers = response.headers
+        self.prefix_options = prefix_options
+        self._body = response.body
+        links = parse_link_header(header_value(response.headers, "Link"))
+        self.next_page_url = links.get("next")
+        self.previous_page_url = links.get("previous")
+
+    def __iter__(self):
+        body, self._body = self._body, None
+        if body is None:
+            raise RuntimeError("A ResourceStream can only be iterated once")
+        for element in iter_json_array(body):
+            yield self.resource_class._build_object(element, self.prefix_options)
+
+    def has_next_page(self):
+        return bool(self.next_page_url)
+
+    def has_previous_page(self):
+        return bool(self.previous_page_url)
+
+    def next_page(self, no_cache=True):
+        # Streams never link to the pages they were read from, no_cache is accepted for PaginatedIterator.
+        if not self.has_next_page():
+            raise IndexError("No next page")
+        return self.resource_class.find_stream(from_=self.next_page_url)
+
+    def previous_page(self):
+        if not self.has_previous_page():
+            raise IndexError("No previous page")
+        return self.resource_class.find_stream(from_=self.previous_page_url)
@@ -0,0 +1,160 @@
+import collections
+import fnmatch
+import json
+import threading
+from six.moves import BaseHTTPServer, socketserver
+from shopify.base import ShopifyResource
+from shopify.session import Session
+
+
+class WebhookHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        code = self.server.receive(
+            self.headers.get("X-Shopify-Topic"),
+            body,
+            self.headers.get("X-Shopify-Hmac-Sha256"),
+            self.headers.get("X-Shopify-Webhook-Id"),
+        )
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookReceiver(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    A small HTTP server that verifies Shopify webhooks and dispatches them by topic.
+
+    Every POST must carry an X-Shopify-Hmac-Sha256 header matching its body
+    signed with Session.secret, otherwise it is answered with 401 and not
+    dispatched. Handlers are subscribed with a topic pattern ("products/*")
+    and called with the topic and the decoded payload. Deliveries Shopify
+    retries are recognised by their X-Shopify-Webhook-Id and dispatched once;
+    a copy arriving while the first is still being handled is answered 409.
+    A handler error answers 500, so Shopify delivers the webhook again, and
+    the redelivery only calls the handlers that had not completed yet.
+    Handlers run with the session settings of the thread that started the
+    receiver, so they can build and save resources.
+
+    >>> shopify.Session.setup(api_key=API_KEY, secret=API_SECRET)
+    >>> receiver = shopify.WebhookReceiver(port=8080)
+    >>> receiver.subscribe("products/*", lambda topic, product: index.add(product))
+    >>> with receiver:
+    ...     run_app()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, remember=1024):
+        """
+        Args:
+            host, port: The address to listen on; port 0 picks a free port.
+            remember: How many webhook ids are kept to drop redelivered webhooks.
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), WebhookHandler)
+        self.remember = remember
+        self.received = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self._handlers = []
+        self._seen = collections.OrderedDict()
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._settings = None
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self.server_address[:2]
+
+    def subscribe(self, pattern, handler):
+        """Call `handler(topic, payload)` for the webhooks whose topic matches the fnmatch `pattern`."""
+        self._handlers.append((pattern, handler))
+        return handler
+
+    def unsubscribe(self, handler):
+        self._handlers = [(pattern, h) for pattern, h in self._handlers if h != handler]
+
+    def receive(self, topic, body, hmac_header, webhook_id=None):
+        """Verify and dispatch one delivery; returns the HTTP status to answer with."""
+        if not topic or not Session.validate_webhook_hmac(body, hmac_header):
+            with self._lock:
+                self.rejected += 1
+            return 401
+        done = None
+        with self._lock:
+            if webhook_id is not None:
+                if webhook_id in self._in_flight:
+                    self.duplicates += 1
+                    return 409
+                if self._seen.get(webhook_id) is True:
+                    self.duplicates += 1
+                    return 200
+                self._in_flight.add(webhook_id)
+                done = self._seen.pop(webhook_id, None)
+            self.received += 1
+        try:
+            return self._handle(topic, body, webhook_id, set() if done is None else done)
+        finally:
+            if webhook_id is not None:
+                with self._lock:
+                    self._in_flight.discard(webhook_id)
+
+    def _handle(self, topic, body, webhook_id, done):
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except ValueError:
+            return 400
+        try:
+            if self._settings is not None:
+                ShopifyResource.restore_settings(self._settings)
+            self.dispatch(topic, payload, done)
+            code = 200
+        except Exception:
+            code = 500
+        if webhook_id is not None:
+            with self._lock:
+                # A failed delivery remembers which handlers already completed.
+                self._seen[webhook_id] = True if code == 200 else done
+                while len(self._seen) > self.remember:
+                    self._seen.popitem(last=False)
+        return code
+
+    def dispatch(self, topic, payload, done=None):
+        """
+        Call the handlers subscribed to `topic`, skipping those already in
+        `done` and adding each one to it once it returns.
+        """
+        for pattern, handler in list(self._handlers):
+            if done is not None and handler in done:
+                continue
+            if fnmatch.fnmatchcase(topic, pattern):
+                handler(topic, payload)
+                if done is not None:
+                    done.add(handler)
+
+    def start(self):
+        """Serve on a background thread."""
+        self._settings = ShopifyResource.capture_settings()
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.1})
+        self._thread.name = "shopify-webhooks"
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -1,18 +1,209 @@
+import asyncio
 import shopify
 from google.ads.googleads.client import GoogleAdsClient
 import requests
 from bs4 import BeautifulSoup
+import threading
 import time
 import os
+import hashlib
+import json
+import re
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone, tzinfo
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    # Python 3.8: the backport if it is installed, otherwise the shop's fixed UTC offset
+    try:
+        from backports.zoneinfo import ZoneInfo
+    except ImportError:
+        ZoneInfo = None
 from . import ShopifyAutoGPT
+from .customer_stats import CustomerBehavior
+from .inventory_snapshot import InventorySnapshot
+from .product_index import ProductIndex, TitleResolver
+from .rfm import SegmentCache, score_rfm
+from .store_mirror import StoreMirror
+from .sales_aggregates import CollectionMembers, SalesAggregates
+from .sales_engine import SalesColumns, format_cents, sales_by_collection, summarize_sales, summarize_totals, to_cents
+from .store_snapshot import StoreSnapshot, current_snapshot, use_snapshot
 from auto_gpt_plugin_template import AutoGPTPluginTemplate
 from typing import Union, Any, Dict, List, Optional, Tuple, TypeVar, TypedDict
 
 
 plugin = ShopifyAutoGPT()
 
+# Resolves product titles locally; built on first use and kept fresh incrementally
+product_index = ProductIndex()
+
+# Titles of the products on order line items, fetched 250 per request and memoized
+title_resolver = TitleResolver()
+
+# RFM segments of the customers, recomputed once older than SHOPIFY_SEGMENT_MAX_AGE seconds
+segment_cache = SegmentCache(max_age=float(os.getenv("SHOPIFY_SEGMENT_MAX_AGE", "900")))
+
+# Available quantity of every variant at every location, rebuilt once older than SHOPIFY_INVENTORY_MAX_AGE seconds
+inventory = InventorySnapshot(max_age=float(os.getenv("SHOPIFY_INVENTORY_MAX_AGE", "300")))
+
+# Pages fetched ahead in the background while full-catalog scans process the current one
+SCAN_PREFETCH = 1
+
+# The attributes each command reads, per resource. They are requested with ?fields=
+# so Shopify leaves out the variants, images and options a command never looks at.
+# Commands that return or save whole resources are not listed and fetch everything.
+COMMAND_FIELDS = {
+    "get_product": {"product": ("id", "title", "body_html", "tags")},
+    "get_product_metafields": {"product": ("id", "title")},
+    "get_product_details_and_metafields": {"product": ("id", "title", "body_html", "tags")},
+    "get_all_products": {"product": ("id", "title")},
+    "get_all_product_names": {"product": ("title",)},
+    "get_all_orders": {"order": ("id", "created_at", "customer", "line_items", "total_price")},
+    "analyze_sales": {
+        "order": ("total_price", "source_name", "line_items"),
+        "product": ("title",),
+    },
+    "analyze_customer_behavior": {
+        "customer": ("id", "first_name", "last_name", "email"),
+        "order": ("id", "created_at", "customer", "line_items"),
+    },
+    "summarize_customer_behavior": {
+        "customer": ("id", "first_name", "last_name", "email"),
+        "order": ("created_at", "customer", "line_items"),
+    },
+    "segment_customers": {
+        "customer": ("id", "first_name", "last_name", "email"),
+        "order": ("created_at", "customer", "line_items"),
+    },
+    "stock_management": {"product": ("id", "title", "variants")},
+    "order_fulfillment": {"order": ("id", "name", "fulfillment_status", "line_items")},
+    "analyze_stock_levels": {"product": ("variants",)},
+    "get_unfulfilled_orders": {"order": ("id", "customer", "line_items")},
+    "get_customers_with_returns": {"order": ("id", "customer", "refunds")},
+}
+
+
+def fields_for(command: str, resource: str) -> Optional[Tuple[str, ...]]:
+    """The fields `command` declared for `resource`, or None to fetch every attribute."""
+    return COMMAND_FIELDS.get(command, {}).get(resource)
+
+
+def fields_for_all(commands: Tuple[str, ...], resource: str) -> Optional[Tuple[str, ...]]:
+    """The fields of `resource` read by any of `commands`, or None if one of them needs every attribute.
+
+    A listed command that declares no fields for `resource` does not read it.
+    """
+    merged: List[str] = ["id"]
+    for command in commands:
+        if command not in COMMAND_FIELDS:
+            return None
+        merged.extend(field for field in COMMAND_FIELDS[command].get(resource, ()) if field not in merged)
+    return tuple(merged)
+
+
+# Directory where full exports checkpoint every page, so a run that dies resumes where it stopped
+CHECKPOINT_DIR = os.getenv("SHOPIFY_CHECKPOINT_DIR")
+
+
+# Checkpoints older than SHOPIFY_CHECKPOINT_MAX_AGE seconds are started over rather than resumed
+shopify.ScanCheckpoint.max_age = float(os.getenv("SHOPIFY_CHECKPOINT_MAX_AGE", "86400"))
+
+
+def checkpoint_for(command: str, resource: str, **filters: Any) -> Optional[str]:
+    """
+    The checkpoint file for the `resource` scan of `command` with `filters`, or None when checkpoints are disabled.
+
+    Each set of filters gets its own file, so scans of different date ranges do not discard each other's progress.
+    """
+    if not CHECKPOINT_DIR:
+        return None
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    key = hashlib.sha1(json.dumps(filters, sort_keys=True, default=str).encode()).hexdigest()[:12]
+    return os.path.join(CHECKPOINT_DIR, f"{command}.{resource}.{key}.jsonl")
+
+
+# Local SQLite mirror the analytics commands read from when SHOPIFY_MIRROR_PATH is set.
+# It is synced incrementally before a read once it is older than SHOPIFY_MIRROR_MAX_AGE seconds.
+MIRROR_PATH = os.getenv("SHOPIFY_MIRROR_PATH")
+store_mirror = StoreMirror(MIRROR_PATH, max_age=float(os.getenv("SHOPIFY_MIRROR_MAX_AGE", "300"))) if MIRROR_PATH else None
+
+
+# Per-product and per-day sales totals analyze_sales reads when SHOPIFY_AGGREGATES_PATH is set. They are
+# updated from the orders changed since the last sync once older than SHOPIFY_AGGREGATES_MAX_AGE seconds.
+AGGREGATES_PATH = os.getenv("SHOPIFY_AGGREGATES_PATH")
+sales_aggregates = (
+    SalesAggregates(AGGREGATES_PATH, max_age=float(os.getenv("SHOPIFY_AGGREGATES_MAX_AGE", "300")))
+    if AGGREGATES_PATH
+    else None
+)
+
+# The collections and their products, for the sales by collection computed without the aggregates.
+# Reloaded once older than SHOPIFY_COLLECTIONS_MAX_AGE seconds, as the aggregates reload theirs.
+collection_cache = CollectionMembers(max_age=float(os.getenv("SHOPIFY_COLLECTIONS_MAX_AGE", "3600")))
+
+# Webhook events whose payload is the resource itself, by resource
+WEBHOOK_UPSERTS = {
+    "products": ("create", "update"),
+    "orders": ("create", "updated", "paid", "cancelled", "fulfilled", "partially_fulfilled"),
+    "customers": ("create", "update", "enable", "disable"),
+}
+
+
+def apply_webhook(topic: str, payload: Dict[str, Any]) -> None:
+    """Apply a products/*, orders/*, customers/* or inventory_levels/* webhook to the local indexes and the mirror.
+
+    Inventory levels go to the inventory snapshot stock_management reads; the mirror does not keep them.
+    """
+    resource, _, event = topic.partition("/")
+    if resource == "inventory_levels":
+        if event in ("update", "connect"):
+            inventory.apply_level(payload)
+        elif event == "disconnect":
+            inventory.remove_level(payload["inventory_item_id"], payload["location_id"])
+        return
+
+    if event == "delete":
+        if resource == "products":
+            product_index.remove(payload["id"])
+            title_resolver.forget(payload["id"])
+            inventory.invalidate()
+        if resource == "orders" and sales_aggregates:
+            sales_aggregates.remove(payload["id"])
+        if store_mirror and resource in WEBHOOK_UPSERTS:
+            store_mirror.delete(resource, payload["id"])
+    elif event in WEBHOOK_UPSERTS.get(resource, ()):
+        if resource == "products":
+            product_index.add(shopify.Product(payload))
+            title_resolver.forget(payload["id"])
+            inventory.invalidate()
+        if resource == "orders" and sales_aggregates:
+            sales_aggregates.apply(payload)
+        if store_mirror:
+            store_mirror.apply(resource, payload)
+
+
+# Keeps the product index and the mirror current between syncs when SHOPIFY_WEBHOOK_PORT is set.
+# Register the webhooks in Shopify with the address this port is reachable at.
+WEBHOOK_PORT = os.getenv("SHOPIFY_WEBHOOK_PORT")
+webhook_receiver: Optional[shopify.WebhookReceiver] = None
+webhook_receiver_lock = threading.Lock()
+
+
+def start_webhook_receiver() -> Optional[shopify.WebhookReceiver]:
+    """Listen for webhooks on SHOPIFY_WEBHOOK_PORT (on SHOPIFY_WEBHOOK_HOST) and apply them as they arrive.
+
+    Called from the plugin's post_prompt hook; the receiver is started once and reused on later calls.
+    """
+    global webhook_receiver
+    with webhook_receiver_lock:
+        if webhook_receiver is None and WEBHOOK_PORT:
+            shopify.Session.setup(api_key=plugin.shopify_api_key, secret=plugin.shopify_api_secret)
+            host = os.getenv("SHOPIFY_WEBHOOK_HOST", "127.0.0.1")
+            receiver = shopify.WebhookReceiver(host=host, port=int(WEBHOOK_PORT))
+            receiver.subscribe("*", apply_webhook)
+            webhook_receiver = receiver.start()
+        return webhook_receiver
+
 
 def create_product(title: str, description: Optional[str] = None) -> shopify.Product:
     """Create a new product on Shopify.
@@ -33,6 +224,7 @@ def create_product(title: str, description: Optional[str] = None) -> shopify.Pro
 
     product.body_html = description
     product.save()
+    product_index.add(product)
 
     return product
 
@@ -48,10 +240,10 @@ def get_product(product_identifier: Union[str, int]) -> Optional[Dict[str, Union
     # If the identifier is numeric, it's treated as an ID.
     if str(product_identifier).isdigit():
         product_id = int(product_identifier)
-        product = shopify.Product.find(product_id)
+        product = shopify.Product.find(product_id, fields=fields_for("get_product", "product"))
     else:
-        all_products = shopify.Product.find()
-        product = next((p for p in all_products if p.title.lower() == product_identifier.lower()), None)
+        product_id = product_index.find_title(product_identifier)
+        product = shopify.Product.find(product_id, fields=fields_for("get_product", "product")) if product_id else None
 
     if product:
         attributes = {
@@ -83,10 +275,10 @@ def get_product_metafields(product_identifier: Union[str, int]) -> Optional[List
     # If the identifier is numeric, it's treated as an ID.
     if str(product_identifier).isdigit():
         product_id = int(product_identifier)
-        product = shopify.Product.find(product_id)
+        product = shopify.Product.find(product_id, fields=fields_for("get_product_metafields", "product"))
     else:
-        all_products = shopify.Product.find()
-        product = next((p for p in all_products if p.title.lower() == product_identifier.lower()), None)
+        product_id = product_index.find_title(product_identifier)
+        product = shopify.Product.find(product_id, fields=fields_for("get_product_metafields", "product")) if product_id else None
 
     if product:
         metafields = shopify.Metafield.find(resource_id=product.id)
@@ -126,10 +318,10 @@ def get_product_details_and_metafields(product_identifier: Union[str, int]) -> O
     # If the identifier is numeric, it's treated as an ID.
     if str(product_identifier).isdigit():
         product_id = int(product_identifier)
-        product = shopify.Product.find(product_id)
+        product = shopify.Product.find(product_id, fields=fields_for("get_product_details_and_metafields", "product"))
     else:
-        all_products = shopify.Product.find()
-        product = next((p for p in all_products if p.title.lower() == product_identifier.lower()), None)
+        product_id = product_index.find_title(product_identifier)
+        product = shopify.Product.find(product_id, fields=fields_for("get_product_details_and_metafields", "product")) if product_id else None
 
     if product:
         metafields = shopify.Metafield.find(resource_id=product.id)
@@ -179,7 +371,7 @@ def get_products(sort_by: Optional[str] = None, tags: Optional[List[str]] = None
     Returns:
         List[shopify.Product]: List of products matching the specified criteria.
     """
-    products = shopify.Product.find()
+    products = list(shopify.Product.scan(prefetch=SCAN_PREFETCH))
 
     if tags:
         products = [product for product in products if all(tag in product.tags for tag in tags)]
@@ -195,19 +387,13 @@ def get_all_products() -> List[Tuple[int, str]]:
     Returns:
         List[Tuple[int, str]]: List of all products represented as tuples (id, name).
     """
-    limit = 100
-    get_next_page = True
-    since_id = 0
-    products = []
-
-    while get_next_page:
-        products_page = shopify.Product.find(since_id=since_id, limit=limit)
-        products.extend(products_page)
-
-        if len(products_page) < limit:
-            get_next_page = False
-        else:
-            since_id = products_page[-1].id
+    products = list(
+        shopify.Product.scan(
+            fields=fields_for("get_all_products", "product"),
+            prefetch=SCAN_PREFETCH,
+            checkpoint=checkpoint_for("get_all_products", "product"),
+        )
+    )
 
     print(f"Found {len(products)} products.")
 
@@ -221,7 +407,7 @@ def get_all_product_names() -> List[str]:
     Returns:
         List[Any]: List of all products by name.
     """
-    products = shopify.Product.find()
+    products = shopify.Product.scan(fields=fields_for("get_all_product_names", "product"), prefetch=SCAN_PREFETCH)
     product_names = [product.title for product in products]
     return product_names
 
@@ -235,27 +421,10 @@ def search_products_by_title(title: str) -> List[Tuple[int, str]]:
     Returns:
         List[Tuple[int, shopify.Product]]: List of products that match the title.
     """
-    lowercase_title = title.casefold()
-    matching_products = []
-
-    # Set the initial values for pagination
-    get_next_page = True
-    limit = 100
-    since_id = 0
-
-    while get_next_page:
-        # Retrieve the products using the Shopify API with pagination parameters
-        products = shopify.Product.find(limit=limit, since_id=since_id)
-        
-        for product in products:
-            if lowercase_title in product.title.casefold():
-                matching_products.append((product.id, product.title))
-
-        # Check if there are more pages of results
-        if len(products) < limit:
-            get_next_page = False
-        else:
-            since_id = products[-1].id
+    matching_products = product_index.search(title)
+    if not matching_products:
+        # Nothing contains the text, fall back to titles that look alike (typos, word order)
+        matching_products = [(product_id, product_title) for product_id, product_title, _ in product_index.similar(title)]
 
     return matching_products
 
@@ -454,6 +623,8 @@ def update_product(product_id: str, title: Optional[str] = None, description: Op
         except Exception as e:
             print(f"Error saving product: {str(e)}")
             return None
+        product_index.add(product)
+        title_resolver.forget(product.id)
 
         print(f"Product {product_id} updated successfully.")
         print("Updated Product Details:")
@@ -482,35 +653,47 @@ def delete_product(product_id: str) -> None:
     Args:
         product_id (str): The ID of the product to delete.
     """
-    product = get_product(product_id)
-    product.destroy()
+    if not str(product_id).isdigit():
+        product_id = product_index.find_title(product_id)
+        if product_id is None:
+            return
+    shopify.Product({"id": int(product_id)}).destroy()
+    product_index.remove(int(product_id))
+    title_resolver.forget(int(product_id))
 
 def get_all_orders() -> List[Dict[str, Any]]:
     """Fetch all orders from Shopify and return insights."""
 
-    orders = shopify.Order.find(status="any")  # Fetch all orders
+    snapshot = current_snapshot()
+    if snapshot:
+        orders = snapshot.orders
+        titles = snapshot.product_titles
+    else:
+        try:
+            orders = list(
+                shopify.Order.scan(
+                    status="any",
+                    fields=fields_for("get_all_orders", "order"),
+                    prefetch=SCAN_PREFETCH,
+                    checkpoint=checkpoint_for("get_all_orders", "order", status="any"),
+                    stream=True,
+                )
+            )  # Fetch all orders
+            print(f"Fetched {len(orders)} orders.")  # Print number of fetched orders
+        except Exception as e:
+            print(f"Error fetching orders: {e}")
+            return []
+        titles = title_resolver.resolve(item.product_id for order in orders for item in order.line_items)
 
-    try:
-        orders = shopify.Order.find(status="any")  # Fetch all orders
-        print(f"Fetched {len(orders)} orders.")  # Print number of fetched orders
-    except Exception as e:
-        print(f"Error fetching orders: {e}")
-        return []
-    
     all_orders = []
 
     for order in orders:
         try:
             line_items = []
             for item in order.line_items:
-                product_name = None
-                if item.product_id:
-                    product = shopify.Product.find(item.product_id)
-                    product_name = product.title if product else None
-
                 line_items.append({
                     "product_id": item.product_id,
-                    "product_name": product_name,
+                    "product_name": titles.get(item.product_id),
                     "quantity": item.quantity,
                     "price": item.price
                 })
@@ -533,7 +716,8 @@ def get_all_orders() -> List[Dict[str, Any]]:
 def get_all_orders_old() -> List[Dict[str, Any]]:
     """Fetch all orders from Shopify and return insights."""
 
-    orders = shopify.Order.find()  # Fetch all orders
+    orders = list(shopify.Order.scan(prefetch=SCAN_PREFETCH, stream=True))  # Fetch all orders
+    titles = title_resolver.resolve(item.product_id for order in orders for item in order.line_items)
     all_orders = []
 
     for order in orders:
@@ -543,7 +727,7 @@ def get_all_orders_old() -> List[Dict[str, Any]]:
             "customer": order.customer.id if order.customer else None,
             "line_items": [{
                 "product_id": item.product_id,
-                "product_name": shopify.Product.find(item.product_id).title if item.product_id else None,
+                "product_name": titles.get(item.product_id),
                 "quantity": item.quantity,
                 "price": item.price
             } for item in order.line_items],
@@ -553,50 +737,162 @@ def get_all_orders_old() -> List[Dict[str, Any]]:
 
     return all_orders
 
-def analyze_sales() -> Dict[str, Any]:
-    """Analyze sales data and return insights."""
-
-    # Fetch all orders and all products
-    orders = shopify.Order.find(status="any")
-    all_products = shopify.Product.find()
-    
-    total_sales = sum(float(order.total_price) for order in orders)  # Compute total sales
-    total_sales = f"${total_sales:.2f}"
+# The time zone of each shop by site, with when it was fetched; fetched again once older than an hour
+SHOP_TIMEZONE_MAX_AGE = 3600.0
+shop_timezones: Dict[str, Tuple[tzinfo, float]] = {}
+
+
+def shop_timezone() -> tzinfo:
+    """The time zone of the active shop, which its timestamps are in and the sales windows count days in."""
+    site = shopify.ShopifyResource.site or ""
+    cached = shop_timezones.get(site)
+    if cached and time.monotonic() - cached[1] <= SHOP_TIMEZONE_MAX_AGE:
+        return cached[0]
+    attributes = shopify.Shop.current().attributes
+    name = attributes.get("iana_timezone")
+    # Without zoneinfo, "(GMT-05:00) Eastern Time (US & Canada)" gives the offset, ignoring daylight saving time
+    offset = re.match(r"\(GMT([+-])(\d\d):(\d\d)\)", attributes.get("timezone") or "")
+    if name and ZoneInfo:
+        zone: tzinfo = ZoneInfo(name)
+    elif offset:
+        sign = -1 if offset.group(1) == "-" else 1
+        zone = timezone(sign * timedelta(hours=int(offset.group(2)), minutes=int(offset.group(3))))
+    else:
+        zone = timezone.utc
+    shop_timezones[site] = (zone, time.monotonic())
+    return zone
 
-    # Initialize product sales, product sold count, and product percentage contribution
-    product_data = defaultdict(lambda: {"sales": 0, "count": 0, "contribution": "0%"})
+def analyze_sales(start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
+    """Analyze sales data and return insights.
 
-    for order in orders:
-        for line_item in order.line_items:
-            product_data[line_item.title]["sales"] += float(line_item.price)
-            product_data[line_item.title]["count"] += line_item.quantity  # Assuming line_item has a 'quantity' attribute
+    Every source (aggregates, mirror or API) returns the same keys: total_sales, product_data,
+    slow_moving_products, sales_by_channel, sales_by_collection, start_date and end_date. Days are
+    calendar days in the shop's time zone, inclusive.
 
-    total_products_sold = sum(data["count"] for data in product_data.values())
-
-    # Calculate the percentage contribution of each product to total sales
-    for product, data in product_data.items():
-        if data["count"] > 0:
-            data["contribution"] = f"{round((data['count'] / total_products_sold) * 100, 2)}%"
+    Args:
+        start_date (Optional[str], optional): Only count orders created on or after this day (YYYY-MM-DD). Defaults to None.
+        end_date (Optional[str], optional): Only count orders created on or before this day (YYYY-MM-DD). Defaults to None.
+    """
+    try:
+        start = date.fromisoformat(start_date) if start_date else None
+        end = date.fromisoformat(end_date) if end_date else None
+    except (TypeError, ValueError):
+        return {"error": "start_date and end_date must be days in the form YYYY-MM-DD"}
+    if start and end and start > end:
+        return {"error": f"start_date {start_date} is after end_date {end_date}"}
+    windowed = bool(start or end)
+    start_date = start.isoformat() if start else None
+    end_date = end.isoformat() if end else None
+
+    snapshot = None if windowed else current_snapshot()
+    if sales_aggregates and not snapshot:
+        # Answered from the daily rollups; only the orders changed since the last call are fetched
+        totals = sales_aggregates.product_sales(start_date, end_date)
+        results = summarize_totals(
+            list(totals),
+            [product["sales"] for product in totals.values()],
+            [product["units"] for product in totals.values()],
+            sales_aggregates.total_revenue(start_date, end_date),
+            product_index.titles(),
+            slow_threshold=5,
+        )
+        results["sales_by_channel"] = {
+            channel: format_cents(data["revenue"])
+            for channel, data in sales_aggregates.channel_sales(start_date, end_date).items()
+        }
+        results["sales_by_collection"] = {
+            collection: format_cents(data["sales"])
+            for collection, data in sales_aggregates.collection_sales(start_date, end_date).items()
+        }
+        results["start_date"], results["end_date"] = start_date, end_date
+        return results
 
-    # Find out the slow-moving products (products that contribute 5% or less to total sales)
-    slow_moving_products = [product.title for product in all_products if product.title not in product_data or float(product_data[product.title]["contribution"].replace('%', '')) <= 5]
+    # Fetch all orders and all products
+    if snapshot:
+        orders = snapshot.orders
+        all_products = snapshot.products
+    elif store_mirror:
+        orders = list(store_mirror.orders(created_at_min=start_date, created_at_max=end_date))
+        all_products = store_mirror.products()
+    else:
+        # The same days as the aggregates and the mirror: midnight to midnight in the shop's time zone
+        window = {}
+        if start:
+            window["created_at_min"] = datetime(start.year, start.month, start.day, tzinfo=shop_timezone()).isoformat()
+        if end:
+            window["created_at_max"] = datetime(
+                end.year, end.month, end.day, 23, 59, 59, tzinfo=shop_timezone()
+            ).isoformat()
+        orders = list(
+            shopify.Order.scan(
+                status="any",
+                fields=fields_for("analyze_sales", "order"),
+                prefetch=SCAN_PREFETCH,
+                checkpoint=checkpoint_for("analyze_sales", "order", status="any", **window),
+                stream=True,
+                **window,
+            )
+        )
+        all_products = shopify.Product.scan(fields=fields_for("analyze_sales", "product"), prefetch=SCAN_PREFETCH)
+    
+    # Totals, per product sales and units, contribution and slow movers, computed over columns
+    columns = SalesColumns.from_orders(orders)
+    results = summarize_sales(columns, (product.title for product in all_products), slow_threshold=5)
 
-    # Format sales as currency
-    for data in product_data.values():
-        data["sales"] = f"${data['sales']:.2f}"
+    # Channel and collection totals counted as the aggregates count them: order totals by source_name,
+    # and line item prices of the products in each collection
+    channels: Dict[str, int] = defaultdict(int)
+    for order in orders:
+        channels[order.attributes.get("source_name") or ""] += to_cents(order.attributes.get("total_price"))
+    if snapshot and snapshot.collections is not None:
+        collections, members = snapshot.collections, snapshot.collection_members
+    else:
+        collections, members = collection_cache.get()
+    collection_titles = {collection.id: collection.title for collection in collections}
+    by_collection = sales_by_collection(columns, members, collection_titles)
+    results["sales_by_channel"] = {channel: format_cents(cents) for channel, cents in channels.items()}
+    results["sales_by_collection"] = {title: format_cents(cents) for title, cents in by_collection.items()}
+    results["start_date"], results["end_date"] = start_date, end_date
+    return results
 
-    return {
-        "total_sales": total_sales,
-        "product_data": dict(product_data),
-        "slow_moving_products": slow_moving_products,
-    }
+def analyze_customer_behavior(
+    top_k: Optional[int] = None, sort_by: str = "total_spent", page: int = 1
+) -> Dict[str, Any]:
+    """Analyze customer behavior data and return insights.
 
-def analyze_customer_behavior() -> Dict[str, Any]:
-    """Analyze customer behavior data and return insights."""
+    Args:
+        top_k (Optional[int], optional): Summarize instead of listing every customer: return statistics and this many top customers per page. Defaults to None.
+        sort_by (str, optional): Rank the top customers by "total_spent", "total_orders" or "last_order". Defaults to "total_spent".
+        page (int, optional): The page of top customers to return, for drilling down. Defaults to 1.
+    """
+    if top_k:
+        return summarize_customer_behavior(int(top_k), sort_by, int(page))
 
     # Fetch all customers and orders
-    customers = shopify.Customer.find()
-    orders = shopify.Order.find(status="any")
+    snapshot = current_snapshot()
+    if snapshot:
+        customers = snapshot.customers
+        orders = snapshot.orders
+    elif store_mirror:
+        customers = store_mirror.customers()
+        orders = list(store_mirror.orders())
+    else:
+        customers = shopify.Customer.scan(
+            fields=fields_for("analyze_customer_behavior", "customer"), prefetch=SCAN_PREFETCH, stream=True
+        )
+        orders = list(
+            shopify.Order.scan(
+                status="any",
+                fields=fields_for("analyze_customer_behavior", "order"),
+                prefetch=SCAN_PREFETCH,
+                checkpoint=checkpoint_for("analyze_customer_behavior", "order", status="any"),
+                stream=True,
+            )
+        )
+    if snapshot:
+        titles = snapshot.product_titles
+    else:
+        titles = title_resolver.resolve(item.product_id for order in orders for item in order.line_items)
 
     # Build a map from customer_id to customer details
     customers_by_id = {customer.id: customer for customer in customers}
@@ -624,12 +920,8 @@ def analyze_customer_behavior() -> Dict[str, Any]:
         total_spent_order = 0
         purchases = []
         for item in order.line_items:
-            product_name = None
-            if item.product_id:
-                product = shopify.Product.find(item.product_id)
-                product_name = product.title if product else None
             total_spent_order += float(item.price)
-            purchases.append(product_name)
+            purchases.append(titles.get(item.product_id))
 
         order_details = {
             'order_id': order.id,
@@ -648,10 +940,107 @@ def analyze_customer_behavior() -> Dict[str, Any]:
 
     return {"customer_behavior": list(customer_behavior.values())}
 
+def load_customer_behavior(command: str) -> CustomerBehavior:
+    """Fold the order history into per-customer totals while it streams in from the snapshot, mirror or API."""
+    snapshot = current_snapshot()
+    if snapshot:
+        orders = snapshot.orders
+    elif store_mirror:
+        orders = store_mirror.orders()
+    else:
+        orders = shopify.Order.scan(
+            status="any", fields=fields_for(command, "order"), prefetch=SCAN_PREFETCH, stream=True
+        )
+    return CustomerBehavior().extend(orders)
+
+
+def customer_details(command: str, customer_ids: List[int]) -> Dict[int, Dict[str, str]]:
+    """Name and email of the given customers, from the snapshot or fetched 250 per request."""
+    snapshot = current_snapshot()
+    if snapshot:
+        wanted = set(customer_ids)
+        customers = {customer.id: customer for customer in snapshot.customers if customer.id in wanted}
+    else:
+        customers = shopify.Customer.find_by_ids(customer_ids, fields=fields_for(command, "customer"))
+    return {
+        customer_id: {
+            "name": f'{customer.first_name or ""} {customer.last_name or ""}'.strip(),
+            "email": customer.email or "",
+        }
+        for customer_id, customer in customers.items()
+    }
+
+
+def summarize_customer_behavior(top_k: int, sort_by: str, page: int) -> Dict[str, Any]:
+    """Fold the order history into per-customer totals while it streams in and summarize them."""
+    behavior = load_customer_behavior("summarize_customer_behavior")
+    # Names and emails are only looked up for the customers on the page
+    return behavior.summary(
+        top_k, sort_by, page, details=lambda ids: customer_details("summarize_customer_behavior", ids)
+    )
+
+
+def segment_customers(segment: Optional[str] = None, top_k: int = 10, page: int = 1) -> Dict[str, Any]:
+    """
+    Segment the customers by recency, frequency and monetary (RFM) scores and estimate their lifetime value.
+
+    Scores are 1 to 5 by quintile across all customers. The segments are
+    cached for SHOPIFY_SEGMENT_MAX_AGE seconds, so listing the members of
+    one segment after another does not refold the order history.
+
+    Args:
+        segment: A segment name such as "champions" or "at_risk" to list the members of.
+        top_k: Members per page, highest lifetime value first.
+        page: The page of members to return.
+    """
+    def compute():
+        arrays = load_customer_behavior("segment_customers").to_arrays()
+        return score_rfm(arrays["ids"], arrays["orders"], arrays["spent"], arrays["first_order"], arrays["last_order"])
+
+    result = segment_cache.get(compute)
+    summary = {
+        "customers": len(result),
+        "computed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(result.computed_at)),
+        "segments": {
+            name: {
+                "customers": totals["customers"],
+                "revenue": format_cents(totals["revenue"]),
+                "average_ltv": format_cents(totals["average_ltv"]),
+            }
+            for name, totals in result.segments().items()
+        },
+    }
+    if segment is None:
+        return summary
+
+    top_k, page = int(top_k), max(1, int(page))
+    members = result.members(segment)
+    positions = members[(page - 1) * top_k : page * top_k].tolist()
+    ids = [int(result.ids[position]) for position in positions]
+    extra = customer_details("segment_customers", ids) if ids else {}
+    entries = []
+    for customer_id, position in zip(ids, positions):
+        entry = {"id": customer_id}
+        entry.update(extra.get(customer_id, {}))
+        entry.update(
+            {
+                "rfm": "%d%d%d" % (result.r[position], result.f[position], result.m[position]),
+                "days_since_last_order": int(result.recency[position]),
+                "total_orders": int(result.frequency[position]),
+                "total_spent": format_cents(result.monetary[position]),
+                "ltv": format_cents(int(result.ltv[position])),
+            }
+        )
+        entries.append(entry)
+    summary.update(
+        {"segment": segment, "page": page, "pages": -(-len(members) // top_k) if top_k else 0, "members": entries}
+    )
+    return summary
+
 def analyze_customer_behavior_old() -> Dict[str, Any]:
     """Analyze customer behavior data and return insights."""
 
-    customers = shopify.Customer.find()  # Fetch all customers
+    customers = shopify.Customer.scan(prefetch=SCAN_PREFETCH, stream=True)  # Fetch all customers
     customer_behavior = []
 
     all_orders = get_all_orders()  # Fetch all orders using the get_all_orders() function
@@ -705,29 +1094,71 @@ def analyze_customer_behavior_old() -> Dict[str, Any]:
 
     return {"customer_behavior": customer_behavior}
 
-def stock_management() -> Dict[str, Any]:
-    """Manage stock and identify low stock products."""
-
-    # Fetch all products
-    products = shopify.Product.find()
-
-    # Initialize a list to store low stock products
-    low_stock_products = []
-
-    # Check inventory quantity for each variant of each product
-    for product in products:
-        for variant in product.variants:
-            if variant.inventory_quantity <= 10:
-                low_stock_product = {
-                    "product_id": product.id,
-                    "product_name": product.title,
-                    "variant_id": variant.id,
-                    "variant_name": variant.title,
-                    "inventory_quantity": variant.inventory_quantity,
-                }
-                low_stock_products.append(low_stock_product)
+def load_inventory() -> InventorySnapshot:
+    """The variant x location inventory matrix, rebuilt from the catalog if it is stale."""
+
+    def products():
+        if store_mirror:
+            return store_mirror.products()
+        fields = fields_for_all(("stock_management", "analyze_stock_levels"), "product")
+        return shopify.Product.scan(fields=fields, prefetch=SCAN_PREFETCH)
+
+    inventory.ensure_fresh(products)
+    return inventory
+
+
+def stock_management(threshold: int = 10, location_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Manage stock and identify low stock products.
+
+    Args:
+        threshold: The available quantity at or below which a variant is low on stock.
+        location_id: Only consider the stock at this location.
+    """
+    snapshot = load_inventory()
+    location_id = int(location_id) if location_id else None
+    return {
+        "low_stock_products": snapshot.low_stock(int(threshold), location_id),
+        "locations": snapshot.location_totals(int(threshold)),
+    }
+
+# The analyses analyze_shopify_store runs on one shared snapshot
+STORE_ANALYSES = ("analyze_sales", "analyze_customer_behavior", "get_all_orders")
+
+
+async def load_store_snapshot(client: shopify.AsyncClient) -> StoreSnapshot:
+    """Load the orders, products, customers and collections every store analysis needs, each once and concurrently."""
+    if store_mirror:
+        orders, products, customers, (collections, members) = await asyncio.gather(
+            client.run(lambda: list(store_mirror.orders())),
+            client.run(lambda: list(store_mirror.products())),
+            client.run(lambda: list(store_mirror.customers())),
+            client.run(collection_cache.get),
+        )
+        return StoreSnapshot(orders, products, customers, collections, members)
 
-    return {"low_stock_products": low_stock_products}
+    def load(resource_class, resource, **filters):
+        fields = fields_for_all(STORE_ANALYSES, resource)
+        return list(resource_class.scan(fields=fields, prefetch=SCAN_PREFETCH, stream=True, **filters))
+
+    orders, products, customers, (collections, members) = await asyncio.gather(
+        client.run(load, shopify.Order, "order", status="any"),
+        client.run(load, shopify.Product, "product"),
+        client.run(load, shopify.Customer, "customer"),
+        client.run(collection_cache.get),
+    )
+    return StoreSnapshot(orders, products, customers, collections, members)
+
+
+async def _analyze_shopify_store() -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]:
+    """Load one snapshot of the store, then run the independent analyses on it concurrently."""
+    async with shopify.AsyncClient(max_workers=3) as client:
+        with use_snapshot(await load_store_snapshot(client)):
+            return await asyncio.gather(
+                client.run(analyze_sales),
+                client.run(analyze_customer_behavior),
+                client.run(get_all_orders),
+            )
 
 def analyze_shopify_store() -> Dict[str, Any]:
     """Analyze the Shopify store and return insights."""
@@ -735,16 +1166,10 @@ def analyze_shopify_store() -> Dict[str, Any]:
     # Initialize a dictionary to store the analysis results
     results = {}
 
-    # Analyze sales
-    sales_analysis = analyze_sales()
+    # Analyze sales and customer behavior and fetch all orders at the same time
+    sales_analysis, customer_behavior_analysis, all_orders = asyncio.run(_analyze_shopify_store())
     results["sales_analysis"] = sales_analysis
-
-    # Analyze customer behavior
-    customer_behavior_analysis = analyze_customer_behavior()
     results["customer_behavior_analysis"] = customer_behavior_analysis
-
-    # Fetch all orders
-    all_orders = get_all_orders()
     results["all_orders"] = all_orders
 
     # Analyze stock management
@@ -757,7 +1182,9 @@ def order_fulfillment() -> Dict[str, Any]:
     """Fulfill all unfulfilled orders."""
 
     # Fetch all orders
-    orders = shopify.Order.find(status="any")
+    orders = shopify.Order.scan(
+        status="any", fields=fields_for("order_fulfillment", "order"), prefetch=SCAN_PREFETCH, stream=True
+    )
 
     # Initialize a list to store fulfilled orders
     fulfilled_orders = []
@@ -791,16 +1218,18 @@ def manage_discounts_and_offers(product_identifiers: Union[List[int], List[str]]
     if not product_identifiers or not discount_value:
         return {"error": "product_identifiers and discount_value are required"}
 
-    # Fetch all products
-    products = shopify.Product.find()
-
-    # Filter products based on identifiers
+    # Resolve the identifiers to products through the index
     if isinstance(product_identifiers[0], int):
         # If product_identifiers are IDs
-        filtered_products = [product for product in products if product.id in product_identifiers]
+        product_ids = [product_id for product_id in product_identifiers if product_index.title(product_id) is not None]
     else:
         # If product_identifiers are names
-        filtered_products = [product for product in products if product.title in product_identifiers]
+        product_ids = [product_index.find_title(title) for title in product_identifiers]
+    filtered_products = [
+        shopify.Product({"id": product_id, "title": product_index.title(product_id)})
+        for product_id in product_ids
+        if product_id is not None
+    ]
 
     # Create a price rule and discount code for each product
     for product in filtered_products:
@@ -830,7 +1259,7 @@ def manage_discounts_and_offers(product_identifiers: Union[List[int], List[str]]
 def manage_discounts_and_offers_old() -> Dict[str, Any]:
     """Manage discounts and offers."""
     # Fetch all active discounts
-    active_discounts = shopify.PriceRule.find()
+    active_discounts = list(shopify.PriceRule.scan())
 
     # Initialize variables
     expired_discounts = []
@@ -868,7 +1297,7 @@ def customer_service() -> Dict[str, Any]:
     """Please note that this is a very simplified example. In reality, your customer inquiries could be stored elsewhere (for example, in a separate customer service software or a database), and resolving inquiries could involve much more than just updating a status field."""
 
     # Fetch all customers
-    customers = shopify.Customer.find()
+    customers = shopify.Customer.scan(prefetch=SCAN_PREFETCH, stream=True)
     customer_inquiries = []
 
     for customer in customers:
@@ -890,21 +1319,20 @@ def customer_service() -> Dict[str, Any]:
     return {"customer_inquiries": customer_inquiries}
 
 def analyze_stock_levels() -> Dict[str, int]:
-    """Analyze stock levels for all products and return the product ID and quantity."""
-    stock_levels = {}
-
-    products = shopify.Product.find()
-    for product in products:
-        for variant in product.variants:
-            stock_levels[variant.id] = variant.inventory_quantity
-
-    return stock_levels
+    """Analyze stock levels for all products and return the variant ID and quantity over all locations."""
+    snapshot = load_inventory()
+    return dict(zip(snapshot.variant_ids.tolist(), snapshot.totals().tolist()))
 
 def get_unfulfilled_orders() -> List[Dict[str, object]]:
     """Get a list of all orders that have not yet been fulfilled."""
     unfulfilled_orders = []
 
-    orders = shopify.Order.find(fulfillment_status='unfulfilled')
+    orders = shopify.Order.scan(
+        fulfillment_status='unfulfilled',
+        fields=fields_for("get_unfulfilled_orders", "order"),
+        prefetch=SCAN_PREFETCH,
+        stream=True,
+    )
     for order in orders:
         unfulfilled_orders.append({
             'order_id': order.id,
@@ -919,7 +1347,12 @@ def get_customers_with_returns() -> List[Dict[str, object]]:
     """Get a list of all customers who have made returns."""
     customers_with_returns = []
 
-    orders = shopify.Order.find()
+    if store_mirror:
+        orders = store_mirror.orders(status="open")
+    else:
+        orders = shopify.Order.scan(
+            fields=fields_for("get_customers_with_returns", "order"), prefetch=SCAN_PREFETCH, stream=True
+        )
     for order in orders:
         for refund in order.refunds:
             if refund:
@@ -984,12 +1417,12 @@ def get_all_collections(collection_type: Optional[str] = None) -> Union[List[sho
             The collections of the specified type.
     """
     if collection_type == "custom":
-        return shopify.CustomCollection.find()
+        return list(shopify.CustomCollection.scan())
     elif collection_type == "smart":
-        return shopify.SmartCollection.find()
+        return list(shopify.SmartCollection.scan())
     elif collection_type is None:
-        custom_collections = shopify.CustomCollection.find()
-        smart_collections = shopify.SmartCollection.find()
+        custom_collections = list(shopify.CustomCollection.scan())
+        smart_collections = list(shopify.SmartCollection.scan())
         return custom_collections + smart_collections
     else:
         raise ValueError("Invalid collection type. Must be 'custom', 'smart', or None.")
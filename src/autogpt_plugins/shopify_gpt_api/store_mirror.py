@@ -0,0 +1,311 @@
+"""A local SQLite mirror of the store's products, variants, orders and customers."""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+import shopify
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    vendor TEXT,
+    product_type TEXT,
+    status TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS variants (
+    id INTEGER PRIMARY KEY,
+    product_id INTEGER NOT NULL,
+    title TEXT,
+    sku TEXT,
+    price REAL,
+    inventory_item_id INTEGER,
+    inventory_quantity INTEGER
+);
+CREATE INDEX IF NOT EXISTS variants_product_id ON variants (product_id);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    customer_id INTEGER,
+    total_price REAL,
+    financial_status TEXT,
+    fulfillment_status TEXT,
+    closed_at TEXT,
+    cancelled_at TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_customer_id ON orders (customer_id);
+CREATE INDEX IF NOT EXISTS orders_created_at ON orders (created_at);
+CREATE TABLE IF NOT EXISTS order_line_items (
+    id INTEGER PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER,
+    variant_id INTEGER,
+    title TEXT,
+    quantity INTEGER,
+    price REAL
+);
+CREATE INDEX IF NOT EXISTS order_line_items_order_id ON order_line_items (order_id);
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    first_name TEXT,
+    last_name TEXT,
+    email TEXT,
+    orders_count INTEGER,
+    total_spent REAL,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    resource TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at REAL
+);
+"""
+
+
+def _number(value: Any) -> Optional[float]:
+    return float(value) if value not in (None, "") else None
+
+
+class StoreMirror:
+    """
+    Products (with their variants), orders (with their line items) and
+    customers mirrored into a SQLite database.
+
+    Each resource is synced incrementally: only what changed since the
+    newest updated_at stored (its watermark) is requested, using
+    updated_at_min. The watermark never passes the start of the sync that
+    stored it: scans page by id, so a record updated behind the cursor is
+    left to the next sync. Readers pass through ensure_fresh(), which syncs a
+    resource when its last sync is older than `max_age` seconds, so after
+    the first sync a command costs only the delta in API calls. The full
+    payload of every resource is kept, and readers get shopify resource
+    objects back, so commands work on them unchanged.
+
+    Deletions are not visible through updated_at; call rebuild() to drop
+    and reload a resource, or apply webhooks with apply() and delete() as
+    they arrive, which also keeps the mirror fresh between syncs.
+    """
+
+    RESOURCES = {
+        "products": (shopify.Product, {}),
+        "orders": (shopify.Order, {"status": "any"}),
+        "customers": (shopify.Customer, {}),
+    }
+
+    def __init__(self, path: str, max_age: float = 300.0):
+        self.path = path
+        self.max_age = max_age
+        self._sync_lock = threading.Lock()
+        with closing(self._connect()) as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def sync(self, resource: str) -> int:
+        """Fetch the `resource` ("products", "orders" or "customers") changed since the last sync; returns the count."""
+        resource_class, filters = self.RESOURCES[resource]
+        with self._sync_lock, closing(self._connect()) as db:
+            row = db.execute("SELECT watermark FROM sync_state WHERE resource = ?", (resource,)).fetchone()
+            watermark = row[0] if row else None
+            if watermark:
+                filters = dict(filters, updated_at_min=watermark)
+
+            count = 0
+            started = datetime.now(timezone.utc).replace(microsecond=0)
+            newest = self._parse(watermark)
+            upsert = getattr(self, "_upsert_" + resource)
+            with db:
+                for item in resource_class.scan(prefetch=1, stream=True, **filters):
+                    upsert(db, item.to_dict())
+                    count += 1
+                    updated_at = self._parse(getattr(item, "updated_at", None))
+                    if updated_at and (newest is None or updated_at > newest):
+                        newest, watermark = updated_at, item.updated_at
+                if newest is not None and newest > started:
+                    watermark = started.isoformat()
+                db.execute(
+                    "INSERT OR REPLACE INTO sync_state (resource, watermark, synced_at) VALUES (?, ?, ?)",
+                    (resource, watermark, time.time()),
+                )
+            return count
+
+    def rebuild(self, resource: str) -> int:
+        """Drop the mirrored `resource` and load it again from scratch."""
+        tables = {"products": ("variants", "products"), "orders": ("order_line_items", "orders")}
+        with self._sync_lock, closing(self._connect()) as db, db:
+            for table in tables.get(resource, (resource,)):
+                db.execute("DELETE FROM %s" % table)
+            db.execute("DELETE FROM sync_state WHERE resource = ?", (resource,))
+        return self.sync(resource)
+
+    def ensure_fresh(self, resource: str) -> None:
+        """Sync `resource` if it was last synced more than max_age seconds ago."""
+        with closing(self._connect()) as db:
+            row = db.execute("SELECT synced_at FROM sync_state WHERE resource = ?", (resource,)).fetchone()
+        if row is None or time.time() - row[0] > self.max_age:
+            self.sync(resource)
+
+    def apply(self, resource: str, payload: Dict[str, Any]) -> None:
+        """Store a resource payload received outside a sync, e.g. from a webhook."""
+        # The watermark is left alone: it only moves with synced resources, so a
+        # webhook delivered early cannot hide changes the next sync still has to fetch.
+        with self._sync_lock, closing(self._connect()) as db, db:
+            getattr(self, "_upsert_" + resource)(db, payload)
+
+    def delete(self, resource: str, resource_id: int) -> None:
+        """Drop a deleted resource from the mirror."""
+        children = {"products": ("variants", "product_id"), "orders": ("order_line_items", "order_id")}
+        with self._sync_lock, closing(self._connect()) as db, db:
+            if resource in children:
+                db.execute("DELETE FROM %s WHERE %s = ?" % children[resource], (resource_id,))
+            db.execute("DELETE FROM %s WHERE id = ?" % resource, (resource_id,))
+
+    @staticmethod
+    def _parse(timestamp: Optional[str]) -> Optional[datetime]:
+        if not timestamp:
+            return None
+        return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+    def _upsert_products(self, db: sqlite3.Connection, product: Dict[str, Any]) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                product["id"],
+                product.get("title"),
+                product.get("vendor"),
+                product.get("product_type"),
+                product.get("status"),
+                product.get("created_at"),
+                product.get("updated_at"),
+                json.dumps(product),
+            ),
+        )
+        db.execute("DELETE FROM variants WHERE product_id = ?", (product["id"],))
+        db.executemany(
+            "INSERT OR REPLACE INTO variants VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    variant["id"],
+                    product["id"],
+                    variant.get("title"),
+                    variant.get("sku"),
+                    _number(variant.get("price")),
+                    variant.get("inventory_item_id"),
+                    variant.get("inventory_quantity"),
+                )
+                for variant in product.get("variants") or []
+            ],
+        )
+
+    def _upsert_orders(self, db: sqlite3.Connection, order: Dict[str, Any]) -> None:
+        customer = order.get("customer") or {}
+        db.execute(
+            "INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                order["id"],
+                order.get("name"),
+                customer.get("id"),
+                _number(order.get("total_price")),
+                order.get("financial_status"),
+                order.get("fulfillment_status"),
+                order.get("closed_at"),
+                order.get("cancelled_at"),
+                order.get("created_at"),
+                order.get("updated_at"),
+                json.dumps(order),
+            ),
+        )
+        db.execute("DELETE FROM order_line_items WHERE order_id = ?", (order["id"],))
+        db.executemany(
+            "INSERT OR REPLACE INTO order_line_items VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    item["id"],
+                    order["id"],
+                    item.get("product_id"),
+                    item.get("variant_id"),
+                    item.get("title"),
+                    item.get("quantity"),
+                    _number(item.get("price")),
+                )
+                for item in order.get("line_items") or []
+            ],
+        )
+
+    def _upsert_customers(self, db: sqlite3.Connection, customer: Dict[str, Any]) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO customers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                customer["id"],
+                customer.get("first_name"),
+                customer.get("last_name"),
+                customer.get("email"),
+                customer.get("orders_count"),
+                _number(customer.get("total_spent")),
+                customer.get("created_at"),
+                customer.get("updated_at"),
+                json.dumps(customer),
+            ),
+        )
+
+    def _load(self, resource: str, where: str = "", parameters: Sequence[Any] = ()) -> Iterator[Any]:
+        self.ensure_fresh(resource)
+        resource_class = self.RESOURCES[resource][0]
+        with closing(self._connect()) as db:
+            cursor = db.execute("SELECT data FROM %s %s ORDER BY id" % (resource, where), parameters)
+            while True:
+                rows = cursor.fetchmany(500)
+                if not rows:
+                    return
+                for (data,) in rows:
+                    yield resource_class(json.loads(data))
+
+    def products(self) -> Iterator[shopify.Product]:
+        """Every mirrored product, synced first if the mirror is stale."""
+        return self._load("products")
+
+    def orders(
+        self, status: str = "any", created_at_min: Optional[str] = None, created_at_max: Optional[str] = None
+    ) -> Iterator[shopify.Order]:
+        """The mirrored orders, synced first if the mirror is stale.
+
+        Like the API, status "open" leaves out closed and cancelled orders.
+        created_at_min and created_at_max are inclusive days (YYYY-MM-DD) in
+        the shop's UTC offset.
+        """
+        conditions, parameters = [], []
+        if status == "open":
+            conditions.append("closed_at IS NULL AND cancelled_at IS NULL")
+        if created_at_min:
+            conditions.append("substr(created_at, 1, 10) >= ?")
+            parameters.append(created_at_min)
+        if created_at_max:
+            conditions.append("substr(created_at, 1, 10) <= ?")
+            parameters.append(created_at_max)
+        return self._load("orders", "WHERE " + " AND ".join(conditions) if conditions else "", parameters)
+
+    def customers(self) -> Iterator[shopify.Customer]:
+        """Every mirrored customer, synced first if the mirror is stale."""
+        return self._load("customers")
+
+    def product_titles(self) -> Dict[int, str]:
+        """Product titles by id."""
+        self.ensure_fresh("products")
+        with closing(self._connect()) as db:
+            return dict(db.execute("SELECT id, title FROM products"))
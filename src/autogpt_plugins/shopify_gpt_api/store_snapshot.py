@@ -0,0 +1,58 @@
+"""One in-memory copy of the store's orders, products and customers shared by several analyses."""
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import shopify
+
+_current: contextvars.ContextVar = contextvars.ContextVar("shopify_store_snapshot", default=None)
+
+
+class StoreSnapshot:
+    """
+    The orders, products and customers (and, when given, the collections and
+    their (product id, collection id) memberships) loaded once for a combined
+    analysis.
+
+    Analyses check current_snapshot() before fetching anything; inside
+    `with use_snapshot(snapshot):` they read these lists instead, so running
+    several of them costs one pass over each resource. The snapshot travels
+    with the context, so analyses run through AsyncClient see it too.
+    """
+
+    def __init__(
+        self,
+        orders: List[shopify.Order],
+        products: List[shopify.Product],
+        customers: List[shopify.Customer],
+        collections: Optional[List[Any]] = None,
+        collection_members: Optional[List[Tuple[int, int]]] = None,
+    ):
+        self.orders = orders
+        self.products = products
+        self.customers = customers
+        self.collections = collections
+        self.collection_members = collection_members
+        self.product_titles: Dict[int, str] = {product.id: product.title for product in products}
+
+    def __repr__(self) -> str:
+        return "StoreSnapshot(orders=%d, products=%d, customers=%d)" % (
+            len(self.orders),
+            len(self.products),
+            len(self.customers),
+        )
+
+
+@contextmanager
+def use_snapshot(snapshot: StoreSnapshot) -> Iterator[StoreSnapshot]:
+    """Make `snapshot` the dataset analyses read inside the block."""
+    token = _current.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _current.reset(token)
+
+
+def current_snapshot() -> Optional[StoreSnapshot]:
+    """The snapshot in use, or None when analyses should fetch their own data."""
+    return _current.get()
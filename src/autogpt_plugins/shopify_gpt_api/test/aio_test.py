@@ -0,0 +1,104 @@
+import asyncio
+import json
+import threading
+import shopify
+from test.test_helper import TestCase
+
+
+class AsyncClientTest(TestCase):
+    def setUp(self):
+        super(AsyncClientTest, self).setUp()
+        prefix = self.http.site + "/admin/api/unstable"
+        fixture = json.loads(self.load_fixture("products").decode())
+        self.next_page_url = prefix + "/products.json?limit=2&page_info=FOOBAR"
+        self.fake(
+            "products",
+            url=prefix + "/products.json?limit=2",
+            body=json.dumps({"products": fixture[:2]}),
+            response_headers={"Link": "<" + self.next_page_url + '>; rel="next"'},
+        )
+        self.fake("products", url=self.next_page_url, body=json.dumps({"products": fixture[2:4]}))
+
+    def run_async(self, coroutine_function):
+        async def main():
+            async with shopify.AsyncClient(max_workers=4) as client:
+                return await coroutine_function(client)
+
+        return asyncio.run(main())
+
+    def test_find_runs_off_the_event_loop_thread(self):
+        self.fake("products/632910392", body=self.load_fixture("product"))
+        threads = []
+        original_find = shopify.Product.find.__func__
+
+        def find(cls, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return original_find(cls, *args, **kwargs)
+
+        shopify.Product.find = classmethod(find)
+        try:
+            product = self.run_async(lambda client: client.find(shopify.Product, 632910392))
+        finally:
+            del shopify.Product.find
+
+        self.assertEqual(632910392, product.id)
+        self.assertNotEqual(threading.current_thread(), threads[0])
+
+    def test_concurrent_fetches_with_gather(self):
+        self.fake("orders", method="GET", body=self.load_fixture("orders"))
+        self.fake("customers", method="GET", body=self.load_fixture("customers_search"))
+
+        async def fetch(client):
+            return await asyncio.gather(client.find(shopify.Order), client.find(shopify.Customer))
+
+        orders, customers = self.run_async(fetch)
+        self.assertEqual(450789469, orders[0].id)
+        self.assertEqual(207119551, customers[0].id)
+
+    def test_session_headers_are_used_by_worker_threads(self):
+        shopify.ShopifyResource.headers["X-Shopify-Access-Token"] = "token"
+        try:
+            self.fake(
+                "products/632910392", body=self.load_fixture("product"), headers={"X-shopify-access-token": "token"}
+            )
+            product = self.run_async(lambda client: client.find(shopify.Product, 632910392))
+        finally:
+            del shopify.ShopifyResource.headers["X-Shopify-Access-Token"]
+        self.assertEqual(632910392, product.id)
+
+    def test_count(self):
+        self.fake("products/count", body=b'{"count": 16}')
+        self.assertEqual(16, self.run_async(lambda client: client.count(shopify.Product)))
+
+    def test_save_and_destroy(self):
+        self.fake("products/632910392", body=self.load_fixture("product"))
+        self.fake(
+            "products/632910392",
+            method="PUT",
+            body=self.load_fixture("product"),
+            headers={"Content-type": "application/json"},
+        )
+        self.fake("products/632910392", method="DELETE", body=b"{}")
+
+        async def save_and_destroy(client):
+            product = await client.find(shopify.Product, 632910392)
+            saved = await client.save(product)
+            await client.destroy(product)
+            return saved
+
+        self.assertTrue(self.run_async(save_and_destroy))
+        self.assertEqual("DELETE", self.http.request.get_method())
+
+    def test_async_iteration_follows_pages(self):
+        async def collect(client):
+            collection = await client.find(shopify.Product, limit=2)
+            return [product.id async for product in client.iterate(collection)]
+
+        self.assertEqual([1, 2, 3, 4], self.run_async(collect))
+
+    def test_pages_requires_paginated_collection(self):
+        async def collect(client):
+            return [page async for page in client.pages([])]
+
+        with self.assertRaises(TypeError):
+            self.run_async(collect)
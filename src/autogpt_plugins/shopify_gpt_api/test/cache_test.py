@@ -0,0 +1,120 @@
+import shopify
+from mock import patch
+from pyactiveresource.connection import Response
+from shopify.cache import resource_root
+from test.test_helper import TestCase
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        super(ResponseCacheTest, self).setUp()
+        self.cache = shopify.ResponseCache(maxsize=2)
+        shopify.ShopifyConnection.response_cache = self.cache
+        self.fake("products/632910392", body=self.load_fixture("product"), response_headers={"ETag": '"v1"'})
+
+    def tearDown(self):
+        shopify.ShopifyConnection.response_cache = None
+        super(ResponseCacheTest, self).tearDown()
+
+    def fake_not_modified(self, endpoint="products/632910392", etag='"v1"'):
+        self.fake(endpoint, code=304, body=b" ", headers={"If-None-Match": etag})
+
+    def test_not_modified_response_is_rebuilt_from_the_cache(self):
+        first = shopify.Product.find(632910392)
+        self.fake_not_modified()
+
+        second = shopify.Product.find(632910392)
+
+        self.assertEqual(first.title, second.title)
+        self.assertEqual(first.to_dict(), second.to_dict())
+        self.assertEqual('"v1"', self.http.request.headers["If-none-match"])
+        self.assertEqual(200, shopify.Product.connection.response.code)
+        self.assertEqual(1, self.cache.stats()["hits"])
+
+    def test_not_modified_response_after_eviction_is_requested_again(self):
+        shopify.Product.find(632910392)
+        self.fake_not_modified()
+        validators = self.cache.validators
+
+        def evicted_in_flight(key):
+            headers = validators(key)
+            self.cache.clear()
+            return headers
+
+        with patch.object(self.cache, "validators", evicted_in_flight):
+            self.fake("products/632910392", body=b'{"product": {"id": 632910392, "title": "Fetched"}}')
+            product = shopify.Product.find(632910392)
+
+        self.assertEqual("Fetched", product.title)
+        self.assertNotIn("If-none-match", self.http.request.headers)
+        self.assertEqual(200, shopify.Product.connection.response.code)
+
+    def test_modified_response_replaces_the_cached_body(self):
+        shopify.Product.find(632910392)
+        self.fake(
+            "products/632910392",
+            body=b'{"product": {"id": 632910392, "title": "Renamed"}}',
+            headers={"If-None-Match": '"v1"'},
+            response_headers={"ETag": '"v2"'},
+        )
+        self.assertEqual("Renamed", shopify.Product.find(632910392).title)
+
+        self.fake_not_modified(etag='"v2"')
+        self.assertEqual("Renamed", shopify.Product.find(632910392).title)
+
+    def test_last_modified_is_sent_as_if_modified_since(self):
+        date = "Wed, 21 Oct 2015 07:28:00 GMT"
+        self.fake("products/1", body=b'{"product": {"id": 1}}', response_headers={"Last-Modified": date})
+        shopify.Product.find(1)
+        self.fake("products/1", code=304, body=b" ", headers={"If-Modified-Since": date})
+        self.assertEqual(1, shopify.Product.find(1).id)
+        self.assertEqual(1, self.cache.stats()["hits"])
+
+    def test_responses_without_validators_are_not_stored(self):
+        self.fake("products/1", body=b'{"product": {"id": 1}}')
+        shopify.Product.find(1)
+        self.assertEqual(0, self.cache.stats()["entries"])
+        self.assertEqual(1, self.cache.stats()["misses"])
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for product_id in (1, 2, 3):
+            self.fake(
+                "products/%d" % product_id,
+                body=('{"product": {"id": %d}}' % product_id).encode(),
+                response_headers={"ETag": '"%d"' % product_id},
+            )
+        shopify.Product.find(1)
+        shopify.Product.find(2)
+        self.fake_not_modified("products/1", '"1"')
+        shopify.Product.find(1)
+        shopify.Product.find(3)
+
+        stats = self.cache.stats()
+        self.assertEqual(2, stats["entries"])
+        self.assertEqual(1, stats["evictions"])
+        self.assertEqual({}, self.cache.validators(self.key("products/2")))
+        self.assertEqual({"If-None-Match": '"1"'}, self.cache.validators(self.key("products/1")))
+
+    def test_byte_bound(self):
+        cache = shopify.ResponseCache(maxsize=10, max_bytes=10)
+        headers = {"ETag": "x"}
+        cache.resolve(("site", None, "/a.json", ()), Response(200, b"123456", headers))
+        cache.resolve(("site", None, "/b.json", ()), Response(200, b"123456", headers))
+        self.assertEqual(1, cache.stats()["entries"])
+        self.assertEqual(6, cache.stats()["bytes"])
+
+    def test_writes_invalidate_the_collection(self):
+        shopify.Product.find(632910392)
+        self.fake("products/632910392", method="DELETE", body=b"{}")
+        shopify.Product({"id": 632910392}).destroy()
+        self.assertEqual(0, self.cache.stats()["entries"])
+
+    def test_resource_root(self):
+        self.assertEqual("/admin/api/2023-04/products", resource_root("/admin/api/2023-04/products.json?limit=1"))
+        self.assertEqual("/admin/api/2023-04/products", resource_root("/admin/api/2023-04/products/1/images.json"))
+        self.assertEqual("/admin/api/unstable/shop", resource_root("/admin/api/unstable/shop.json"))
+
+    def key(self, endpoint):
+        connection = shopify.Product.connection
+        path = "%s/%s.json" % (shopify.ShopifyResource.site, endpoint)
+        return connection._request_key(path, shopify.Product.headers)
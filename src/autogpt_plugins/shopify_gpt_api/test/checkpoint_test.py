@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+import tempfile
+import shopify
+from test.test_helper import TestCase
+
+
+class ScanCheckpointTest(TestCase):
+    def setUp(self):
+        super(ScanCheckpointTest, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "products.jsonl")
+        prefix = self.http.site + "/admin/api/unstable"
+        fixture = json.loads(self.load_fixture("products").decode())
+        self.next_page_url = prefix + "/products.json?limit=2&page_info=NEXT"
+        self.fake(
+            "products",
+            url=prefix + "/products.json?limit=2",
+            body=json.dumps({"products": fixture[:2]}),
+            response_headers={"Link": "<" + self.next_page_url + '>; rel="next"'},
+        )
+        self.fake("products", url=self.next_page_url, body=json.dumps({"products": fixture[2:4]}))
+
+        self.urls = []
+        shopify.ShopifyConnection.instrumentation = shopify.Instrumentation()
+        shopify.ShopifyConnection.instrumentation.subscribe(lambda event: self.urls.append(event.url))
+
+    def tearDown(self):
+        shopify.ShopifyConnection.instrumentation = None
+        shutil.rmtree(self.dir)
+        super(ScanCheckpointTest, self).tearDown()
+
+    def interrupted_scan(self):
+        products = shopify.Product.scan(limit=2, checkpoint=self.path)
+        seen = [next(products).id, next(products).id]
+        products.close()
+        return seen
+
+    def test_completed_scan_removes_the_checkpoint(self):
+        ids = [product.id for product in shopify.Product.scan(limit=2, checkpoint=self.path)]
+        self.assertEqual([1, 2, 3, 4], ids)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_interrupted_scan_resumes_from_the_saved_cursor(self):
+        self.assertEqual([1, 2], self.interrupted_scan())
+        self.assertTrue(os.path.exists(self.path))
+        del self.urls[:]
+
+        products = list(shopify.Product.scan(limit=2, checkpoint=self.path))
+
+        self.assertEqual([1, 2, 3, 4], [product.id for product in products])
+        self.assertIsInstance(products[0], shopify.Product)
+        self.assertEqual([self.next_page_url], self.urls)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_torn_last_line_is_discarded(self):
+        self.interrupted_scan()
+        with open(self.path, "ab") as f:
+            f.write(b'{"next": null, "items": [{"id"')
+        del self.urls[:]
+
+        self.assertEqual([1, 2, 3, 4], [product.id for product in shopify.Product.scan(limit=2, checkpoint=self.path)])
+        self.assertEqual([self.next_page_url], self.urls)
+
+    def test_checkpoint_of_another_scan_is_ignored(self):
+        self.interrupted_scan()
+        del self.urls[:]
+        self.fake(
+            "products",
+            url=self.http.site + "/admin/api/unstable/products.json?limit=2&vendor=Apple",
+            body=json.dumps({"products": [{"id": 9}]}),
+        )
+        products = shopify.Product.scan(limit=2, vendor="Apple", checkpoint=self.path)
+        self.assertEqual([9], [product.id for product in products])
+        self.assertEqual(1, len(self.urls))
+
+    def test_expired_checkpoint_is_started_over(self):
+        self.interrupted_scan()
+        with open(self.path, "rb") as f:
+            lines = f.readlines()
+        header = json.loads(lines[0].decode())
+        header["started"] -= 2 * 24 * 60 * 60
+        with open(self.path, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n" + b"".join(lines[1:]))
+        del self.urls[:]
+
+        self.assertEqual([1, 2, 3, 4], [product.id for product in shopify.Product.scan(limit=2, checkpoint=self.path)])
+        self.assertEqual(2, len(self.urls))
+        self.assertNotEqual(self.next_page_url, self.urls[0])
+
+    def test_max_age_none_resumes_at_any_age(self):
+        scan = {"resource": "Product"}
+        checkpoint = shopify.ScanCheckpoint(self.path, scan, keep=True)
+        list(checkpoint.replay())
+        checkpoint.open()
+        checkpoint.save_page([{"id": 1}], "cursor")
+        checkpoint.close()
+
+        self.assertEqual([], list(shopify.ScanCheckpoint(self.path, scan, max_age=-1).replay()))
+        unbounded = shopify.ScanCheckpoint(self.path, scan)
+        unbounded.max_age = None
+        self.assertEqual([{"id": 1}], list(unbounded.replay()))
+
+    def test_kept_checkpoint_replays_without_requests(self):
+        scan = {"resource": "Product"}
+        checkpoint = shopify.ScanCheckpoint(self.path, scan, keep=True)
+        list(checkpoint.replay())
+        checkpoint.open()
+        checkpoint.save_page([{"id": 1}], None)
+        checkpoint.complete()
+
+        replayed = shopify.ScanCheckpoint(self.path, scan)
+        self.assertEqual([{"id": 1}], list(replayed.replay()))
+        self.assertTrue(replayed.done)
+        self.assertEqual(1, replayed.pages)
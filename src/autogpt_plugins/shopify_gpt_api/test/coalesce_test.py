@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+import shopify
+from mock import patch
+from pyactiveresource.connection import Response, ResourceNotFound
+from test.test_helper import TestCase
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.001)
+
+
+class SingleFlightTest(TestCase):
+    def setUp(self):
+        super(SingleFlightTest, self).setUp()
+        self.flight = shopify.SingleFlight()
+        self.release = threading.Event()
+        self.executions = []
+
+    def run_concurrently(self, count, key_for, func):
+        results = [None] * count
+
+        def worker(i):
+            try:
+                results[i] = self.flight.do(key_for(i), func, i)
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def slow(self, i):
+        self.executions.append(i)
+        self.release.wait(5)
+        return "result"
+
+    def test_identical_concurrent_calls_share_one_execution(self):
+        threads, results = self.run_concurrently(5, lambda i: "same", self.slow)
+        wait_for(lambda: self.flight.shared == 4)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(self.executions))
+        self.assertEqual(["result"] * 5, results)
+        self.assertEqual(0, self.flight.in_flight())
+
+    def test_different_keys_run_separately(self):
+        self.release.set()
+        threads, results = self.run_concurrently(3, lambda i: i, self.slow)
+        for thread in threads:
+            thread.join()
+        self.assertEqual([0, 1, 2], sorted(self.executions))
+        self.assertEqual(0, self.flight.shared)
+
+    def test_errors_are_shared(self):
+        def failing(i):
+            self.release.wait(5)
+            raise ValueError("boom")
+
+        threads, results = self.run_concurrently(3, lambda i: "same", failing)
+        wait_for(lambda: self.flight.shared == 2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_completed_calls_are_not_cached(self):
+        self.assertEqual(1, self.flight.do("key", lambda: 1))
+        self.assertEqual(2, self.flight.do("key", lambda: 2))
+
+
+class CoalescedConnectionTest(TestCase):
+    def setUp(self):
+        super(CoalescedConnectionTest, self).setUp()
+        self.coalescer = shopify.SingleFlight()
+        shopify.ShopifyConnection.coalescer = self.coalescer
+        self.release = threading.Event()
+        self.sent = []
+        self.site = shopify.ShopifyResource.site
+
+    def tearDown(self):
+        shopify.ShopifyConnection.coalescer = None
+        super(CoalescedConnectionTest, self).tearDown()
+
+    def fake_send(self, connection, method, path, headers=None, data=None):
+        self.sent.append((method, path))
+        self.release.wait(5)
+        if "404" in path:
+            raise ResourceNotFound(message="Not Found")
+        return Response(200, json.dumps({"product": {"id": 632910392, "title": "Coalesced"}}).encode())
+
+    def find_concurrently(self, count, id_):
+        results = []
+
+        def worker():
+            shopify.ShopifyResource.site = self.site
+            try:
+                results.append(shopify.Product.find(id_))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_concurrent_finds_share_one_request(self):
+        with patch.object(shopify.ShopifyConnection, "_send", autospec=True, side_effect=self.fake_send):
+            threads, results = self.find_concurrently(4, 632910392)
+            wait_for(lambda: self.coalescer.shared == 3)
+            self.release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(1, len(self.sent))
+        self.assertEqual(["Coalesced"] * 4, [product.title for product in results])
+        # Every product is decoded separately.
+        self.assertEqual(4, len(set(id(product) for product in results)))
+
+    def test_errors_reach_every_waiter(self):
+        with patch.object(shopify.ShopifyConnection, "_send", autospec=True, side_effect=self.fake_send):
+            threads, results = self.find_concurrently(3, 404)
+            wait_for(lambda: self.coalescer.shared == 2)
+            self.release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(1, len(self.sent))
+        self.assertTrue(all(isinstance(result, ResourceNotFound) for result in results))
+
+    def test_writes_are_never_coalesced(self):
+        self.release.set()
+        with patch.object(shopify.ShopifyConnection, "_send", autospec=True, side_effect=self.fake_send):
+            shopify.Product.find(632910392)
+            shopify.Product({"id": 632910392}).destroy()
+        self.assertEqual(1, self.coalescer.calls)
+        self.assertEqual("DELETE", self.sent[1][0])
+
+    def test_sequential_gets_still_reach_the_server(self):
+        self.fake("products/632910392", body=self.load_fixture("product"))
+        shopify.Product.find(632910392)
+        shopify.Product.find(632910392)
+        self.assertEqual(2, self.coalescer.calls)
+        self.assertEqual(200, shopify.Product.connection.response.code)
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import shopify
+from pyactiveresource.connection import ResourceNotFound, ServerError
+from shopify.instrumentation import percentile
+from test.test_helper import TestCase
+
+
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        super(InstrumentationTest, self).setUp()
+        self.events = []
+        self.instrumentation = shopify.Instrumentation()
+        self.instrumentation.subscribe(self.events.append)
+        shopify.ShopifyConnection.instrumentation = self.instrumentation
+
+    def tearDown(self):
+        shopify.ShopifyConnection.instrumentation = None
+        super(InstrumentationTest, self).tearDown()
+
+    def test_event_describes_the_request(self):
+        self.fake(
+            "products/632910392",
+            body=self.load_fixture("product"),
+            response_headers={"X-Shopify-Shop-Api-Call-Limit": "3/40"},
+        )
+        shopify.Product.find(632910392)
+
+        self.assertEqual(1, len(self.events))
+        event = self.events[0]
+        self.assertEqual("GET", event.method)
+        self.assertEqual("/admin/api/{version}/products/{id}.json", event.endpoint)
+        self.assertEqual(200, event.status)
+        self.assertEqual(len(self.load_fixture("product")), event.response_bytes)
+        self.assertEqual(0, event.request_bytes)
+        self.assertEqual("3/40", event.call_limit)
+        self.assertTrue(event.latency >= 0)
+        self.assertIsNone(event.label)
+
+    def test_errors_and_request_bodies_are_recorded(self):
+        self.fake(
+            "products",
+            method="POST",
+            code=201,
+            body=self.load_fixture("product"),
+            headers={"Content-type": "application/json"},
+        )
+        shopify.Product({"title": "Hat"}).save()
+        self.fake("products/1", code=404, body=b"{}")
+        with self.assertRaises(ResourceNotFound):
+            shopify.Product.find(1)
+
+        self.assertEqual(["POST", "GET"], [event.method for event in self.events])
+        self.assertTrue(self.events[0].request_bytes > 0)
+        self.assertEqual(404, self.events[1].status)
+
+    def test_server_errors_are_recorded_with_their_status(self):
+        self.fake("products/1", code=503, body=b'{"errors": "Unavailable"}')
+        with self.assertRaises(ServerError):
+            shopify.Product.find(1)
+
+        self.assertEqual(503, self.events[0].status)
+        self.assertEqual(len(b'{"errors": "Unavailable"}'), self.events[0].response_bytes)
+        self.assertEqual(503, shopify.Product.connection.response.code)
+
+    def test_label_tags_requests(self):
+        self.fake("shop", body=self.load_fixture("shop"))
+        with self.instrumentation.label("get_shop"):
+            shopify.Shop.current()
+        shopify.Shop.current()
+        self.assertEqual(["get_shop", None], [event.label for event in self.events])
+
+    def test_label_is_carried_into_async_client_workers(self):
+        self.fake("shop", body=self.load_fixture("shop"))
+
+        async def fetch():
+            async with shopify.AsyncClient(max_workers=1) as client:
+                with self.instrumentation.label("analyze"):
+                    await client.run(shopify.Shop.current)
+
+        asyncio.run(fetch())
+        self.assertEqual("analyze", self.events[0].label)
+
+    def test_failing_subscriber_does_not_break_requests(self):
+        def broken(event):
+            raise RuntimeError("boom")
+
+        self.instrumentation.subscribe(broken)
+        self.fake("shop", body=self.load_fixture("shop"))
+        shopify.Shop.current()
+        self.assertEqual(1, len(self.events))
+
+    def test_unsubscribe(self):
+        self.instrumentation.unsubscribe(self.events.append)
+        self.fake("shop", body=self.load_fixture("shop"))
+        shopify.Shop.current()
+        self.assertEqual([], self.events)
+
+
+class EndpointStatsTest(TestCase):
+    def event(self, latency, endpoint="/admin/api/{version}/products.json", status=200, label=None):
+        return shopify.RequestEvent("GET", endpoint, endpoint, status, latency, 0, 100, "1/40", label)
+
+    def test_percentiles_per_endpoint(self):
+        stats = shopify.EndpointStats()
+        for ms in range(1, 101):
+            stats(self.event(ms / 1000.0))
+        stats(self.event(0.5, endpoint="/admin/api/{version}/shop.json", status=503))
+
+        summary = stats.summary()
+        products = summary["GET /admin/api/{version}/products.json"]
+        self.assertEqual(100, products["count"])
+        self.assertEqual(50.0, products["p50_ms"])
+        self.assertEqual(95.0, products["p95_ms"])
+        self.assertEqual(99.0, products["p99_ms"])
+        self.assertEqual(100.0, products["max_ms"])
+        self.assertEqual(10000, products["response_bytes"])
+        self.assertEqual({"200": 100}, products["statuses"])
+        self.assertEqual(1, summary["GET /admin/api/{version}/shop.json"]["errors"])
+        self.assertEqual("GET /admin/api/{version}/shop.json", stats.slowest(1)[0][0])
+        self.assertEqual(summary, json.loads(stats.to_json()))
+
+    def test_samples_are_bounded(self):
+        stats = shopify.EndpointStats(max_samples=10)
+        for ms in range(100):
+            stats(self.event(ms / 1000.0))
+        products = stats.summary()["GET /admin/api/{version}/products.json"]
+        self.assertEqual(100, products["count"])
+        self.assertEqual(94.0, products["p50_ms"])
+
+    def test_by_label(self):
+        stats = shopify.EndpointStats(by_label=True)
+        stats(self.event(0.1, label="get_all_products"))
+        self.assertEqual(["get_all_products: GET /admin/api/{version}/products.json"], list(stats.summary()))
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 0.5))
+        self.assertEqual(1, percentile([1], 0.99))
+        self.assertEqual(2, percentile([1, 2, 3], 0.5))
@@ -24,6 +24,16 @@ class InventoryLevelTest(TestCase):
             )
         )
 
+    def test_scan_by_ids_batches_items_and_locations(self):
+        for items, locations in (("1,2", "10,20"), ("1,2", "30"), ("3", "10,20"), ("3", "30")):
+            query = {"inventory_item_ids": items, "limit": 250, "location_ids": locations}
+            body = {"inventory_levels": [{"inventory_item_id": int(items[0]), "location_id": int(locations[:2])}]}
+            self.fake("inventory_levels", url=shopify.InventoryLevel._collection_path({}, query), body=json.dumps(body))
+        levels = list(shopify.InventoryLevel.scan_by_ids([3, 1, 2], location_ids=[30, 10, 20], batch_size=2))
+        self.assertEqual(
+            [(1, 10), (1, 30), (3, 10), (3, 30)], [(level.inventory_item_id, level.location_id) for level in levels]
+        )
+
     def test_inventory_level_adjust(self):
         self.fake(
             "inventory_levels/adjust",
@@ -0,0 +1,122 @@
+import threading
+import shopify
+from test.test_helper import TestCase
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse(object):
+    def __init__(self, headers=None, code=200):
+        self.headers = headers or {}
+        self.code = code
+
+
+class LeakyBucketTest(TestCase):
+    shop = "https://this-is-my-test-show.myshopify.com"
+
+    def setUp(self):
+        super(LeakyBucketTest, self).setUp()
+        self.clock = FakeClock()
+        self.bucket = shopify.LeakyBucket(capacity=10, headroom=2, clock=self.clock, sleep=self.clock.sleep)
+
+    def tearDown(self):
+        shopify.ShopifyConnection.rate_limiter = None
+        super(LeakyBucketTest, self).tearDown()
+
+    def test_requests_pass_until_the_bucket_is_nearly_full(self):
+        for _ in range(8):
+            self.assertEqual(0.0, self.bucket.acquire(self.shop))
+        self.assertEqual([], self.clock.sleeps)
+        self.assertEqual(8, self.bucket.level(self.shop))
+
+    def test_acquire_waits_for_the_bucket_to_drain(self):
+        for _ in range(8):
+            self.bucket.acquire(self.shop)
+        # 10 slots leak at 0.5 per second by default.
+        waited = self.bucket.acquire(self.shop)
+        self.assertAlmostEqual(2.0, waited)
+        self.assertAlmostEqual(8.0, self.bucket.level(self.shop))
+
+    def test_level_drains_over_time(self):
+        for _ in range(4):
+            self.bucket.acquire(self.shop)
+        self.clock.now += 4
+        self.assertAlmostEqual(2.0, self.bucket.level(self.shop))
+        self.clock.now += 100
+        self.assertEqual(0.0, self.bucket.level(self.shop))
+
+    def test_release_resynchronises_from_the_call_limit_header(self):
+        self.bucket.acquire(self.shop)
+        self.bucket.release(self.shop, FakeResponse({"X-Shopify-Shop-Api-Call-Limit": "30/80"}))
+        metrics = self.bucket.metrics(self.shop)
+        self.assertEqual(30, metrics["level"])
+        self.assertEqual(80, metrics["capacity"])
+        self.assertEqual(4.0, metrics["leak_rate"])
+        self.assertEqual(0, metrics["in_flight"])
+
+    def test_header_lookup_is_case_insensitive(self):
+        self.bucket.acquire(self.shop)
+        self.bucket.release(self.shop, FakeResponse({"x-shopify-shop-api-call-limit": "5/40"}))
+        self.assertEqual(5, self.bucket.level(self.shop))
+
+    def test_throttled_response_fills_the_bucket(self):
+        self.bucket.acquire(self.shop)
+        self.bucket.release(self.shop, FakeResponse(code=429))
+        self.assertEqual(10, self.bucket.level(self.shop))
+
+    def test_shops_have_separate_buckets(self):
+        for _ in range(8):
+            self.bucket.acquire(self.shop)
+        self.assertEqual(0.0, self.bucket.acquire("https://other-shop.myshopify.com"))
+
+    def test_metrics_count_waits(self):
+        for _ in range(10):
+            self.bucket.acquire(self.shop)
+        metrics = self.bucket.metrics(self.shop)
+        self.assertEqual(10, metrics["requests"])
+        self.assertEqual(2, metrics["waits"])
+        self.assertAlmostEqual(4.0, metrics["waited_seconds"])
+
+    def test_concurrent_acquires_never_exceed_the_limit(self):
+        bucket = shopify.LeakyBucket(capacity=40, headroom=2)
+        levels = []
+
+        def worker():
+            for _ in range(5):
+                bucket.acquire(self.shop)
+                levels.append(bucket.level(self.shop))
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(levels), 38)
+
+    def test_connection_paces_requests_and_reads_the_header(self):
+        shopify.ShopifyConnection.rate_limiter = self.bucket
+        self.fake("shop", response_headers={"X-Shopify-Shop-Api-Call-Limit": "7/40"})
+        shopify.Shop.current()
+        metrics = self.bucket.metrics(self.shop)
+        self.assertEqual(7, metrics["level"])
+        self.assertEqual(40, metrics["capacity"])
+        self.assertEqual(1, metrics["requests"])
+        self.assertEqual(0, metrics["in_flight"])
+
+    def test_failed_requests_release_their_slot(self):
+        shopify.ShopifyConnection.rate_limiter = self.bucket
+        self.fake("products/1", code=404, body=b"{}")
+        with self.assertRaises(shopify.base.pyactiveresource.connection.ResourceNotFound):
+            shopify.Product.find(1)
+        self.assertEqual(0, self.bucket.metrics(self.shop)["in_flight"])
@@ -1,5 +1,6 @@
 import shopify
 import json
+from pyactiveresource.connection import ResourceNotFound
 from test.test_helper import TestCase
 
 
@@ -122,3 +123,81 @@ class PaginationTest(TestCase):
 
         with self.assertRaises(StopIteration):
             next(i)
+
+    def test_prefetching_paginated_iterator(self):
+        c = shopify.Product.find(limit=2)
+
+        pages = list(shopify.PaginatedIterator(c, prefetch=1))
+
+        self.assertEqual(2, len(pages))
+        self.assertIs(c, pages[0])
+        self.assertEqual([1, 2, 3, 4], [item.id for page in pages for item in page])
+        self.assertIsNone(c._next, "prefetching caches pages")
+
+    def test_prefetching_paginated_iterator_fetch_error(self):
+        c = shopify.Product.find(limit=2)
+        c.next_page_url = self.http.site + "/admin/api/unstable/products.json?limit=2&page_info=MISSING"
+        self.fake("products", url=c.next_page_url, code=404, body=b"{}")
+
+        i = iter(shopify.PaginatedIterator(c, prefetch=2))
+        self.assertIs(c, next(i))
+        with self.assertRaises(ResourceNotFound):
+            next(i)
+
+    def test_scan_follows_every_page(self):
+        self.assertEqual([1, 2, 3, 4], [product.id for product in shopify.Product.scan(limit=2)])
+        self.assertEqual([1, 2, 3, 4], [product.id for product in shopify.Product.scan(limit=2, prefetch=1)])
+
+    def test_scan_passes_fields_and_filters(self):
+        self.fake(
+            "products",
+            url=self.http.site + "/admin/api/unstable/products.json?fields=id%2Ctitle&limit=250&vendor=Apple",
+            body=json.dumps({"products": [{"id": 1, "title": "iPod"}]}),
+        )
+        products = list(shopify.Product.scan(fields=["id", "title"], vendor="Apple"))
+        self.assertEqual([{"id": 1, "title": "iPod"}], [product.to_dict() for product in products])
+
+    def test_scan_stops_fetching_when_abandoned(self):
+        products = shopify.Product.scan(limit=2)
+        self.assertEqual(1, next(products).id)
+        products.close()
+        self.assertEqual(self.http.site + "/admin/api/unstable/products.json?limit=2", self.http.request.get_full_url())
+
+    def fake_chain(self, pages):
+        prefix = self.http.site + "/admin/api/unstable/products.json?limit=1"
+        for i in range(pages):
+            url = prefix if i == 0 else "%s&page_info=%d" % (prefix, i)
+            headers = {"Link": "<%s&page_info=%d>; rel=\"next\"" % (prefix, i + 1)} if i + 1 < pages else {}
+            self.fake("products", url=url, body=json.dumps({"products": [{"id": i}]}), response_headers=headers)
+
+    def test_iterating_a_long_chain_keeps_a_bounded_window(self):
+        self.fake_chain(12)
+        c = shopify.Product.find(limit=1)
+        c._no_iter_next = False
+
+        self.assertEqual(list(range(12)), [item.id for item in c])
+
+        self.assertEqual(c.max_cached_pages, len(c._window))
+        self.assertIsNone(c._next, "the first page is still linked to the chain")
+        self.assertEqual(1, len(c))
+
+    def test_len_counts_the_cached_pages_without_recursion(self):
+        self.fake_chain(4)
+        c = shopify.Product.find(limit=1)
+        page = c
+        while page.has_next_page():
+            page = page.next_page()
+        self.assertEqual(4, len(c))
+        self.assertIs(page, c._next._next._next)
+
+    def test_cached_pages_are_refreshed_on_access(self):
+        self.fake_chain(3)
+        c = shopify.Product.find(limit=1)
+        c.max_cached_pages = 2
+        n = c.next_page()
+        self.assertIs(n, c.next_page())
+        n.next_page()
+        # c was the least recently used page of the three.
+        self.assertIsNone(c._next)
+        self.assertIsNone(n._previous)
+        self.assertIsNotNone(n._next)
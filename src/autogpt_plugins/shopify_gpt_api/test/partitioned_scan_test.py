@@ -0,0 +1,88 @@
+import json
+import shopify
+from pyactiveresource.connection import ServerError
+from test.test_helper import TestCase
+
+
+class PartitionedScanTest(TestCase):
+    def setUp(self):
+        super(PartitionedScanTest, self).setUp()
+        self.rate_limiter = shopify.LeakyBucket()
+        shopify.ShopifyConnection.rate_limiter = self.rate_limiter
+
+    def tearDown(self):
+        shopify.ShopifyConnection.rate_limiter = None
+        super(PartitionedScanTest, self).tearDown()
+
+    def fake_window(self, lower, upper, orders, code=200):
+        query = {"created_at_min": lower, "created_at_max": upper, "limit": 250, "status": "any"}
+        self.fake(
+            "orders",
+            url=shopify.Order._collection_path({}, query),
+            code=code,
+            body=json.dumps({"orders": orders}),
+        )
+
+    def test_windows_do_not_overlap(self):
+        windows = shopify.Order._created_at_windows(3, "2023-01-01T00:00:00Z", "2023-01-01T00:00:09.5Z", {})
+        self.assertEqual(
+            [
+                ("2023-01-01T00:00:00+00:00", "2023-01-01T00:00:02+00:00"),
+                ("2023-01-01T00:00:03+00:00", "2023-01-01T00:00:05+00:00"),
+                ("2023-01-01T00:00:06+00:00", "2023-01-01T00:00:09+00:00"),
+            ],
+            windows,
+        )
+
+    def test_short_ranges_get_fewer_windows(self):
+        windows = shopify.Order._created_at_windows(8, "2023-01-01T00:00:00Z", "2023-01-01T00:00:01Z", {})
+        self.assertEqual([("2023-01-01T00:00:00+00:00", "2023-01-01T00:00:01+00:00")], windows)
+        self.assertEqual([], shopify.Order._created_at_windows(2, "2023-01-02T00:00:00Z", "2023-01-01T00:00:00Z", {}))
+
+    def test_range_starts_at_the_oldest_resource(self):
+        self.fake(
+            "orders",
+            url=shopify.Order._collection_path({}, {"fields": "id,created_at", "limit": 1, "since_id": 0}),
+            body=json.dumps({"orders": [{"id": 1, "created_at": "2008-01-10T11:00:00-05:00"}]}),
+        )
+        windows = shopify.Order._created_at_windows(2, None, "2008-01-10T11:00:09-05:00", {})
+        self.assertEqual("2008-01-10T11:00:00-05:00", windows[0][0])
+        self.assertEqual("2008-01-10T11:00:09-05:00", windows[-1][1])
+
+    def test_partitions_are_merged_into_one_stream(self):
+        self.fake_window("2023-01-01T00:00:00+00:00", "2023-01-01T00:00:03+00:00", [{"id": 1}, {"id": 2}])
+        self.fake_window("2023-01-01T00:00:04+00:00", "2023-01-01T00:00:09+00:00", [{"id": 3}])
+
+        orders = list(
+            shopify.Order.partitioned_scan(
+                partitions=2, created_at_min="2023-01-01T00:00:00Z", created_at_max="2023-01-01T00:00:09Z", status="any"
+            )
+        )
+
+        self.assertEqual([1, 2, 3], sorted(order.id for order in orders))
+        self.assertIsInstance(orders[0], shopify.Order)
+        self.assertEqual(2, self.rate_limiter.metrics(shopify.Order.connection.site)["requests"])
+
+    def test_worker_errors_reach_the_caller(self):
+        self.fake_window("2023-01-01T00:00:00+00:00", "2023-01-01T00:00:03+00:00", [{"id": 1}])
+        self.fake_window("2023-01-01T00:00:04+00:00", "2023-01-01T00:00:09+00:00", [], code=500)
+
+        with self.assertRaises(ServerError):
+            list(
+                shopify.Order.partitioned_scan(
+                    partitions=2,
+                    created_at_min="2023-01-01T00:00:00Z",
+                    created_at_max="2023-01-01T00:00:09Z",
+                    status="any",
+                )
+            )
+
+    def test_available_on_products_and_customers(self):
+        self.assertTrue(hasattr(shopify.Product, "partitioned_scan"))
+        self.assertTrue(hasattr(shopify.Customer, "partitioned_scan"))
+
+    def test_a_rate_limiter_is_required(self):
+        shopify.ShopifyConnection.rate_limiter = None
+        with self.assertRaises(ValueError):
+            list(shopify.Order.partitioned_scan(partitions=2, created_at_min="2023-01-01T00:00:00Z", status="any"))
+        self.assertIsNone(shopify.ShopifyConnection.rate_limiter)
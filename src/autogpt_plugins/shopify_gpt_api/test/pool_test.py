@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import shopify
+from mock import Mock, patch
+from six.moves import BaseHTTPServer, http_client, socketserver, urllib
+from test.test_helper import TestCase
+
+
+class KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        self.server.tokens.append(self.headers.get("X-Shopify-Access-Token"))
+        if self.path.endswith("/admin/api/unstable/moved.json"):
+            body = b""
+            self.send_response(301)
+            self.send_header("Location", "/admin/api/unstable/products.json")
+        elif self.path.startswith("/admin/api/unstable/products/404"):
+            body = json.dumps({"errors": "Not Found"}).encode()
+            self.send_response(404)
+        else:
+            body = json.dumps({"products": [{"id": 1, "title": "Pooled"}]}).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", 0), KeepAliveHandler)
+        self.connections = 0
+        self.paths = []
+        self.tokens = []
+
+
+class PoolTest(TestCase):
+    def setUp(self):
+        super(PoolTest, self).setUp()
+        self.server = StandInServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+
+        shopify.ShopifyResource.site = "http://127.0.0.1:%d/admin/api/unstable" % self.server.server_address[1]
+        self.pool_manager = shopify.PoolManager(maxsize=2)
+        shopify.ShopifyConnection.pool_manager = self.pool_manager
+
+    def tearDown(self):
+        shopify.ShopifyConnection.pool_manager = None
+        self.pool_manager.clear()
+        self.server.shutdown()
+        self.server.server_close()
+        super(PoolTest, self).tearDown()
+
+    def test_requests_reuse_one_keep_alive_connection(self):
+        for _ in range(5):
+            products = shopify.Product.find()
+            self.assertEqual("Pooled", products[0].title)
+
+        self.assertEqual(5, len(self.server.paths))
+        self.assertEqual(1, self.server.connections)
+        pool = self.pool_manager.pool_for(shopify.ShopifyResource.site)
+        self.assertEqual(1, pool.connections_opened)
+        self.assertEqual(4, pool.connections_reused)
+
+    def test_request_headers_are_sent_through_the_pool(self):
+        shopify.ShopifyResource.headers["X-Shopify-Access-Token"] = "token"
+        try:
+            shopify.Product.find()
+        finally:
+            del shopify.ShopifyResource.headers["X-Shopify-Access-Token"]
+        self.assertEqual(["token"], self.server.tokens)
+
+    def test_error_responses_raise_and_release_the_connection(self):
+        with self.assertRaises(shopify.base.pyactiveresource.connection.ResourceNotFound):
+            shopify.Product.find(404)
+        self.assertEqual(404, shopify.Product.connection.response.code)
+
+        shopify.Product.find()
+        self.assertEqual(1, self.server.connections)
+
+    def stale_pool(self):
+        pool = self.pool_manager.pool_for(shopify.ShopifyResource.site)
+        stale = Mock(sock=None)
+        stale.getresponse.side_effect = http_client.RemoteDisconnected("Remote end closed connection")
+        pool._idle.append(stale)
+        return pool
+
+    def test_reads_on_a_stale_connection_are_retried(self):
+        pool = self.stale_pool()
+        response = pool.urlopen("GET", shopify.ShopifyResource.site + "/products.json")
+        self.assertEqual(200, response.code)
+        self.assertEqual(1, len(self.server.paths))
+
+    def test_writes_on_a_stale_connection_are_not_retried(self):
+        pool = self.stale_pool()
+        with self.assertRaises(urllib.error.URLError):
+            pool.urlopen("POST", shopify.ShopifyResource.site + "/products.json", body=b"{}")
+        self.assertEqual([], self.server.paths)
+        self.assertEqual(0, pool.idle_count())
+
+    def test_per_thread_connections_share_the_pool(self):
+        site = shopify.ShopifyResource.site
+        errors = []
+
+        def worker():
+            try:
+                shopify.ShopifyResource.site = site
+                for _ in range(3):
+                    shopify.Product.find()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(12, len(self.server.paths))
+        pool = self.pool_manager.pool_for(site)
+        self.assertLessEqual(pool.idle_count(), 2)
+        self.assertEqual(12, pool.connections_opened + pool.connections_reused)
+
+    def test_per_shop_pool_size(self):
+        self.pool_manager.set_pool_size("big-shop.myshopify.com", 20)
+        self.assertEqual(20, self.pool_manager.pool_for("https://big-shop.myshopify.com/admin").maxsize)
+        self.assertEqual(2, self.pool_manager.pool_for("https://small-shop.myshopify.com/admin").maxsize)
+
+    def test_without_pool_manager_urllib_is_used(self):
+        shopify.ShopifyConnection.pool_manager = None
+        urllib.request.install_opener(urllib.request.build_opener())
+        shopify.Product.find()
+        shopify.Product.find()
+        self.assertEqual(2, self.server.connections)
+
+    def test_redirects_are_followed(self):
+        products = shopify.Product.find(from_="/admin/api/unstable/moved.json")
+        self.assertEqual("Pooled", products[0].title)
+        self.assertEqual(["/admin/api/unstable/moved.json", "/admin/api/unstable/products.json"], self.server.paths)
+        self.assertEqual(1, self.server.connections)
+
+    def test_proxied_requests_bypass_the_pool(self):
+        proxy = "http://127.0.0.1:%d" % self.server.server_address[1]
+        with patch.dict(os.environ, {"http_proxy": proxy, "no_proxy": ""}):
+            urllib.request.install_opener(urllib.request.build_opener())
+            try:
+                shopify.Product.find()
+            finally:
+                urllib.request.install_opener(None)
+        # A proxy is sent the absolute URL
+        self.assertTrue(self.server.paths[0].startswith(proxy + "/admin/api/unstable/products.json"))
+        self.assertEqual(0, self.pool_manager.pool_for(shopify.ShopifyResource.site).connections_opened)
@@ -85,3 +85,24 @@ class ProductTest(TestCase):
         )
         v = shopify.Variant()
         self.assertTrue(self.product.add_variant(v))
+
+    def test_find_with_a_list_of_fields(self):
+        self.fake(
+            "products/632910392.json?fields=id%2Ctitle",
+            extension=False,
+            body=b'{"product": {"id": 632910392, "title": "IPod Nano - 8GB"}}',
+        )
+        product = shopify.Product.find(632910392, fields=["id", "title"])
+        self.assertEqual({"id": 632910392, "title": "IPod Nano - 8GB"}, product.to_dict())
+
+    def test_find_without_fields_requests_every_attribute(self):
+        shopify.Product.find(632910392, fields=None)
+        self.assertNotIn("fields", self.http.request.get_full_url())
+
+    def test_find_by_ids_batches_the_ids(self):
+        for ids, body in (("1,2", b'{"products": [{"id": 1}, {"id": 2}]}'), ("3", b'{"products": []}')):
+            query = {"fields": "id,title", "ids": ids, "limit": len(ids.split(","))}
+            self.fake("products", url=shopify.Product._collection_path({}, query), body=body)
+        products = shopify.Product.find_by_ids([2, 3, 1, 2], batch_size=2, fields=["id", "title"])
+        self.assertEqual([1, 2], sorted(products))
+        self.assertIsInstance(products[1], shopify.Product)
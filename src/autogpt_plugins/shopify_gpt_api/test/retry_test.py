@@ -0,0 +1,108 @@
+import shopify
+from pyactiveresource.connection import ClientError, ServerError
+from test.test_helper import TestCase
+
+
+class RetryPolicyTest(TestCase):
+    def setUp(self):
+        super(RetryPolicyTest, self).setUp()
+        self.sleeps = []
+        self.on_sleep = None
+        self.policy = shopify.RetryPolicy(max_retries=3, max_wait=10, sleep=self.sleep, rand=lambda: 0.5)
+        shopify.ShopifyConnection.retry_policy = self.policy
+
+    def tearDown(self):
+        shopify.ShopifyConnection.retry_policy = None
+        super(RetryPolicyTest, self).tearDown()
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        if self.on_sleep:
+            self.on_sleep()
+
+    def recover(self, **kwargs):
+        """Serve the products fixture after the first retry sleep."""
+
+        def on_sleep():
+            self.fake("products", **kwargs)
+
+        self.on_sleep = on_sleep
+
+    def test_throttled_request_honors_retry_after(self):
+        self.fake("products", code=429, body=b"{}", response_headers={"Retry-After": "2.0"})
+        self.recover()
+
+        products = shopify.Product.find()
+
+        self.assertEqual(1, products[0].id)
+        self.assertEqual([2.0], self.sleeps)
+        self.assertEqual({"GET /admin/api/{version}/products.json": 1}, self.policy.stats()["retries"])
+
+    def test_throttled_request_without_retry_after_backs_off(self):
+        self.fake("products", code=429, body=b"{}")
+        self.recover()
+        shopify.Product.find()
+        self.assertEqual([0.25], self.sleeps)
+
+    def test_gateway_errors_use_jittered_exponential_backoff(self):
+        self.fake("products", code=503, body=b"{}")
+        with self.assertRaises(ServerError):
+            shopify.Product.find()
+        # rand() = 0.5 of 0.5, 1 and 2 seconds, then the budget of 3 retries is spent.
+        self.assertEqual([0.25, 0.5, 1.0], self.sleeps)
+        self.assertEqual({"GET /admin/api/{version}/products.json": 1}, self.policy.stats()["exhausted"])
+
+    def test_backoff_is_capped(self):
+        policy = shopify.RetryPolicy(backoff_factor=1, max_backoff=4, rand=lambda: 1.0)
+        self.assertEqual(4, policy.backoff(10))
+
+    def test_wait_budget_is_per_request(self):
+        self.fake("products", code=429, body=b"{}", response_headers={"Retry-After": "6"})
+        with self.assertRaises(ClientError):
+            shopify.Product.find()
+        self.assertEqual([6.0], self.sleeps)
+
+        self.sleeps = []
+        self.recover()
+        shopify.Product.find()
+        self.assertEqual([6.0], self.sleeps)
+
+    def test_other_client_errors_are_not_retried(self):
+        self.fake("products/1", code=404, body=b"{}")
+        with self.assertRaises(ClientError):
+            shopify.Product.find(1)
+        self.assertEqual([], self.sleeps)
+
+    def test_gateway_errors_are_not_retried_for_post(self):
+        self.fake("products", method="POST", code=502, body=b"{}", headers={"Content-type": "application/json"})
+        with self.assertRaises(ServerError):
+            shopify.Product.create({"title": "Not retried"})
+        self.assertEqual([], self.sleeps)
+
+    def test_throttled_post_is_retried(self):
+        self.fake(
+            "products",
+            method="POST",
+            code=429,
+            body=b"{}",
+            headers={"Content-type": "application/json"},
+            response_headers={"Retry-After": "1"},
+        )
+        self.recover(
+            method="POST",
+            code=201,
+            body=self.load_fixture("product"),
+            headers={"Content-type": "application/json"},
+        )
+        product = shopify.Product.create({"title": "Retried"})
+        self.assertEqual(632910392, product.id)
+        self.assertEqual({"POST /admin/api/{version}/products.json": 1}, self.policy.stats()["retries"])
+
+    def test_retries_are_counted_per_endpoint(self):
+        self.fake("products/632910392", code=503, body=b"{}")
+        self.recover(url=self.http.site + "/admin/api/unstable/products/632910392.json", body=self.load_fixture("product"))
+        shopify.Product.find(632910392)
+        self.assertEqual({"GET /admin/api/{version}/products/{id}.json": 1}, self.policy.stats()["retries"])
+
+        self.policy.reset()
+        self.assertEqual({"retries": {}, "exhausted": {}}, self.policy.stats())
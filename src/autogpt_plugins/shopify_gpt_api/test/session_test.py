@@ -175,6 +175,16 @@ class SessionTest(TestCase):
         expected_hmac = hmac.new("secret".encode(), to_sign.encode(), sha256).hexdigest()
         self.assertEqual(shopify.Session.calculate_hmac(params), expected_hmac)
 
+    def test_webhook_hmac_calculation(self):
+        shopify.Session.secret = "secret"
+        self.assertEqual("dzJZAsrKgS3CWXM6rNBGtzgXNyx3e42VtAJkdHRRbhM=", shopify.Session.calculate_webhook_hmac(b"{}"))
+
+    def test_webhook_hmac_validation(self):
+        shopify.Session.secret = "secret"
+        self.assertTrue(shopify.Session.validate_webhook_hmac(b"{}", "dzJZAsrKgS3CWXM6rNBGtzgXNyx3e42VtAJkdHRRbhM="))
+        self.assertFalse(shopify.Session.validate_webhook_hmac(b"{ }", "dzJZAsrKgS3CWXM6rNBGtzgXNyx3e42VtAJkdHRRbhM="))
+        self.assertFalse(shopify.Session.validate_webhook_hmac(b"{}", None))
+
     def test_hmac_validation(self):
         # Test using the secret and parameter examples given in the Shopify API documentation.
         shopify.Session.secret = "hush"
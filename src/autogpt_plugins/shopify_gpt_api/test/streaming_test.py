@@ -0,0 +1,116 @@
+import json
+import shopify
+from mock import patch
+from pyactiveresource import formats
+from test.test_helper import TestCase
+
+
+class IterJsonArrayTest(TestCase):
+    def test_root_key_envelope(self):
+        body = json.dumps({"products": [{"id": 1}, {"id": 2, "tags": [1, 2]}]}).encode()
+        self.assertEqual([{"id": 1}, {"id": 2, "tags": [1, 2]}], list(shopify.iter_json_array(body)))
+
+    def test_bare_array_and_scalars(self):
+        self.assertEqual([1, "two", None, 4.5], list(shopify.iter_json_array(b' [1, "two", null, 4.5] ')))
+
+    def test_empty_bodies(self):
+        self.assertEqual([], list(shopify.iter_json_array(b'{"products": []}')))
+        self.assertEqual([], list(shopify.iter_json_array(b"{}")))
+        self.assertEqual([], list(shopify.iter_json_array(b"")))
+
+    def test_non_array_root_is_yielded_whole(self):
+        self.assertEqual([{"id": 1}], list(shopify.iter_json_array(b'{"product": {"id": 1}}')))
+
+    def test_elements_split_across_chunks(self):
+        orders = [{"id": i, "name": "café #%d" % i, "total": 12345.5 + i} for i in range(50)]
+        body = json.dumps({"orders": orders}, ensure_ascii=False).encode("utf-8")
+        for chunk_size in (1, 3, 7, 64):
+            self.assertEqual(orders, list(shopify.iter_json_array(body, chunk_size=chunk_size)))
+
+    def test_strings_with_brackets_and_escapes_split_across_chunks(self):
+        products = [
+            {"id": 1, "body_html": '<p class=\"a\">[{x}]</p> \\ "quoted" \u00e9'},
+            {"id": 2, "tags": ["}", "]"]},
+        ]
+        body = json.dumps({"products": products}).encode("utf-8")
+        for chunk_size in (1, 2, 3, 5):
+            self.assertEqual(products, list(shopify.iter_json_array(body, chunk_size=chunk_size)))
+
+    def test_large_element_is_decoded_once_it_is_complete(self):
+        body = json.dumps([{"id": 1, "body_html": "x" * 100000}, {"id": 2}]).encode("utf-8")
+        raw_decode = json.JSONDecoder.raw_decode
+        with patch.object(json.JSONDecoder, "raw_decode", autospec=True, side_effect=raw_decode) as decode:
+            elements = list(shopify.iter_json_array(body, chunk_size=1024))
+        self.assertEqual([1, 2], [element["id"] for element in elements])
+        # One failed attempt on the first chunk and one once the element is buffered, then one for the second
+        self.assertEqual(3, decode.call_count)
+
+    def test_number_at_a_chunk_boundary_is_not_truncated(self):
+        self.assertEqual([12345, 678], list(shopify.iter_json_array(iter([b"[123", b"45, 678]"]))))
+
+    def test_elements_are_yielded_before_the_rest_is_parsed(self):
+        elements = shopify.iter_json_array(b'{"products": [{"id": 1}, {"id": 2}, not json')
+        self.assertEqual({"id": 1}, next(elements))
+        self.assertEqual({"id": 2}, next(elements))
+        with self.assertRaises(formats.Error):
+            next(elements)
+
+    def test_truncated_body(self):
+        with self.assertRaises(formats.Error):
+            list(shopify.iter_json_array(b'[{"id": 1}, {"id": '))
+
+
+class FindStreamTest(TestCase):
+    def setUp(self):
+        super(FindStreamTest, self).setUp()
+        self.prefix = self.http.site + "/admin/api/unstable"
+        self.fixture = json.loads(self.load_fixture("products").decode())
+        self.next_page_url = self.prefix + "/products.json?limit=2&page_info=NEXT"
+        self.fake(
+            "products",
+            url=self.prefix + "/products.json?limit=2",
+            body=json.dumps({"products": self.fixture[:2]}),
+            response_headers={"Link": "<" + self.next_page_url + '>; rel="next"'},
+        )
+        self.fake(
+            "products",
+            url=self.next_page_url,
+            body=json.dumps({"products": self.fixture[2:4]}),
+        )
+
+    def test_resources_match_find(self):
+        streamed = list(shopify.Product.find_stream(limit=2))
+        found = list(shopify.Product.find(limit=2))
+        self.assertEqual([product.to_dict() for product in found], [product.to_dict() for product in streamed])
+        self.assertIsInstance(streamed[0], shopify.Product)
+        self.assertIsInstance(streamed[0].variants[0], shopify.Variant)
+
+    def test_pagination(self):
+        page = shopify.Product.find_stream(limit=2)
+        self.assertTrue(page.has_next_page())
+        self.assertEqual(self.next_page_url, page.next_page_url)
+        ids = [product.id for product in page]
+
+        page = page.next_page()
+        ids.extend(product.id for product in page)
+        self.assertFalse(page.has_next_page())
+        self.assertEqual([product["id"] for product in self.fixture[:4]], ids)
+        with self.assertRaises(IndexError):
+            page.next_page()
+
+    def test_scan_streams_every_page(self):
+        for prefetch in (0, 1):
+            scanned = list(shopify.Product.scan(limit=2, stream=True, prefetch=prefetch))
+            self.assertEqual([product["id"] for product in self.fixture[:4]], [product.id for product in scanned])
+            self.assertIsInstance(scanned[0], shopify.Product)
+
+    def test_stream_is_single_pass(self):
+        page = shopify.Product.find_stream(limit=2)
+        list(page)
+        with self.assertRaises(RuntimeError):
+            list(page)
+
+    def test_prefix_options(self):
+        self.fake("products/632910392/variants", method="GET", body=self.load_fixture("variants"))
+        variants = list(shopify.Variant.find_stream(product_id=632910392))
+        self.assertEqual(632910392, variants[0]._prefix_options["product_id"])
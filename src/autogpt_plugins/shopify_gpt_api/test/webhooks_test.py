@@ -0,0 +1,114 @@
+import json
+import threading
+import shopify
+from six.moves import http_client
+from test.test_helper import TestCase
+
+
+class WebhookReceiverTest(TestCase):
+    def setUp(self):
+        super(WebhookReceiverTest, self).setUp()
+        shopify.Session.secret = "hush"
+        self.receiver = shopify.WebhookReceiver().start()
+        self.delivered = []
+        self.receiver.subscribe("products/*", lambda topic, payload: self.delivered.append((topic, payload)))
+
+    def tearDown(self):
+        self.receiver.stop()
+        shopify.Session.secret = None
+        super(WebhookReceiverTest, self).tearDown()
+
+    def post(self, topic, body, hmac_header=None, webhook_id=None):
+        """Deliver a recorded payload the way Shopify does."""
+        headers = {
+            "Content-Type": "application/json",
+            "X-Shopify-Topic": topic,
+            "X-Shopify-Hmac-Sha256": hmac_header or shopify.Session.calculate_webhook_hmac(body),
+        }
+        if webhook_id:
+            headers["X-Shopify-Webhook-Id"] = webhook_id
+        host, port = self.receiver.server_address[:2]
+        connection = http_client.HTTPConnection(host, port, timeout=5)
+        try:
+            connection.request("POST", "/webhooks", body, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def recorded(self, name):
+        return json.dumps(json.loads(self.load_fixture(name).decode("utf-8"))[name]).encode("utf-8")
+
+    def test_verified_payload_is_dispatched_by_topic(self):
+        body = self.recorded("product")
+        self.assertEqual(200, self.post("products/update", body))
+        self.assertEqual(200, self.post("orders/create", self.recorded("order")))
+
+        self.assertEqual(1, len(self.delivered))
+        topic, payload = self.delivered[0]
+        self.assertEqual("products/update", topic)
+        self.assertEqual(json.loads(body.decode("utf-8")), payload)
+        self.assertEqual(2, self.receiver.received)
+
+    def test_forged_payload_is_rejected(self):
+        self.assertEqual(401, self.post("products/update", self.recorded("product"), hmac_header="forged"))
+        self.assertEqual([], self.delivered)
+        self.assertEqual(1, self.receiver.rejected)
+
+    def test_redelivered_webhook_is_dispatched_once(self):
+        body = self.recorded("product")
+        self.assertEqual(200, self.post("products/update", body, webhook_id="b54557e4"))
+        self.assertEqual(200, self.post("products/update", body, webhook_id="b54557e4"))
+        self.assertEqual(1, len(self.delivered))
+        self.assertEqual(1, self.receiver.duplicates)
+
+    def test_handler_error_asks_for_redelivery(self):
+        calls = {"index": 0, "cache": 0}
+
+        def index(topic, payload):
+            calls["index"] += 1
+
+        def cache(topic, payload):
+            calls["cache"] += 1
+            if calls["cache"] == 1:
+                raise RuntimeError("cache unavailable")
+
+        self.receiver.subscribe("products/update", index)
+        self.receiver.subscribe("products/update", cache)
+        body = self.recorded("product")
+        self.assertEqual(500, self.post("products/update", body, webhook_id="c3f9"))
+        self.assertEqual({"index": 1, "cache": 1}, calls)
+        self.assertEqual(1, len(self.delivered))
+
+        self.assertEqual(200, self.post("products/update", body, webhook_id="c3f9"))
+        self.assertEqual({"index": 1, "cache": 2}, calls)
+        self.assertEqual(1, len(self.delivered))
+
+        self.assertEqual(200, self.post("products/update", body, webhook_id="c3f9"))
+        self.assertEqual({"index": 1, "cache": 2}, calls)
+
+    def test_concurrent_redelivery_is_dispatched_once(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow(topic, payload):
+            started.set()
+            release.wait(5)
+
+        self.receiver.subscribe("products/update", slow)
+        body = self.recorded("product")
+        first = []
+        thread = threading.Thread(target=lambda: first.append(self.post("products/update", body, webhook_id="d41d")))
+        thread.start()
+        try:
+            self.assertTrue(started.wait(5))
+            self.assertEqual(409, self.post("products/update", body, webhook_id="d41d"))
+        finally:
+            release.set()
+            thread.join(5)
+        self.assertEqual([200], first)
+        self.assertEqual(1, len(self.delivered))
+        self.assertEqual(200, self.post("products/update", body, webhook_id="d41d"))
+        self.assertEqual(1, len(self.delivered))
+        self.assertEqual(2, self.receiver.duplicates)
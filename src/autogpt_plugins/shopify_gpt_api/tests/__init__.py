@@ -0,0 +1,7 @@
+"""
+Tests of the plugin modules. The vendored shopify package has its own suite in test/.
+
+Run from src/ with the plugin directory on the path, so `import shopify` finds the vendored package:
+
+    PYTHONPATH=autogpt_plugins/shopify_gpt_api python -m unittest discover -s autogpt_plugins/shopify_gpt_api/tests -p '*_test.py' -t .
+"""
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from mock import Mock, patch
+import shopify
+from .. import shopifygpt
+from ..store_snapshot import StoreSnapshot, use_snapshot
+from .test_helper import TestCase
+
+
+def order(id_, source_name, product_id, price):
+    return shopify.Order(
+        {
+            "id": id_,
+            "source_name": source_name,
+            "total_price": price,
+            "line_items": [{"title": "Shirt", "product_id": product_id, "price": price, "quantity": 1}],
+        }
+    )
+
+
+class AnalyzeSalesTest(TestCase):
+    def setUp(self):
+        super(AnalyzeSalesTest, self).setUp()
+        self.orders = [order(1, "web", 101, "10.00"), order(2, "pos", 102, "5.00")]
+        self.products = [shopify.Product({"id": 101, "title": "Shirt"}), shopify.Product({"id": 102, "title": "Hat"})]
+        self.collections = [shopify.CustomCollection({"id": 5, "title": "Tops"})]
+        self.collection_cache = Mock()
+        self.collection_cache.get.return_value = (self.collections, [(101, 5)])
+        self.patches = [
+            patch.object(shopifygpt, "collection_cache", self.collection_cache),
+            patch.object(shopifygpt, "sales_aggregates", None),
+            patch.object(shopifygpt, "store_mirror", None),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in reversed(self.patches):
+            patcher.stop()
+        super(AnalyzeSalesTest, self).tearDown()
+
+    def test_snapshot_collections_are_used_without_loading_them(self):
+        snapshot = StoreSnapshot(self.orders, self.products, [], self.collections, [(102, 5)])
+        with use_snapshot(snapshot):
+            results = shopifygpt.analyze_sales()
+            shopifygpt.analyze_sales()
+        self.assertEqual({"Tops": "$5.00"}, results["sales_by_collection"])
+        self.assertEqual({"web": "$10.00", "pos": "$5.00"}, results["sales_by_channel"])
+        self.collection_cache.get.assert_not_called()
+
+    def test_mirror_reads_the_cached_collections(self):
+        mirror = Mock()
+        mirror.orders.side_effect = lambda **kwargs: iter(self.orders)
+        mirror.products.side_effect = lambda: iter(self.products)
+        with patch.object(shopifygpt, "store_mirror", mirror):
+            results = shopifygpt.analyze_sales()
+        self.assertEqual({"Tops": "$10.00"}, results["sales_by_collection"])
+        self.collection_cache.get.assert_called_once_with()
+
+
+class ShopTimezoneTest(TestCase):
+    def setUp(self):
+        super(ShopTimezoneTest, self).setUp()
+        self.shop = shopify.Shop(
+            {"iana_timezone": "America/New_York", "timezone": "(GMT-05:00) Eastern Time (US & Canada)"}
+        )
+        self.current = patch.object(shopify.Shop, "current", side_effect=lambda: self.shop)
+        self.current.start()
+        shopifygpt.shop_timezones.clear()
+
+    def tearDown(self):
+        self.current.stop()
+        shopifygpt.shop_timezones.clear()
+        super(ShopTimezoneTest, self).tearDown()
+
+    def test_time_zone_is_fetched_once_per_shop(self):
+        self.assertEqual("America/New_York", str(shopifygpt.shop_timezone()))
+        self.assertEqual("America/New_York", str(shopifygpt.shop_timezone()))
+        self.assertEqual(1, shopify.Shop.current.call_count)
+
+        shopify.ShopifyResource.site = "https://another-shop.myshopify.com/admin/api/unstable"
+        self.shop = shopify.Shop({"iana_timezone": "Europe/Paris"})
+        self.assertEqual("Europe/Paris", str(shopifygpt.shop_timezone()))
+        self.assertEqual(2, shopify.Shop.current.call_count)
+
+    def test_time_zone_is_fetched_again_once_expired(self):
+        with patch.object(shopifygpt, "SHOP_TIMEZONE_MAX_AGE", -1):
+            shopifygpt.shop_timezone()
+            shopifygpt.shop_timezone()
+        self.assertEqual(2, shopify.Shop.current.call_count)
+
+    def test_without_zoneinfo_the_utc_offset_is_used(self):
+        with patch.object(shopifygpt, "ZoneInfo", None):
+            self.assertEqual(timedelta(hours=-5), shopifygpt.shop_timezone().utcoffset(None))
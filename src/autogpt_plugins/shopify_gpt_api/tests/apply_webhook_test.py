@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+from contextlib import closing
+from mock import Mock, patch
+import shopify
+from .. import shopifygpt
+from ..product_index import ProductIndex, TitleResolver
+from ..store_mirror import StoreMirror
+from .test_helper import TestCase
+
+
+PRODUCT = {
+    "id": 1,
+    "title": "Shirt",
+    "updated_at": "2023-05-01T00:00:00Z",
+    "variants": [{"id": 11, "product_id": 1, "title": "Small", "price": "10.00", "inventory_item_id": 111}],
+}
+ORDER = {
+    "id": 2,
+    "name": "#1001",
+    "customer": {"id": 3},
+    "total_price": "20.00",
+    "created_at": "2023-05-02T09:00:00-04:00",
+    "updated_at": "2023-05-02T09:00:00-04:00",
+    "line_items": [{"id": 21, "product_id": 1, "variant_id": 11, "title": "Shirt", "quantity": 2, "price": "10.00"}],
+}
+CUSTOMER = {"id": 3, "first_name": "Ada", "last_name": "Lovelace", "email": "ada@example.com", "orders_count": 1}
+
+
+class ApplyWebhookTest(TestCase):
+    def setUp(self):
+        super(ApplyWebhookTest, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.mirror = StoreMirror(os.path.join(self.dir, "store.sqlite3"))
+        self.product_index = ProductIndex()
+        self.patches = [
+            patch.object(shopifygpt, "store_mirror", self.mirror),
+            patch.object(shopifygpt, "product_index", self.product_index),
+            patch.object(shopifygpt, "title_resolver", TitleResolver()),
+            patch.object(shopifygpt, "inventory", Mock()),
+            patch.object(shopifygpt, "sales_aggregates", Mock()),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in reversed(self.patches):
+            patcher.stop()
+        shutil.rmtree(self.dir)
+        super(ApplyWebhookTest, self).tearDown()
+
+    def rows(self, sql):
+        with closing(self.mirror._connect()) as db:
+            return db.execute(sql).fetchall()
+
+    def test_product_webhooks_update_the_mirror_and_the_index(self):
+        shopifygpt.apply_webhook("products/create", PRODUCT)
+        self.assertEqual([(1, "Shirt")], self.rows("SELECT id, title FROM products"))
+        self.assertEqual([(11, 1, 111)], self.rows("SELECT id, product_id, inventory_item_id FROM variants"))
+        self.assertEqual("Shirt", self.product_index._titles.get(1))
+
+        shopifygpt.apply_webhook("products/update", dict(PRODUCT, title="Linen shirt"))
+        self.assertEqual([(1, "Linen shirt")], self.rows("SELECT id, title FROM products"))
+        self.assertEqual(2, shopifygpt.inventory.invalidate.call_count)
+
+        shopifygpt.apply_webhook("products/delete", {"id": 1})
+        self.assertEqual([], self.rows("SELECT id FROM products"))
+        self.assertEqual([], self.rows("SELECT id FROM variants"))
+        self.assertIsNone(self.product_index._titles.get(1))
+
+    def test_order_webhooks_update_the_mirror_and_the_aggregates(self):
+        shopifygpt.apply_webhook("orders/create", ORDER)
+        self.assertEqual([(2, "#1001", 3, 20.0)], self.rows("SELECT id, name, customer_id, total_price FROM orders"))
+        self.assertEqual([(21, 2, 2)], self.rows("SELECT id, order_id, quantity FROM order_line_items"))
+        shopifygpt.sales_aggregates.apply.assert_called_once_with(ORDER)
+
+        cancelled = dict(ORDER, cancelled_at="2023-05-03T10:00:00-04:00")
+        shopifygpt.apply_webhook("orders/cancelled", cancelled)
+        self.assertEqual([("2023-05-03T10:00:00-04:00",)], self.rows("SELECT cancelled_at FROM orders"))
+
+        shopifygpt.apply_webhook("orders/delete", {"id": 2})
+        self.assertEqual([], self.rows("SELECT id FROM orders"))
+        self.assertEqual([], self.rows("SELECT id FROM order_line_items"))
+        shopifygpt.sales_aggregates.remove.assert_called_once_with(2)
+
+    def test_customer_webhooks_update_the_mirror(self):
+        shopifygpt.apply_webhook("customers/create", CUSTOMER)
+        shopifygpt.apply_webhook("customers/update", dict(CUSTOMER, email="ada@example.org"))
+        self.assertEqual([(3, "Ada", "ada@example.org")], self.rows("SELECT id, first_name, email FROM customers"))
+
+        shopifygpt.apply_webhook("customers/delete", {"id": 3})
+        self.assertEqual([], self.rows("SELECT id FROM customers"))
+
+    def test_inventory_level_webhooks_go_to_the_inventory_snapshot(self):
+        level = {"inventory_item_id": 111, "location_id": 7, "available": 4}
+        shopifygpt.apply_webhook("inventory_levels/update", level)
+        shopifygpt.apply_webhook("inventory_levels/connect", level)
+        shopifygpt.apply_webhook("inventory_levels/disconnect", {"inventory_item_id": 111, "location_id": 7})
+
+        self.assertEqual(2, shopifygpt.inventory.apply_level.call_count)
+        shopifygpt.inventory.apply_level.assert_called_with(level)
+        shopifygpt.inventory.remove_level.assert_called_once_with(111, 7)
+        self.assertEqual([], self.rows("SELECT id FROM products"))
+
+    def test_unknown_topics_are_ignored(self):
+        shopifygpt.apply_webhook("carts/update", {"id": 9})
+        shopifygpt.apply_webhook("orders/edited", ORDER)
+        self.assertEqual([], self.rows("SELECT id FROM orders"))
+        shopifygpt.sales_aggregates.apply.assert_not_called()
+
+    def test_receiver_is_started_once_by_the_plugin(self):
+        with patch.object(shopifygpt, "WEBHOOK_PORT", None):
+            self.assertIsNone(shopifygpt.start_webhook_receiver())
+        with patch.object(shopifygpt, "WEBHOOK_PORT", "0"), patch.object(shopifygpt, "webhook_receiver", None):
+            receiver = shopifygpt.start_webhook_receiver()
+            try:
+                self.assertIs(receiver, shopifygpt.start_webhook_receiver())
+            finally:
+                receiver.stop()
+                shopify.Session.secret = None
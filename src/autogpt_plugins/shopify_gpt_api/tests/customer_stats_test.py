@@ -0,0 +1,115 @@
+import shopify
+from ..customer_stats import CustomerBehavior
+from .test_helper import TestCase
+
+
+def order(customer_id, created_at, *items):
+    return shopify.Order(
+        {
+            "customer": {"id": customer_id} if customer_id else None,
+            "created_at": created_at,
+            "line_items": [{"price": price, "quantity": quantity} for price, quantity in items],
+        }
+    )
+
+
+class CustomerBehaviorTest(TestCase):
+    def setUp(self):
+        super(CustomerBehaviorTest, self).setUp()
+        self.orders = [
+            order(1, "2023-03-01T00:00:00Z", ("5.00", 2), ("2.50", 1)),
+            order(1, "2023-01-01T00:00:00Z", ("10.00", 1)),
+            order(2, "2023-02-01T00:00:00Z", ("30.00", 1)),
+            order(None, "2023-02-02T00:00:00Z", ("99.00", 1)),
+        ]
+        self.orders += [order(3, "2023-01-0%dT00:00:00Z" % day, ("1.00", 1)) for day in range(1, 7)]
+        self.behavior = CustomerBehavior().extend(self.orders)
+
+    def test_add_folds_each_customer_into_totals(self):
+        self.assertEqual(3, len(self.behavior))
+        self.assertEqual(10, self.behavior.orders)
+        self.assertEqual(1, self.behavior.guest_orders)
+        arrays = self.behavior.to_arrays()
+        self.assertEqual([1, 2, 3], arrays["ids"].tolist())
+        self.assertEqual([2, 1, 6], arrays["orders"].tolist())
+        self.assertEqual([1750, 3000, 600], arrays["spent"].tolist())
+        self.assertEqual([4, 1, 6], arrays["units"].tolist())
+        self.assertEqual([1672531200, 1675209600, 1672531200], arrays["first_order"].tolist())
+        self.assertEqual([1677628800, 1675209600, 1672963200], arrays["last_order"].tolist())
+
+    def test_top(self):
+        self.assertEqual([2, 1], [customer_id for customer_id, _ in self.behavior.top(2)])
+        self.assertEqual([3], [customer_id for customer_id, _ in self.behavior.top(2, offset=2)])
+        self.assertEqual([3, 1, 2], [customer_id for customer_id, _ in self.behavior.top(3, "total_orders")])
+        self.assertEqual([1, 2, 3], [customer_id for customer_id, _ in self.behavior.top(3, "last_order")])
+
+    def test_summary(self):
+        emails = lambda ids: {id_: {"email": "%d@example.com" % id_} for id_ in ids}
+        summary = self.behavior.summary(top_k=2, details=emails)
+        self.assertEqual(
+            [
+                {
+                    "id": 2,
+                    "email": "2@example.com",
+                    "total_spent": "$30.00",
+                    "total_orders": 1,
+                    "units": 1,
+                    "average_order": "$30.00",
+                    "first_order": "2023-02-01",
+                    "last_order": "2023-02-01",
+                },
+                {
+                    "id": 1,
+                    "email": "1@example.com",
+                    "total_spent": "$17.50",
+                    "total_orders": 2,
+                    "units": 4,
+                    "average_order": "$8.75",
+                    "first_order": "2023-01-01",
+                    "last_order": "2023-03-01",
+                },
+            ],
+            summary.pop("top_customers"),
+        )
+        self.assertEqual(
+            {
+                "customers": 3,
+                "orders": 10,
+                "guest_orders": 1,
+                "revenue": "$53.50",
+                "average_spent": "$17.83",
+                "average_orders": 3.0,
+                "spent_percentiles": {"p50": "$17.50", "p90": "$30.00", "p99": "$30.00"},
+                "customers_by_order_count": {"1": 1, "2": 1, "3-5": 0, "6-10": 1, "11+": 0},
+                "repeat_customers": 2,
+                "sort_by": "total_spent",
+                "page": 1,
+                "pages": 2,
+            },
+            summary,
+        )
+
+    def test_summary_pages(self):
+        summary = self.behavior.summary(top_k=2, page=2)
+        self.assertEqual([3], [customer["id"] for customer in summary["top_customers"]])
+        self.assertEqual([], self.behavior.summary(top_k=2, page=3)["top_customers"])
+        self.assertEqual(1, self.behavior.summary(top_k=2, page=0)["page"])
+
+    def test_details_are_only_requested_for_the_page(self):
+        requested = []
+        self.behavior.summary(top_k=1, page=3, details=lambda ids: requested.append(ids) or {})
+        self.behavior.summary(top_k=1, page=4, details=lambda ids: requested.append(ids) or {})
+        self.assertEqual([[3]], requested)
+
+    def test_summary_rejects_unknown_sort_keys(self):
+        with self.assertRaises(ValueError):
+            self.behavior.summary(sort_by="email")
+
+    def test_summary_without_customers(self):
+        summary = CustomerBehavior().extend([order(None, "2023-01-01T00:00:00Z", ("1.00", 1))]).summary()
+        self.assertEqual(0, summary["customers"])
+        self.assertEqual(1, summary["guest_orders"])
+        self.assertEqual("$0.00", summary["average_spent"])
+        self.assertEqual({"p50": "$0.00", "p90": "$0.00", "p99": "$0.00"}, summary["spent_percentiles"])
+        self.assertEqual(0, summary["pages"])
+        self.assertEqual([], summary["top_customers"])
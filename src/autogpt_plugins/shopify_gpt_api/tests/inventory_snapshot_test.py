@@ -0,0 +1,154 @@
+from mock import patch
+import shopify
+from ..inventory_snapshot import InventorySnapshot
+from .test_helper import TestCase
+
+
+def level(inventory_item_id, location_id, available):
+    return {"inventory_item_id": inventory_item_id, "location_id": location_id, "available": available}
+
+
+class InventorySnapshotTest(TestCase):
+    def setUp(self):
+        super(InventorySnapshotTest, self).setUp()
+        self.products = [
+            shopify.Product(
+                {
+                    "id": 1,
+                    "title": "Shirt",
+                    "variants": [
+                        {"id": 11, "title": "S", "inventory_item_id": 111},
+                        {"id": 12, "title": "M", "inventory_item_id": 112},
+                    ],
+                }
+            ),
+            shopify.Product(
+                {"id": 2, "title": "Hat", "variants": [{"id": 21, "title": "One size", "inventory_item_id": 211}]}
+            ),
+        ]
+        locations = [shopify.Location({"id": 1, "name": "Store"}), shopify.Location({"id": 2, "name": "Warehouse"})]
+        self.levels = [
+            level(111, 1, 3),
+            level(111, 2, 10),
+            level(112, 1, 0),
+            level(211, 1, None),
+            level(211, 2, 20),
+        ]
+        self.location_scan = patch.object(shopify.Location, "scan", return_value=locations)
+        self.level_scan = patch.object(
+            shopify.InventoryLevel,
+            "scan_by_ids",
+            side_effect=lambda items, locations, **kwargs: (shopify.InventoryLevel(level) for level in self.levels),
+        )
+        self.location_scan.start()
+        self.level_scan.start()
+        self.snapshot = InventorySnapshot()
+        self.snapshot.ensure_fresh(lambda: self.products)
+
+    def tearDown(self):
+        self.location_scan.stop()
+        self.level_scan.stop()
+        super(InventorySnapshotTest, self).tearDown()
+
+    def variants(self, rows):
+        return [(row["variant_id"], row["inventory_quantity"]) for row in rows]
+
+    def test_build_reads_the_levels_of_every_variant_at_every_location(self):
+        items, locations = shopify.InventoryLevel.scan_by_ids.call_args[0]
+        self.assertEqual({111, 112, 211}, set(items))
+        self.assertEqual({1, 2}, set(locations))
+        self.assertEqual(3, len(self.snapshot))
+        self.assertEqual([[3, 10], [0, 0], [0, 20]], self.snapshot.quantities.tolist())
+        self.assertEqual([[True, True], [True, False], [False, True]], self.snapshot.stocked.tolist())
+        self.assertEqual([13, 0, 20], self.snapshot.totals().tolist())
+
+    def test_low_stock_over_every_location(self):
+        self.assertEqual(
+            [
+                {
+                    "product_id": 1,
+                    "product_name": "Shirt",
+                    "variant_id": 12,
+                    "variant_name": "M",
+                    "inventory_quantity": 0,
+                    "locations": {"Store": 0},
+                }
+            ],
+            self.snapshot.low_stock(),
+        )
+
+    def test_low_stock_includes_the_threshold(self):
+        self.assertEqual([(12, 0), (11, 13)], self.variants(self.snapshot.low_stock(threshold=13)))
+        self.assertEqual([(12, 0)], self.variants(self.snapshot.low_stock(threshold=12)))
+        self.assertEqual([], self.variants(self.snapshot.low_stock(threshold=-1)))
+
+    def test_low_stock_at_a_location(self):
+        self.assertEqual([(12, 0), (11, 3)], self.variants(self.snapshot.low_stock(location_id=1)))
+        low = self.snapshot.low_stock(location_id=2)
+        self.assertEqual([(11, 10)], self.variants(low))
+        self.assertEqual({"Store": 3, "Warehouse": 10}, low[0]["locations"])
+
+    def test_untracked_items_are_not_stocked(self):
+        # The hat is untracked at the store, so it has no level there even with a high threshold
+        self.assertEqual([(11, 3), (12, 0)], sorted(self.variants(self.snapshot.low_stock(100, location_id=1))))
+
+    def test_unknown_location(self):
+        self.assertEqual([], self.snapshot.low_stock(location_id=99))
+
+    def test_location_totals(self):
+        self.assertEqual(
+            [
+                {
+                    "location_id": 1,
+                    "location_name": "Store",
+                    "units": 3,
+                    "variants": 2,
+                    "low_stock_variants": 2,
+                    "out_of_stock_variants": 1,
+                },
+                {
+                    "location_id": 2,
+                    "location_name": "Warehouse",
+                    "units": 30,
+                    "variants": 2,
+                    "low_stock_variants": 1,
+                    "out_of_stock_variants": 0,
+                },
+            ],
+            self.snapshot.location_totals(),
+        )
+        self.assertEqual([0, 0], [row["low_stock_variants"] for row in self.snapshot.location_totals(threshold=-1)])
+
+    def test_levels_applied_after_the_load_update_the_matrix(self):
+        self.snapshot.apply_level(level(112, 2, 5))
+        self.snapshot.apply_level(level(111, 1, 30))
+        self.assertEqual([(12, 5), (11, 10)], self.variants(self.snapshot.low_stock(location_id=2)))
+        self.assertEqual([40, 5, 20], self.snapshot.totals().tolist())
+
+        self.snapshot.ensure_fresh(lambda: self.products)
+        self.assertEqual(1, shopify.InventoryLevel.scan_by_ids.call_count)
+
+    def test_remove_level(self):
+        self.snapshot.remove_level(111, 2)
+        self.assertEqual([3, 0, 20], self.snapshot.totals().tolist())
+        self.assertEqual([(12, 0), (11, 3)], self.variants(self.snapshot.low_stock(location_id=1)))
+        self.assertEqual([], self.snapshot.low_stock(location_id=2))
+
+    def test_unknown_item_or_location_invalidates_the_snapshot(self):
+        self.snapshot.apply_level(level(999, 1, 5))
+        self.snapshot.ensure_fresh(lambda: self.products)
+        self.snapshot.apply_level(level(111, 99, 5))
+        self.snapshot.ensure_fresh(lambda: self.products)
+        self.assertEqual(3, shopify.InventoryLevel.scan_by_ids.call_count)
+
+    def test_levels_before_the_first_build_are_ignored(self):
+        snapshot = InventorySnapshot()
+        snapshot.apply_level(level(111, 1, 5))
+        self.assertEqual(0, len(snapshot))
+        self.assertEqual([], snapshot.low_stock())
+
+    def test_snapshot_is_rebuilt_once_stale(self):
+        self.snapshot.max_age = -1
+        self.levels[0] = level(111, 1, 7)
+        self.snapshot.ensure_fresh(lambda: self.products)
+        self.assertEqual([17, 0, 20], self.snapshot.totals().tolist())
@@ -0,0 +1,153 @@
+from datetime import datetime, timezone
+from mock import patch
+import shopify
+from ..product_index import ProductIndex, TitleResolver, trigrams
+from .test_helper import TestCase
+
+
+def product(id_, title, updated_at="2023-05-01T10:00:00Z"):
+    return shopify.Product({"id": id_, "title": title, "updated_at": updated_at})
+
+
+class ProductIndexTest(TestCase):
+    def setUp(self):
+        super(ProductIndexTest, self).setUp()
+        self.products = [product(1, "Red Shirt"), product(2, "Blue Shirt"), product(3, "Red Hat")]
+        self.scan = patch.object(shopify.Product, "scan", side_effect=lambda **kwargs: iter(self.products))
+        self.scan.start()
+        self.index = ProductIndex()
+
+    def tearDown(self):
+        self.scan.stop()
+        super(ProductIndexTest, self).tearDown()
+
+    def test_trigrams(self):
+        self.assertEqual({"red", "ed ", "d h", " ha", "hat"}, trigrams("red hat"))
+        self.assertEqual(set(), trigrams("ab"))
+
+    def test_search_matches_substrings_case_insensitively(self):
+        self.assertEqual([(1, "Red Shirt"), (2, "Blue Shirt")], self.index.search("SHIRT"))
+        self.assertEqual([(1, "Red Shirt"), (3, "Red Hat")], self.index.search("red"))
+        self.assertEqual([], self.index.search("green"))
+
+    def test_search_shorter_than_a_trigram_checks_every_title(self):
+        self.assertEqual([(1, "Red Shirt"), (2, "Blue Shirt")], self.index.search("sh"))
+
+    def test_similar_scores_the_share_of_trigrams_found(self):
+        # "red shrt" has 6 trigrams: "Red Shirt" has 4 of them, "Red Hat" 2 and "Blue Shirt" 1 (below 0.3)
+        self.assertEqual([(1, "Red Shirt", 0.667), (3, "Red Hat", 0.333)], self.index.similar("red shrt"))
+        self.assertEqual([(1, "Red Shirt", 0.667)], self.index.similar("red shrt", limit=1))
+        self.assertEqual([(1, "Red Shirt", 0.667)], self.index.similar("red shrt", threshold=0.5))
+        self.assertEqual([], self.index.similar("re"))
+
+    def test_similar_ties_go_to_the_shorter_title(self):
+        self.products.append(product(4, "Red Shirt XL"))
+        self.assertEqual([1, 4], [match[0] for match in self.index.similar("red shirt", threshold=1)])
+
+    def test_title_lookups(self):
+        self.assertEqual(["Red Shirt", "Blue Shirt", "Red Hat"], self.index.titles())
+        self.assertEqual("Red Hat", self.index.title(3))
+        self.assertIsNone(self.index.title(4))
+        self.assertEqual(2, self.index.find_title("blue shirt"))
+        self.assertIsNone(self.index.find_title("blue"))
+
+    def test_find_title_prefers_the_lowest_id(self):
+        self.products.insert(0, product(7, "Red Hat"))
+        self.assertEqual(3, self.index.find_title("Red Hat"))
+
+    def test_add_and_remove_update_every_lookup(self):
+        self.index.build()
+        self.index.add(product(1, "Green Shirt"))
+        self.index.remove(3)
+        self.assertEqual([(1, "Green Shirt"), (2, "Blue Shirt")], self.index.search("shirt"))
+        self.assertEqual([], self.index.search("red"))
+        self.assertIsNone(self.index.find_title("red hat"))
+        self.assertEqual(2, len(self.index))
+
+    def test_refresh_fetches_the_products_updated_since_the_watermark(self):
+        self.index.build()
+        self.products = [product(2, "Navy Shirt", "2023-05-02T10:00:00Z")]
+        self.index.refresh()
+
+        self.assertEqual(
+            "2023-05-01T10:00:00+00:00", shopify.Product.scan.call_args_list[1][1]["updated_at_min"]
+        )
+        self.assertEqual([(1, "Red Shirt"), (2, "Navy Shirt")], self.index.search("shirt"))
+        self.products = []
+        self.index.refresh()
+        self.assertEqual(
+            "2023-05-02T10:00:00+00:00", shopify.Product.scan.call_args_list[2][1]["updated_at_min"]
+        )
+
+    def test_watermark_is_capped_at_the_start_of_the_sync(self):
+        self.products = [product(1, "Red Shirt", "2100-01-01T00:00:00Z")]
+        started = datetime.now(timezone.utc).replace(microsecond=0)
+        self.index.build()
+        self.index.refresh()
+
+        watermark = datetime.fromisoformat(shopify.Product.scan.call_args_list[1][1]["updated_at_min"])
+        self.assertGreaterEqual(watermark, started)
+        self.assertLessEqual(watermark, datetime.now(timezone.utc))
+
+    def test_build_drops_deleted_products(self):
+        self.index.build()
+        del self.products[0]
+        self.index.build()
+        self.assertIsNone(self.index.title(1))
+        self.assertEqual([(2, "Blue Shirt")], self.index.search("shirt"))
+
+    def test_deleted_products_are_dropped_within_minutes_by_default(self):
+        self.assertLessEqual(self.index.rebuild_after, 300)
+
+
+class TitleResolverTest(TestCase):
+    def setUp(self):
+        super(TitleResolverTest, self).setUp()
+        self.catalog = {1: product(1, "Red Shirt"), 2: product(2, "Blue Shirt"), 3: product(3, "Red Hat")}
+        self.find_by_ids = patch.object(
+            shopify.Product,
+            "find_by_ids",
+            side_effect=lambda ids, **kwargs: {id_: self.catalog[id_] for id_ in ids if id_ in self.catalog},
+        )
+        self.find_by_ids.start()
+        self.resolver = TitleResolver()
+
+    def tearDown(self):
+        self.find_by_ids.stop()
+        super(TitleResolverTest, self).tearDown()
+
+    def requested(self):
+        return [sorted(call[0][0]) for call in shopify.Product.find_by_ids.call_args_list]
+
+    def test_resolve_fetches_the_distinct_ids_in_one_batch(self):
+        titles = self.resolver.resolve([1, 2, 1, None, 2, 4])
+        self.assertEqual({1: "Red Shirt", 2: "Blue Shirt", 4: None}, titles)
+        self.assertEqual([[1, 2, 4]], self.requested())
+        self.assertEqual(("id", "title"), shopify.Product.find_by_ids.call_args[1]["fields"])
+
+    def test_resolved_titles_are_memoized(self):
+        self.resolver.resolve([1, 2])
+        self.assertEqual({2: "Blue Shirt", 3: "Red Hat"}, self.resolver.resolve([2, 3]))
+        self.assertEqual({1: "Red Shirt"}, self.resolver.resolve([1]))
+        self.assertEqual([[1, 2], [3]], self.requested())
+
+    def test_missing_products_are_memoized_too(self):
+        self.resolver.resolve([4])
+        self.assertEqual({4: None}, self.resolver.resolve([4]))
+        self.assertEqual([[4]], self.requested())
+
+    def test_forget_fetches_the_title_again(self):
+        self.resolver.resolve([1])
+        self.catalog[1] = product(1, "Green Shirt")
+        self.resolver.forget(1)
+        self.assertEqual({1: "Green Shirt"}, self.resolver.resolve([1]))
+
+    def test_expired_titles_are_fetched_again(self):
+        self.resolver.max_age = -1
+        self.resolver.resolve([1])
+        self.resolver.resolve([1])
+        self.assertEqual([[1], [1]], self.requested())
+
+    def test_nothing_to_resolve_makes_no_request(self):
+        self.assertEqual({}, self.resolver.resolve([None]))
+        self.assertEqual([], self.requested())
@@ -0,0 +1,111 @@
+import numpy as np
+from ..rfm import DAY, SegmentCache, quantile_scores, score_rfm
+from .test_helper import TestCase
+
+
+class QuantileScoresTest(TestCase):
+    def test_ties_share_the_score_of_their_lowest_rank(self):
+        scores = quantile_scores(np.array([1, 1, 1, 1, 1, 1, 1, 2, 2, 5]))
+        self.assertEqual([1, 1, 1, 1, 1, 1, 1, 4, 4, 5], scores.tolist())
+
+    def test_distinct_values_fill_every_bin(self):
+        self.assertEqual([1, 2, 3, 4, 5], quantile_scores(np.array([10, 20, 30, 40, 50])).tolist())
+
+    def test_lower_is_better(self):
+        def scores(values):
+            return quantile_scores(np.array(values), higher_is_better=False).tolist()
+
+        self.assertEqual([5, 4, 3, 2, 1], scores([10, 20, 30, 40, 50]))
+        self.assertEqual([2, 4, 1], scores([30, 10, 50]))
+        self.assertEqual([1, 1, 4], scores([5, 5, 1]))
+
+    def test_scores_keep_the_input_order(self):
+        self.assertEqual([3, 1, 5, 2, 4], quantile_scores(np.array([30, 10, 50, 20, 40])).tolist())
+
+    def test_no_values(self):
+        self.assertEqual(0, len(quantile_scores(np.array([]))))
+
+
+class ScoreRFMTest(TestCase):
+    def setUp(self):
+        super(ScoreRFMTest, self).setUp()
+        self.now = 1000 * DAY
+        year = int(365.25 * DAY)
+        self.result = score_rfm(
+            ids=np.array([1, 2, 3, 4, 5]),
+            orders=np.array([5, 4, 3, 2, 1]),
+            spent=np.array([10000, 8000, 6000, 4000, 2000]),
+            first_order=np.full(5, self.now - year),
+            last_order=self.now - np.array([1, 2, 3, 4, 5]) * DAY,
+            now=self.now,
+        )
+
+    def test_scores(self):
+        self.assertEqual([1, 2, 3, 4, 5], self.result.recency.tolist())
+        self.assertEqual([5, 4, 3, 2, 1], self.result.r.tolist())
+        self.assertEqual([5, 4, 3, 2, 1], self.result.f.tolist())
+        self.assertEqual([5, 4, 3, 2, 1], self.result.m.tolist())
+
+    def test_segments_by_recency_and_frequency(self):
+        self.assertEqual(
+            ["champions", "champions", "loyal", "hibernating", "lost"], self.result.segment_names().tolist()
+        )
+
+    def test_ltv_is_the_yearly_value_over_the_lifespan(self):
+        # Every customer has a year of tenure and an average order of $20.00, over 3 years
+        self.assertEqual([30000, 24000, 18000, 12000, 6000], self.result.ltv.tolist())
+
+    def test_short_tenures_count_as_the_minimum(self):
+        result = score_rfm(
+            ids=np.array([1]),
+            orders=np.array([1]),
+            spent=np.array([1000]),
+            first_order=np.array([self.now - DAY]),
+            last_order=np.array([self.now - DAY]),
+            now=self.now,
+        )
+        self.assertAlmostEqual(1000 * 365.25 / 30 * 3, result.ltv[0])
+
+    def test_segment_totals(self):
+        self.assertEqual(
+            {
+                "champions": {"customers": 2, "revenue": 18000, "average_ltv": 27000},
+                "loyal": {"customers": 1, "revenue": 6000, "average_ltv": 18000},
+                "hibernating": {"customers": 1, "revenue": 4000, "average_ltv": 12000},
+                "lost": {"customers": 1, "revenue": 2000, "average_ltv": 6000},
+            },
+            self.result.segments(),
+        )
+
+    def test_members_highest_ltv_first(self):
+        self.assertEqual([0, 1], self.result.members("champions").tolist())
+        self.assertEqual([], self.result.members("other").tolist())
+        with self.assertRaises(ValueError):
+            self.result.members("vip")
+
+
+class SegmentCacheTest(TestCase):
+    def setUp(self):
+        super(SegmentCacheTest, self).setUp()
+        self.computed = 0
+
+    def compute(self):
+        self.computed += 1
+        return self.computed
+
+    def test_result_is_reused_within_max_age(self):
+        cache = SegmentCache()
+        self.assertEqual(1, cache.get(self.compute))
+        self.assertEqual(1, cache.get(self.compute))
+        self.assertEqual(1, self.computed)
+
+    def test_clear_computes_again(self):
+        cache = SegmentCache()
+        cache.get(self.compute)
+        cache.clear()
+        self.assertEqual(2, cache.get(self.compute))
+
+    def test_expired_result_is_computed_again(self):
+        cache = SegmentCache(max_age=-1)
+        cache.get(self.compute)
+        self.assertEqual(2, cache.get(self.compute))
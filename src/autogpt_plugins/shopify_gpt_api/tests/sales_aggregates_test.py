@@ -0,0 +1,213 @@
+import os
+import shutil
+import tempfile
+from mock import patch
+import shopify
+from ..sales_aggregates import CollectionMembers, SalesAggregates
+from .test_helper import TestCase
+
+
+def line_item(id_, title, product_id, price, quantity):
+    return {"id": id_, "title": title, "product_id": product_id, "price": price, "quantity": quantity}
+
+
+class SalesAggregatesTest(TestCase):
+    def setUp(self):
+        super(SalesAggregatesTest, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.aggregates = SalesAggregates(os.path.join(self.dir, "sales.sqlite3"))
+        # Order 1 has two line items of product 100 and one of product 101, all titled "Shirt"
+        self.first = {
+            "id": 1,
+            "created_at": "2023-05-01T10:00:00-04:00",
+            "updated_at": "2023-05-01T10:00:00-04:00",
+            "source_name": "web",
+            "total_price": "25.00",
+            "line_items": [
+                line_item(11, "Shirt", 100, "10.00", 2),
+                line_item(12, "Shirt", 100, "5.00", 1),
+                line_item(13, "Shirt", 101, "10.00", 1),
+            ],
+            "refunds": [{"refund_line_items": [{"line_item_id": 13, "quantity": 1, "subtotal": "10.00"}]}],
+        }
+        self.orders = [
+            shopify.Order(self.first),
+            shopify.Order(
+                {
+                    "id": 2,
+                    "created_at": "2023-05-02T09:00:00-04:00",
+                    "updated_at": "2023-05-03T09:00:00-04:00",
+                    "source_name": "pos",
+                    "total_price": "8.00",
+                    "line_items": [line_item(21, "Hat", 200, "8.00", 1)],
+                }
+            ),
+            shopify.Order(
+                {
+                    "id": 3,
+                    "created_at": "2023-05-02T11:00:00-04:00",
+                    "updated_at": "2023-05-02T11:00:00-04:00",
+                    "source_name": "web",
+                    "total_price": "10.00",
+                    "line_items": [line_item(31, "Shirt", 100, "10.00", 1)],
+                }
+            ),
+        ]
+        self.scan = patch.object(shopify.Order, "scan", side_effect=lambda **kwargs: iter(self.orders))
+        self.scan.start()
+
+    def tearDown(self):
+        self.scan.stop()
+        shutil.rmtree(self.dir)
+        super(SalesAggregatesTest, self).tearDown()
+
+    def test_contribution(self):
+        self.assertEqual(
+            (
+                ("2023-05-01", "web", 2500, 4, 1000),
+                [("Shirt", 100, 1500, 3, 0, 0), ("Shirt", 101, 1000, 1, 1000, 1)],
+            ),
+            SalesAggregates.contribution(self.orders[0]),
+        )
+
+    def test_product_sales_count_each_order_once_per_title(self):
+        self.assertEqual(
+            {
+                "Shirt": {"sales": 3500, "units": 5, "orders": 2, "refunded": 1000, "refunded_units": 1},
+                "Hat": {"sales": 800, "units": 1, "orders": 1, "refunded": 0, "refunded_units": 0},
+            },
+            self.aggregates.product_sales(),
+        )
+        self.assertEqual(
+            {"Shirt": {"sales": 2500, "units": 4, "orders": 1, "refunded": 1000, "refunded_units": 1}},
+            self.aggregates.product_sales("2023-05-01", "2023-05-01"),
+        )
+
+    def test_daily_rollups(self):
+        self.assertEqual(
+            [
+                {"day": "2023-05-01", "revenue": 2500, "units": 4, "orders": 1, "refunded": 1000},
+                {"day": "2023-05-02", "revenue": 1800, "units": 2, "orders": 2, "refunded": 0},
+            ],
+            self.aggregates.daily_sales(),
+        )
+        self.assertEqual(
+            [{"day": "2023-05-02", "revenue": 1800, "units": 2, "orders": 2, "refunded": 0}],
+            self.aggregates.daily_sales(start="2023-05-02"),
+        )
+        self.assertEqual(4300, self.aggregates.total_revenue())
+        self.assertEqual(2500, self.aggregates.total_revenue(end="2023-05-01"))
+        self.assertEqual(0, self.aggregates.total_revenue("2023-06-01", "2023-06-30"))
+
+    def test_channel_sales(self):
+        self.assertEqual(
+            {
+                "web": {"revenue": 3500, "units": 5, "orders": 2, "refunded": 1000},
+                "pos": {"revenue": 800, "units": 1, "orders": 1, "refunded": 0},
+            },
+            self.aggregates.channel_sales(),
+        )
+
+    def test_collection_sales_join_on_the_product_ids(self):
+        with patch.object(
+            shopify.CustomCollection, "scan", return_value=[shopify.CustomCollection({"id": 5, "title": "Tops"})]
+        ), patch.object(shopify.SmartCollection, "scan", return_value=[]), patch.object(
+            shopify.Product, "scan", return_value=[shopify.Product({"id": 101})]
+        ):
+            self.assertEqual(
+                {"Tops": {"sales": 1000, "units": 1, "refunded": 1000}}, self.aggregates.collection_sales()
+            )
+
+    def test_applying_an_order_again_changes_nothing(self):
+        before = (self.aggregates.product_sales(), self.aggregates.daily_sales())
+        self.aggregates.apply(self.orders[0])
+        self.aggregates.apply(self.orders[0])
+        self.assertEqual(before, (self.aggregates.product_sales(), self.aggregates.daily_sales()))
+
+    def test_an_edited_order_replaces_its_previous_contribution(self):
+        self.aggregates.sync()
+        edited = dict(self.first, total_price="15.00", line_items=self.first["line_items"][:2], refunds=[])
+        self.aggregates.apply(shopify.Order(edited))
+        self.assertEqual(
+            {"sales": 2500, "units": 4, "orders": 2, "refunded": 0, "refunded_units": 0},
+            self.aggregates.product_sales()["Shirt"],
+        )
+        self.assertEqual(1500, self.aggregates.total_revenue(end="2023-05-01"))
+
+    def test_removed_orders_leave_every_rollup(self):
+        self.aggregates.sync()
+        self.aggregates.remove(1)
+        self.assertEqual(
+            {"sales": 1000, "units": 1, "orders": 1, "refunded": 0, "refunded_units": 0},
+            self.aggregates.product_sales()["Shirt"],
+        )
+        self.assertEqual({}, self.aggregates.product_sales("2023-05-01", "2023-05-01"))
+        self.assertEqual(["2023-05-02"], [day["day"] for day in self.aggregates.daily_sales()])
+
+    def test_sync_fetches_the_orders_updated_since_the_watermark(self):
+        self.assertEqual(3, self.aggregates.sync())
+        self.assertNotIn("updated_at_min", shopify.Order.scan.call_args[1])
+        self.assertEqual("any", shopify.Order.scan.call_args[1]["status"])
+
+        self.orders = []
+        self.assertEqual(0, self.aggregates.sync())
+        self.assertEqual("2023-05-03T09:00:00-04:00", shopify.Order.scan.call_args[1]["updated_at_min"])
+
+    def test_readers_sync_once_within_max_age(self):
+        self.aggregates.product_sales()
+        self.aggregates.daily_sales()
+        self.assertEqual(1, shopify.Order.scan.call_count)
+
+    def test_first_sync_is_partitioned_with_a_rate_limiter(self):
+        shopify.ShopifyConnection.rate_limiter = shopify.LeakyBucket()
+        try:
+            with patch.object(shopify.Order, "partitioned_scan", return_value=iter(self.orders)) as partitioned:
+                self.assertEqual(3, self.aggregates.sync())
+        finally:
+            shopify.ShopifyConnection.rate_limiter = None
+        self.assertEqual(4, partitioned.call_args[1]["partitions"])
+        self.assertEqual(0, shopify.Order.scan.call_count)
+
+    def test_rebuild_counts_from_scratch(self):
+        self.aggregates.sync()
+        del self.orders[0]
+        self.aggregates.rebuild()
+        self.assertEqual(1800, self.aggregates.total_revenue())
+
+
+class CollectionMembersTest(TestCase):
+    def setUp(self):
+        super(CollectionMembersTest, self).setUp()
+        self.patches = [
+            patch.object(
+                shopify.CustomCollection, "scan", return_value=[shopify.CustomCollection({"id": 5, "title": "Tops"})]
+            ),
+            patch.object(shopify.SmartCollection, "scan", return_value=[]),
+            patch.object(shopify.Product, "scan", return_value=[shopify.Product({"id": 101})]),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in reversed(self.patches):
+            patcher.stop()
+        super(CollectionMembersTest, self).tearDown()
+
+    def test_memberships_are_loaded_once_within_max_age(self):
+        cache = CollectionMembers()
+        collections, members = cache.get()
+        self.assertEqual([5], [collection.id for collection in collections])
+        self.assertEqual([(101, 5)], members)
+        self.assertIs(collections, cache.get()[0])
+        self.assertEqual(1, shopify.Product.scan.call_count)
+
+    def test_expired_memberships_are_loaded_again(self):
+        cache = CollectionMembers(max_age=0)
+        cache.get()
+        cache.get()
+        self.assertEqual(2, shopify.Product.scan.call_count)
+        cache = CollectionMembers()
+        cache.get()
+        cache.clear()
+        cache.get()
+        self.assertEqual(4, shopify.Product.scan.call_count)
@@ -0,0 +1,111 @@
+import shopify
+from ..sales_engine import (
+    SalesColumns,
+    format_cents,
+    sales_by_collection,
+    sales_by_title,
+    summarize_sales,
+    summarize_totals,
+    to_cents,
+    to_epoch,
+)
+from .test_helper import TestCase
+
+
+class SalesEngineTest(TestCase):
+    def setUp(self):
+        super(SalesEngineTest, self).setUp()
+        self.orders = [
+            shopify.Order(
+                {
+                    "id": 1,
+                    "created_at": "2023-05-01T00:00:00Z",
+                    "total_price": "30.00",
+                    "line_items": [
+                        {"title": "Shirt", "product_id": 11, "price": "10.00", "quantity": 2},
+                        {"title": "Hat", "product_id": 12, "price": "5.50", "quantity": 1},
+                    ],
+                }
+            ),
+            shopify.Order(
+                {
+                    "id": 2,
+                    "total_price": "9.99",
+                    "line_items": [{"title": "Shirt", "product_id": 11, "price": "9.99", "quantity": 1}],
+                }
+            ),
+        ]
+        self.columns = SalesColumns.from_orders(self.orders)
+
+    def test_to_cents(self):
+        self.assertEqual(1999, to_cents("19.99"))
+        self.assertEqual(0, to_cents(None))
+        self.assertEqual(0, to_cents(""))
+        self.assertEqual(-550, to_cents("-5.50"))
+
+    def test_to_epoch(self):
+        self.assertEqual(1682899200, to_epoch("2023-05-01T00:00:00Z"))
+        self.assertEqual(1682899200, to_epoch("2023-05-01T02:00:00+02:00"))
+        self.assertEqual(-1, to_epoch(None))
+
+    def test_format_cents(self):
+        self.assertEqual("$0.00", format_cents(0))
+        self.assertEqual("$0.05", format_cents(5))
+        self.assertEqual("$1234.56", format_cents(123456))
+        self.assertEqual("-$19.99", format_cents(-1999))
+        self.assertEqual("-$0.05", format_cents(-5))
+
+    def test_from_orders_builds_parallel_columns(self):
+        self.assertEqual(3, len(self.columns))
+        self.assertEqual([1, 2], self.columns.order_ids.tolist())
+        self.assertEqual([1682899200, -1], self.columns.order_created.tolist())
+        self.assertEqual([3000, 999], self.columns.order_total.tolist())
+        self.assertEqual([0, 0, 1], self.columns.item_order.tolist())
+        self.assertEqual([11, 12, 11], self.columns.item_product.tolist())
+        self.assertEqual([0, 1, 0], self.columns.item_title.tolist())
+        self.assertEqual([1000, 550, 999], self.columns.item_price.tolist())
+        self.assertEqual([2, 1, 1], self.columns.item_quantity.tolist())
+        self.assertEqual(["Shirt", "Hat"], self.columns.titles)
+
+    def test_from_orders_without_orders(self):
+        columns = SalesColumns.from_orders([])
+        self.assertEqual(0, len(columns))
+        self.assertEqual([], columns.titles)
+
+    def test_sales_by_title(self):
+        grouped = sales_by_title(self.columns)
+        self.assertEqual([1999, 550], grouped["sales"].tolist())
+        self.assertEqual([3, 1], grouped["count"].tolist())
+
+    def test_sales_by_collection_sums_the_products_of_each_collection(self):
+        members = [(11, 5), (12, 5), (12, 6), (13, 7)]
+        titles = {5: "Tops", 6: "Hats", 7: "Socks"}
+        self.assertEqual({"Tops": 2549, "Hats": 550}, sales_by_collection(self.columns, members, titles))
+        self.assertEqual({}, sales_by_collection(SalesColumns.from_orders([]), members, titles))
+
+    def test_summarize_sales(self):
+        self.assertEqual(
+            {
+                "total_sales": "$39.99",
+                "product_data": {
+                    "Shirt": {"sales": "$19.99", "count": 3, "contribution": "75.0%"},
+                    "Hat": {"sales": "$5.50", "count": 1, "contribution": "25.0%"},
+                },
+                "slow_moving_products": ["Socks"],
+            },
+            summarize_sales(self.columns, ["Shirt", "Hat", "Socks"]),
+        )
+
+    def test_slow_movers_include_the_threshold(self):
+        summary = summarize_sales(self.columns, ["Shirt", "Hat", "Socks"], slow_threshold=25)
+        self.assertEqual(["Hat", "Socks"], summary["slow_moving_products"])
+
+    def test_summarize_totals_without_sales(self):
+        self.assertEqual(
+            {
+                "total_sales": "$0.00",
+                "product_data": {"Shirt": {"sales": "$0.00", "count": 0, "contribution": "0%"}},
+                "slow_moving_products": ["Shirt"],
+            },
+            summarize_totals(["Shirt"], [0], [0], 0, ["Shirt"]),
+        )
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from mock import patch
+import shopify
+from ..store_mirror import StoreMirror
+from .test_helper import TestCase
+
+
+def order(id_, created_at, updated_at=None, **attributes):
+    return shopify.Order(
+        dict(
+            {
+                "id": id_,
+                "name": "#%d" % id_,
+                "created_at": created_at,
+                "updated_at": updated_at or created_at,
+                "total_price": "10.00",
+                "line_items": [{"id": id_ * 10, "product_id": 1, "quantity": 1, "price": "10.00"}],
+            },
+            **attributes
+        )
+    )
+
+
+class StoreMirrorTest(TestCase):
+    def setUp(self):
+        super(StoreMirrorTest, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.mirror = StoreMirror(os.path.join(self.dir, "store.sqlite3"))
+        self.orders = [
+            order(1, "2023-05-01T09:00:00-04:00"),
+            order(2, "2023-05-02T23:30:00-04:00", "2023-05-04T10:00:00-04:00"),
+            order(3, "2023-05-03T08:00:00-04:00", closed_at="2023-05-03T09:00:00-04:00"),
+        ]
+        self.products = [
+            shopify.Product({"id": 1, "title": "Shirt", "updated_at": "2023-05-01T00:00:00Z", "variants": []}),
+        ]
+        self.order_scan = patch.object(shopify.Order, "scan", side_effect=lambda **kwargs: iter(self.orders))
+        self.product_scan = patch.object(shopify.Product, "scan", side_effect=lambda **kwargs: iter(self.products))
+        self.order_scan.start()
+        self.product_scan.start()
+
+    def tearDown(self):
+        self.order_scan.stop()
+        self.product_scan.stop()
+        shutil.rmtree(self.dir)
+        super(StoreMirrorTest, self).tearDown()
+
+    def order_ids(self, **kwargs):
+        return [order.id for order in self.mirror.orders(**kwargs)]
+
+    def test_sync_stores_every_order(self):
+        self.assertEqual(3, self.mirror.sync("orders"))
+        self.assertEqual([1, 2, 3], self.order_ids())
+        self.assertEqual(["#1", "#2", "#3"], [order.name for order in self.mirror.orders()])
+        self.assertEqual("any", shopify.Order.scan.call_args[1]["status"])
+
+    def test_next_sync_starts_at_the_newest_updated_at(self):
+        self.mirror.sync("orders")
+        self.orders = [order(1, "2023-05-01T09:00:00-04:00", "2023-05-05T10:00:00-04:00", name="#1 edited")]
+        self.assertEqual(1, self.mirror.sync("orders"))
+
+        self.assertEqual("2023-05-04T10:00:00-04:00", shopify.Order.scan.call_args[1]["updated_at_min"])
+        self.assertEqual(["#1 edited", "#2", "#3"], [order.name for order in self.mirror.orders()])
+
+    def test_watermark_is_capped_at_the_start_of_the_sync(self):
+        self.orders = [order(1, "2023-05-01T09:00:00Z", "2100-01-01T00:00:00Z")]
+        started = datetime.now(timezone.utc).replace(microsecond=0)
+        self.mirror.sync("orders")
+        self.mirror.sync("orders")
+
+        watermark = datetime.fromisoformat(shopify.Order.scan.call_args[1]["updated_at_min"])
+        self.assertGreaterEqual(watermark, started)
+        self.assertLessEqual(watermark, datetime.now(timezone.utc))
+
+    def test_orders_are_filtered_on_days_in_the_shop_offset(self):
+        self.mirror.sync("orders")
+        self.assertEqual([2, 3], self.order_ids(created_at_min="2023-05-02"))
+        self.assertEqual([1, 2], self.order_ids(created_at_max="2023-05-02"))
+        self.assertEqual([2], self.order_ids(created_at_min="2023-05-02", created_at_max="2023-05-02"))
+        self.assertEqual([], self.order_ids(created_at_min="2023-05-04"))
+
+    def test_open_orders_leave_out_closed_and_cancelled_orders(self):
+        self.orders.append(order(4, "2023-05-04T08:00:00-04:00", cancelled_at="2023-05-04T09:00:00-04:00"))
+        self.mirror.sync("orders")
+        self.assertEqual([1, 2], self.order_ids(status="open"))
+
+    def test_readers_sync_a_stale_mirror_once(self):
+        self.assertEqual([1, 2, 3], self.order_ids())
+        self.assertEqual([1, 2, 3], self.order_ids())
+        self.assertEqual(1, shopify.Order.scan.call_count)
+
+    def test_apply_and_delete(self):
+        self.mirror.sync("orders")
+        self.mirror.apply("orders", order(2, "2023-05-02T23:30:00-04:00", name="#2 edited").to_dict())
+        self.mirror.delete("orders", 3)
+        self.assertEqual(["#1", "#2 edited"], [order.name for order in self.mirror.orders()])
+
+    def test_rebuild_drops_deleted_records(self):
+        self.mirror.sync("orders")
+        del self.orders[0]
+        self.assertEqual(2, self.mirror.rebuild("orders"))
+        self.assertEqual([2, 3], self.order_ids())
+        self.assertNotIn("updated_at_min", shopify.Order.scan.call_args[1])
+
+    def test_product_titles(self):
+        self.assertEqual({1: "Shirt"}, self.mirror.product_titles())
+        self.mirror.apply("products", {"id": 2, "title": "Hat", "variants": [{"id": 20, "price": "5.00"}]})
+        self.assertEqual({1: "Shirt", 2: "Hat"}, self.mirror.product_titles())
+        self.assertEqual(["Shirt", "Hat"], [product.title for product in self.mirror.products()])
@@ -0,0 +1,53 @@
+import asyncio
+import contextvars
+import shopify
+from ..store_snapshot import StoreSnapshot, current_snapshot, use_snapshot
+from .test_helper import TestCase
+
+
+class StoreSnapshotTest(TestCase):
+    def setUp(self):
+        super(StoreSnapshotTest, self).setUp()
+        self.snapshot = StoreSnapshot(
+            orders=[shopify.Order({"id": 1})],
+            products=[shopify.Product({"id": 2, "title": "Shirt"}), shopify.Product({"id": 3, "title": "Hat"})],
+            customers=[],
+        )
+
+    def test_product_titles_by_id(self):
+        self.assertEqual({2: "Shirt", 3: "Hat"}, self.snapshot.product_titles)
+
+    def test_repr_counts_each_resource(self):
+        self.assertEqual("StoreSnapshot(orders=1, products=2, customers=0)", repr(self.snapshot))
+
+    def test_snapshot_is_current_inside_the_block_only(self):
+        self.assertIsNone(current_snapshot())
+        with use_snapshot(self.snapshot) as snapshot:
+            self.assertIs(self.snapshot, snapshot)
+            self.assertIs(self.snapshot, current_snapshot())
+        self.assertIsNone(current_snapshot())
+
+    def test_nested_blocks_restore_the_outer_snapshot(self):
+        inner = StoreSnapshot([], [], [])
+        with use_snapshot(self.snapshot):
+            with use_snapshot(inner):
+                self.assertIs(inner, current_snapshot())
+            self.assertIs(self.snapshot, current_snapshot())
+
+    def test_snapshot_is_reset_when_the_block_raises(self):
+        with self.assertRaises(ValueError):
+            with use_snapshot(self.snapshot):
+                raise ValueError()
+        self.assertIsNone(current_snapshot())
+
+    def test_snapshot_travels_with_the_context(self):
+        with use_snapshot(self.snapshot):
+            context = contextvars.copy_context()
+            task_snapshot = asyncio.run(self.read_in_task())
+        self.assertIs(self.snapshot, context.run(current_snapshot))
+        self.assertIs(self.snapshot, task_snapshot)
+        self.assertIsNone(current_snapshot())
+
+    @staticmethod
+    async def read_in_task():
+        return current_snapshot()
@@ -0,0 +1,13 @@
+import unittest
+from pyactiveresource.testing import http_fake
+import shopify
+
+
+class TestCase(unittest.TestCase):
+    """Resources are built against a test shop, and any request that is not stubbed fails instead of leaving."""
+
+    def setUp(self):
+        shopify.ShopifyResource.clear_session()
+        shopify.ShopifyResource.site = "https://this-is-my-test-show.myshopify.com/admin/api/unstable"
+        http_fake.initialize()
+        http_fake.TestHandler.set_response(Exception("Bad request"))